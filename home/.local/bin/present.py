@@ -4,10 +4,21 @@ Markdown Presentation Viewer
 A simple fullscreen presentation tool that reads markdown files.
 
 Usage: python3 presenter.py presentation.md
+       python3 presenter.py presentation.md --benchmark   # time rendering of every slide and exit
+       python3 presenter.py presentation.md --benchmark --report report.json [--rounds 20]
+       python3 presenter.py --benchmark-suite [report.json]   # synthetic decks under Xvfb, JSON report
+       python3 presenter.py presentation.md --export handout.pdf [--size 1920x1080]
+       python3 presenter.py presentation.md --export slides/ [--size 1920x1080]   # one PNG per slide
+       python3 presenter.py presentation.md --presenter [--presenter-geometry 1280x800+1920+0]
+       python3 presenter.py presentation.md --transition fade   # crossfade between slides, default is cut
+       python3 presenter.py presentation.md --bundle talk.present [--sizes 1920x1080,1280x800,1024x768]
+       python3 presenter.py talk.present   # present or export a bundle instead of markdown
 
 Controls:
 - Right Arrow / Space: Next slide
 - Left Arrow: Previous slide
+- Space on a video slide: Play / pause the video, embedded in the slide
+- Comma / Period: Seek video 5 seconds back / forward
 - ESC / Q: Exit presentation
 
 Markdown Support:
@@ -15,25 +26,67 @@ Markdown Support:
 - Bold: **text** or __text__
 - Italic: *text* or _text_
 - Monospace: `code`
-- Code blocks: ```code```
+- Code blocks: ```code```, highlighted with a language tag, e.g. ```python
 - Images: ![alt](path/to/image.png) - Supports JPEG, PNG, GIF, etc.
 - Video: ![alt](path/to/video.mp4)
 - Alignment: <left>, <center>, <right> tags
 - Slides: Separated by ---
+- Long lines are wrapped, images and then fonts of slides higher than the screen are shrunk to fit
+- Speaker notes: Lines after a line of only ???, shown in the presenter view
+
+Slides are indexed at start and parsed when shown or prefetched, so large decks open immediately. The file is
+reloaded when saved, only changed slides are parsed again and the current slide is kept.
+
+The presenter view is a second window, move it to the laptop screen or give its position with --presenter-geometry.
+It shows the current and next slide drawn offscreen by a worker thread, a timer and the speaker notes.
+
+Slides are drawn on a hidden canvas and raised when complete. The crossfade blends offscreen frames of both slides
+and falls back to a cut when a frame isn't rendered yet.
+
+A bundle is a single file with the parsed slides, images scaled for the given screen sizes and videos. Opening it
+parses no markdown and decodes no images, the image pixels are memory-mapped. Take it to another computer instead of
+the deck folder.
+
+The benchmark report has parse time, transition latency percentiles while stepping through the slides, Tk fonts,
+images and canvas items created, and peak RSS. The suite generates text, code and large JPEG decks and benchmarks
+each in its own process.
+
+Exports need no display, slides are drawn with Pillow using the same layout as on screen, in parallel processes.
 
 Requirements:
 - python3-tk: sudo apt install python3-tk
-- python3-pil: sudo apt install python3-pil python3-pil.imagetk
+- python3-pil 9.1 or newer: sudo apt install python3-pil python3-pil.imagetk
+- Exports: fonts-liberation or fonts-dejavu, or Pillow 10.1 or newer for its default font
+- python3-pygments (optional, syntax highlighting): sudo apt install python3-pygments
 """
 
+import argparse
+import dataclasses
+import hashlib
+import io
+import json
+import math
+import mmap
 import os
+import queue
 import re
+import shutil
+import socket
+import statistics
+import struct
+import subprocess
 import sys
+import tempfile
+import threading
+import time
 import tkinter as tk
+import zipfile
+from collections import OrderedDict
 from dataclasses import dataclass
+from pathlib import Path
 from tkinter import font as tkfont
 from tkinter.font import Font
-from typing import List, Any, ClassVar
+from typing import List, Any, Callable, Optional, Sequence
 
 from PIL import Image, ImageTk
 
@@ -63,6 +116,8 @@ class TextElement(Element):
 @dataclass(frozen=True)
 class CodeBlockElement(Element):
     content: List[str]
+    # Language tag of the opening fence, e.g. python for ```python
+    language: str = ''
 
 
 @dataclass(frozen=True)
@@ -80,30 +135,139 @@ class VideoElement(Element):
 @dataclass(frozen=True)
 class Slide:
     elements: List[Element]
+    notes: str = ''
+
+
+@dataclass(frozen=True)
+class FontKey:
+    family: str
+    size: int
+    weight: str = 'normal'
+    slant: str = 'roman'
+
+
+class FontRegistry:
+    """Tk fonts shared by all slides, created once per FontKey, with memoised text widths and line heights"""
+
+    def __init__(self):
+        self._fonts: dict[FontKey, Font] = {}
+        self._widths: dict[tuple[FontKey, str], int] = {}
+        self._linespaces: dict[FontKey, int] = {}
+
+    def font(self, key: FontKey) -> Font:
+        font = self._fonts.get(key)
+        if font is None:
+            font = tkfont.Font(family=key.family, size=key.size, weight=key.weight, slant=key.slant)
+            self._fonts[key] = font
+        return font
+
+    def measure(self, key: FontKey, text: str) -> int:
+        width = self._widths.get((key, text))
+        if width is None:
+            width = self.font(key).measure(text)
+            self._widths[(key, text)] = width
+        return width
+
+    def linespace(self, key: FontKey) -> int:
+        linespace = self._linespaces.get(key)
+        if linespace is None:
+            linespace = self.font(key).metrics('linespace')
+            self._linespaces[key] = linespace
+        return linespace
+
+
+class UnsharedFontRegistry(FontRegistry):
+    """A new Tk font for every lookup and no memoised measurements, the baseline compared by the benchmark"""
+
+    def font(self, key: FontKey) -> Font:
+        return tkfont.Font(family=key.family, size=key.size, weight=key.weight, slant=key.slant)
+
+    def measure(self, key: FontKey, text: str) -> int:
+        return self.font(key).measure(text)
+
+    def linespace(self, key: FontKey) -> int:
+        return self.font(key).metrics('linespace')
+
+
+class LazySlides(Sequence[Slide]):
+    """Byte offsets of slides in the markdown, a slide is parsed on first access"""
+
+    def __init__(self, parser: 'Parser', content: bytes, offsets: List[tuple[int, int]], hashes: List[str]):
+        self._parser = parser
+        self._content = content
+        self._offsets = offsets
+        self.hashes = hashes
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        start, end = self._offsets[index]
+        return self._parser.parse_slide(self.hashes[index], self._content[start:end])
 
 
 class Parser:
+    _SLIDE_SEPARATOR = re.compile(rb'\n---+\n')
+    # Speaker notes follow a line of only "???" until the end of the slide, a "Note:" line is slide text
+    _NOTES = re.compile(r'^\?\?\?[ \t]*$', re.MULTILINE)
+
     def __init__(self, markdown_file: str):
         self._markdown_file = markdown_file
+        # Slides by hash of their markdown, a reparse reuses slides with unchanged markdown
+        self._slides_by_hash: dict[str, Slide] = {}
 
-    def parse_markdown(self) -> List[Slide]:
-        """Parse markdown file into slides"""
+    def parse_markdown(self) -> LazySlides:
+        """Index slides of markdown file, slides are parsed on demand"""
         try:
-            with open(self._markdown_file, 'r', encoding='utf-8') as f:
+            with open(self._markdown_file, 'rb') as f:
                 content = f.read()
         except FileNotFoundError:
             print(f"Error: File '{self._markdown_file}' not found")
             sys.exit(1)
+        return self.index_slides(content)
 
-        # Split by horizontal rules
-        raw_slides = re.split(r'\n---+\n', content)
-
-        slides = []
-        for raw_slide in raw_slides:
-            if not raw_slide.strip(): continue
-            elements = self._parse_slide_content(raw_slide.strip())
-            slides.append(Slide(elements))
-        return slides
+    def reparse_markdown(self) -> Optional[LazySlides]:
+        """Parse changed slides only, None when the file can't be read, e.g. in the middle of saving"""
+        try:
+            with open(self._markdown_file, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        return self.index_slides(content)
+
+    def index_slides(self, content: bytes) -> LazySlides:
+        """Slides split by horizontal rules, existence of images and videos is checked when a slide is drawn"""
+        offsets = []
+        hashes = []
+        start = 0
+        separators = [(m.start(), m.end()) for m in self._SLIDE_SEPARATOR.finditer(content)]
+        for end, next_start in separators + [(len(content), len(content))]:
+            raw_slide = content[start:end]
+            stripped_slide = raw_slide.strip()
+            if stripped_slide:
+                # Offsets of the slide without surrounding whitespace
+                leading_whitespace = len(raw_slide) - len(raw_slide.lstrip())
+                offsets.append((start + leading_whitespace, start + leading_whitespace + len(stripped_slide)))
+                hashes.append(hashlib.sha1(stripped_slide).hexdigest())
+            start = next_start
+
+        hash_set = set(hashes)
+        self._slides_by_hash = {h: slide for h, slide in self._slides_by_hash.items() if h in hash_set}
+        return LazySlides(self, content, offsets, hashes)
+
+    def parse_slide(self, slide_hash: str, raw_slide: bytes) -> Slide:
+        slide = self._slides_by_hash.get(slide_hash)
+        if slide is None:
+            content = raw_slide.decode('utf-8', errors='replace')
+            notes = ''
+            match = self._NOTES.search(content)
+            if match:
+                content, notes = content[:match.start()], content[match.end():].strip()
+            slide = Slide(self._parse_slide_content(content), notes)
+            self._slides_by_hash[slide_hash] = slide
+        return slide
 
     def _parse_slide_content(self, content) -> List[Element]:
         """Parse individual slide content into structured format"""
@@ -111,6 +275,7 @@ class Parser:
         lines = content.split('\n')
         in_code_block = False
         code_block = []
+        code_language = ''
 
         for line in lines:
             # Check for code block
@@ -119,11 +284,13 @@ class Parser:
                     elements.append(CodeBlockElement(
                         content=code_block,
                         align='left',
+                        language=code_language,
                     ))
                     code_block = []
                     in_code_block = False
                 else:
                     in_code_block = True
+                    code_language = line.strip()[3:].strip()
                 continue
 
             if in_code_block:
@@ -163,14 +330,8 @@ class Parser:
                     path = match.group(2)
 
                     resolved_path = self._resolve_path(path)
-                    # Determine if it's a video
-                    if not os.path.exists(resolved_path):
-                        # TODO Error element instead
-                        elements.append(TextElement(
-                            segments=[TextSegment(f"File not found: {resolved_path}", format='code')],
-                            align='left'
-                        ))
-                    elif path.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
+                    # Determine if it's a video, missing files are shown when the slide is drawn
+                    if path.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
                         elements.append(VideoElement(
                             path=resolved_path,
                             alt=alt_text,
@@ -228,87 +389,789 @@ class Parser:
         return os.path.join(md_dir, path)
 
 
+class FileWatcher:
+    """
+    Changes of a file by inotify on its directory, editors often save by writing a new file and renaming it.
+    Without inotify, e.g. on other systems than Linux, the file modification time is compared.
+    """
+    _IN_CLOSE_WRITE = 0x8
+    _IN_MOVED_TO = 0x80
+    _IN_CREATE = 0x100
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, path: str):
+        self._path = os.path.abspath(path)
+        self._name = os.fsencode(os.path.basename(self._path))
+        self._mtime_ns = self._stat_mtime_ns()
+        self._fd = -1
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                mask = self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+                if libc.inotify_add_watch(fd, os.fsencode(os.path.dirname(self._path)), mask) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        except (OSError, AttributeError):
+            pass
+
+    def changed(self) -> bool:
+        """Whether the file changed since the last call, all pending events are read at once"""
+        if self._fd < 0:
+            mtime_ns = self._stat_mtime_ns()
+            changed = mtime_ns != self._mtime_ns
+            self._mtime_ns = mtime_ns
+            return changed
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_length = self._EVENT_HEADER.unpack_from(data, offset)
+                offset += self._EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b'\0')
+                offset += name_length
+                changed = changed or name == self._name
+
+    def _stat_mtime_ns(self) -> int:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return 0
+
+
+def cache_directory() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "present"
+
+
+@dataclass(frozen=True)
+class ImageKey:
+    """Scaled image of a file version, a changed file or screen size is a different image"""
+    path: str
+    mtime_ns: int
+    max_width: int
+    max_height: int
+
+    @staticmethod
+    def for_path(path: str, max_width: int, max_height: int) -> 'ImageKey':
+        return ImageKey(path, os.stat(path).st_mtime_ns, max_width, max_height)
+
+
+def scaled_size(width: int, height: int, max_width: int, max_height: int) -> tuple[int, int]:
+    """Size of an image after Image.thumbnail, which keeps the aspect ratio, computed without the pixels"""
+    if width <= max_width and height <= max_height:
+        return width, height
+
+    def round_aspect(number: float, key: Callable[[int], float]) -> int:
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if max_width / max_height >= aspect:
+        return round_aspect(max_height * aspect, lambda n: abs(aspect - n / max_height)), max_height
+    return max_width, round_aspect(max_width / aspect, lambda n: abs(aspect - max_width / n) if n else 0)
+
+
+class ImageCache:
+    """
+    Least recently used photo images within a memory budget, counted as 4 bytes per pixel like Tk. Pinned images,
+    e.g. of the shown slide, are never evicted. Scaled images are also stored as PNG files, so a rehearsed deck does
+    not decode and scale the originals again. Least recently used files are removed beyond the disk budget.
+    """
+    MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+    DISK_BUDGET_BYTES = 1024 * 1024 * 1024
+
+    def __init__(self, memory_budget_bytes=MEMORY_BUDGET_BYTES, disk_budget_bytes=DISK_BUDGET_BYTES):
+        self._memory_budget_bytes = memory_budget_bytes
+        self._photo_images: OrderedDict[ImageKey, ImageTk.PhotoImage] = OrderedDict()
+        self._pinned: set[ImageKey] = set()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        # Disk hits are counted by the threads loading images
+        self._disk_hits_lock = threading.Lock()
+        self._disk_hits = 0
+        self._directory = cache_directory() / "images"
+        threading.Thread(target=self.trim, args=(disk_budget_bytes,), daemon=True).start()
+
+    def __contains__(self, key: ImageKey) -> bool:
+        return key in self._photo_images
+
+    def get(self, key: ImageKey) -> Optional[ImageTk.PhotoImage]:
+        photo_image = self._photo_images.get(key)
+        if photo_image is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            self._photo_images.move_to_end(key)
+        return photo_image
+
+    def put(self, key: ImageKey, photo_image: ImageTk.PhotoImage):
+        if key in self._photo_images:
+            return
+        self._photo_images[key] = photo_image
+        self._bytes += self._size(photo_image)
+        self._evict()
+
+    def pin(self, keys: set[ImageKey]):
+        """Replaces pinned images, unpinned ones stay cached until the budget is exceeded"""
+        self._pinned = set(keys)
+        self._evict()
+
+    def pin_also(self, key: ImageKey):
+        """Pins one more image until pin replaces the pinned images, e.g. one shown before its slide was prefetched"""
+        self._pinned.add(key)
+
+    @staticmethod
+    def image_key(path: str, max_width: int, max_height: int) -> ImageKey:
+        return ImageKey.for_path(path, max_width, max_height)
+
+    @staticmethod
+    def image_size(key: ImageKey) -> tuple[int, int]:
+        """Size of the scaled image from the header of the original, decodes nothing"""
+        with Image.open(key.path) as image:
+            return scaled_size(image.width, image.height, key.max_width, key.max_height)
+
+    def load(self, key: ImageKey) -> Image.Image:
+        """Scaled image from the disk cache, or from the original, thread safe"""
+        entry_path = self._entry_path(key)
+        try:
+            image = Image.open(entry_path)
+            image.load()
+        except OSError:
+            image = None
+        if image is not None:
+            with self._disk_hits_lock:
+                self._disk_hits += 1
+            try:
+                # Modification time orders the entries for trim
+                os.utime(entry_path)
+            except OSError:
+                pass
+            return image
+
+        image = Image.open(key.path)
+        if image.height > key.max_height or image.width > key.max_width:
+            image.thumbnail((key.max_width, key.max_height), Image.Resampling.LANCZOS)
+        image.load()
+        self._store(entry_path, image)
+        return image
+
+    def stats(self) -> dict[str, int]:
+        with self._disk_hits_lock:
+            disk_hits = self._disk_hits
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "disk_hits": disk_hits,
+            "images": len(self._photo_images),
+            "bytes": self._bytes,
+        }
+
+    def trim(self, max_bytes: int = DISK_BUDGET_BYTES):
+        """Removes least recently used files until the disk cache fits into max_bytes, thread safe"""
+        entries = []
+        total = 0
+        try:
+            subdirectories = list(os.scandir(self._directory))
+        except FileNotFoundError:
+            return
+        for subdirectory in subdirectories:
+            try:
+                with os.scandir(subdirectory.path) as it:
+                    for entry in it:
+                        # Files being written end in .tmp
+                        if not entry.name.endswith(".png"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            except NotADirectoryError:
+                continue
+
+        if total <= max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= max_bytes:
+                break
+
+    def _evict(self):
+        for key in list(self._photo_images):
+            if self._bytes <= self._memory_budget_bytes:
+                break
+            if key not in self._pinned:
+                self._bytes -= self._size(self._photo_images.pop(key))
+
+    @staticmethod
+    def _size(photo_image: ImageTk.PhotoImage) -> int:
+        return photo_image.width() * photo_image.height() * 4
+
+    def _entry_path(self, key: ImageKey) -> Path:
+        digest = hashlib.sha1(f"{key.path}\0{key.mtime_ns}\0{key.max_width}x{key.max_height}".encode()).hexdigest()
+        return self._directory / digest[:2] / f"{digest}.png"
+
+    @staticmethod
+    def _store(entry_path: Path, image: Image.Image):
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write and rename, so a concurrent reader never sees a partially written entry
+            tmp_path = entry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Image cache not written: {e}")
+
+
+@dataclass(frozen=True)
+class ImageSize:
+    """Size of a scaled image with the size methods of ImageTk.PhotoImage"""
+    size: tuple[int, int]
+
+    def width(self) -> int:
+        return self.size[0]
+
+    def height(self) -> int:
+        return self.size[1]
+
+
+class ImageSizes:
+    """
+    Images interface for measuring slides, sizes of scaled images are read from the file headers or the bundle. Slides
+    are laid out before their images are loaded, e.g. to prefetch images at the size they are drawn.
+    """
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self, source):
+        self._source = source
+        self._sizes: dict[ImageKey, ImageSize] = {}
+
+    def photo_image(self, path: str, max_width: int, max_height: int) -> ImageSize:
+        key = self._source.image_key(path, max_width, max_height)
+        size = self._sizes.get(key)
+        if size is None:
+            if len(self._sizes) >= self.MAX_ENTRIES:
+                self._sizes.clear()
+            size = self._sizes[key] = ImageSize(self._source.image_size(key))
+        return size
+
+
+class ImagePrefetcher:
+    """
+    Decodes and scales images of the slides around the current one in a worker thread, so showing a slide only creates
+    canvas items. Photo images are created in the Tk thread by poll and kept by the image cache. Images are loaded
+    from the source, the image cache itself or a DeckBundle. Images that failed to load aren't loaded again, a changed
+    file is a different image.
+    """
+
+    def __init__(self, cache: ImageCache, source: Optional['DeckBundle'] = None):
+        self.cache = cache
+        self.source = source or cache
+        self.sizes = ImageSizes(self.source)
+        self._requests: queue.Queue[ImageKey] = queue.Queue()
+        self._loaded: queue.Queue[tuple[ImageKey, Optional[Image.Image], Optional[Exception]]] = queue.Queue()
+        self._requested: set[ImageKey] = set()
+        self._failures: dict[ImageKey, Exception] = {}
+        # Replaced by prefetch, requests no longer wanted are skipped by the worker
+        self._wanted: frozenset[ImageKey] = frozenset()
+        # Requests the worker hasn't started and the one it loads, a queued request taken by the Tk thread is skipped
+        self._lock = threading.Lock()
+        self._queued: set[ImageKey] = set()
+        self._loading: Optional[ImageKey] = None
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def prefetch(self, requests: List[tuple[str, int, int]]):
+        """Paths and sizes in the order of loading, these images are pinned in the cache"""
+        keys = []
+        for path, max_width, max_height in requests:
+            try:
+                keys.append(self.source.image_key(path, max_width, max_height))
+            except OSError:
+                # Error is shown when the slide loads the image itself
+                continue
+        self._wanted = frozenset(keys)
+        self.cache.pin(set(keys))
+
+        for key in keys:
+            if key not in self.cache and key not in self._requested and key not in self._failures:
+                self._requested.add(key)
+                with self._lock:
+                    self._queued.add(key)
+                self._requests.put(key)
+
+    def poll(self):
+        while not self._loaded.empty():
+            self._put(*self._loaded.get_nowait())
+
+    def photo_image(self, path: str, max_width: int, max_height: int) -> ImageTk.PhotoImage:
+        """Prefetched image, waits for it when the worker loads it, or loads it right away when it is not ready yet"""
+        key = self.source.image_key(path, max_width, max_height)
+        # Pinned before images are put, which may evict other images of the shown slide
+        self.cache.pin_also(key)
+        with self._lock:
+            loading = key == self._loading
+            self._queued.discard(key)
+        while loading:
+            loaded = self._loaded.get()
+            self._put(*loaded)
+            loading = loaded[0] != key
+        self.poll()
+
+        photo_image = self.cache.get(key)
+        if photo_image is None:
+            error = self._failures.get(key)
+            if error is not None:
+                raise error
+            try:
+                image = self.source.load(key)
+            except Exception as e:
+                self._failures[key] = e
+                raise
+            photo_image = ImageTk.PhotoImage(image)
+            self.cache.put(key, photo_image)
+        return photo_image
+
+    def _put(self, key: ImageKey, image: Optional[Image.Image], error: Optional[Exception]):
+        self._requested.discard(key)
+        if image is not None:
+            self.cache.put(key, ImageTk.PhotoImage(image))
+        elif error is not None:
+            self._failures[key] = error
+
+    def _work(self):
+        while True:
+            key = self._requests.get()
+            with self._lock:
+                skip = key not in self._queued or key not in self._wanted
+                self._queued.discard(key)
+                if not skip:
+                    self._loading = key
+            if skip:
+                self._loaded.put((key, None, None))
+                continue
+            try:
+                loaded = (key, self.source.load(key), None)
+            except Exception as e:
+                loaded = (key, None, e)
+            # Handed over and no longer loading at once, photo_image waits for the result while the key is loading
+            with self._lock:
+                self._loaded.put(loaded)
+                self._loading = None
+
+
+# Text run of a single font and colour, and its x offset within a wrapped line
+Run = tuple[FontKey, str, str]
+PlacedRun = tuple[FontKey, str, str, int]
+
+
+class TextLayout:
+    """
+    Word wrapping with memoised line breaks, shared by all slides drawn with the same fonts. Breaks are kept by runs
+    and width, so a live reload wraps changed text only and a new resolution wraps the slides shown at it.
+    """
+
+    MAX_ENTRIES = 4096
+    _TOKEN = re.compile(r'\s+|\S+')
+
+    def __init__(self, fonts):
+        self._fonts = fonts
+        self._lines: dict[tuple[tuple[Run, ...], int], List[tuple[List[PlacedRun], int]]] = {}
+        # Keeps the slide, so its id isn't reused while the entry exists
+        self._scales: dict[tuple[int, int, int], tuple[Slide, tuple, tuple[float, float]]] = {}
+
+    def fit_scale(self, slide: Slide, width: int, height: int, files: tuple,
+                  fit: Callable[[], tuple[float, float]]) -> tuple[float, float]:
+        """Font and image scale of the slide at the screen size, computed by fit again when the files changed"""
+        key = (id(slide), width, height)
+        entry = self._scales.get(key)
+        if entry is not None and entry[0] is slide and entry[1] == files:
+            return entry[2]
+        if len(self._scales) >= self.MAX_ENTRIES:
+            self._scales.clear()
+        scales = fit()
+        self._scales[key] = (slide, files, scales)
+        return scales
+
+    def wrap(self, runs: tuple[Run, ...], max_width: int) -> List[tuple[List[PlacedRun], int]]:
+        """Lines of runs with their width, words longer than max_width get a line of their own"""
+        key = (runs, max_width)
+        lines = self._lines.get(key)
+        if lines is None:
+            if len(self._lines) >= self.MAX_ENTRIES:
+                self._lines.clear()
+            lines = self._lines[key] = self._wrap(runs, max_width)
+        return lines
+
+    def _wrap(self, runs: tuple[Run, ...], max_width: int) -> List[tuple[List[PlacedRun], int]]:
+        lines = []
+        line: List[PlacedRun] = []
+        width = 0
+        # Whitespace is placed when a word follows on the same line, so lines never start or end with it
+        space: Optional[tuple[FontKey, str, str, int]] = None
+
+        for font, fill, text in runs:
+            for token in self._TOKEN.findall(text):
+                token_width = self._fonts.measure(font, token)
+                if token.isspace():
+                    if line:
+                        space = (font, fill, token, token_width)
+                    continue
+
+                if line and width + (space[3] if space else 0) + token_width > max_width:
+                    lines.append((line, width))
+                    line, width, space = [], 0, None
+                for run_font, run_fill, run_text, run_width in ([space] if space else []) + [(font, fill, token, token_width)]:
+                    if line and line[-1][0] == run_font and line[-1][1] == run_fill:
+                        line[-1] = (run_font, run_fill, line[-1][2] + run_text, line[-1][3])
+                    else:
+                        line.append((run_font, run_fill, run_text, width))
+                    width += run_width
+                space = None
+
+        lines.append((line, width))
+        return lines
+
+
+class CodeHighlighter:
+    """
+    Coloured runs of code blocks with a language tag, tokenised by Pygments once per block and kept by a hash of the
+    block. Lines have at most MAX_RUNS runs, so a dense code slide creates a bounded number of canvas items.
+    """
+
+    MAX_ENTRIES = 256
+    MAX_RUNS = 8
+    DEFAULT_COLOR = '#00ff00'
+    # Colours of token types and their subtypes, other tokens keep the default colour
+    COLORS = {
+        'Keyword': '#c678dd',
+        'Name.Builtin': '#e5c07b',
+        'Name.Class': '#e5c07b',
+        'Name.Function': '#61afef',
+        'Name.Decorator': '#61afef',
+        'Literal.String': '#98c379',
+        'Literal.Number': '#d19a66',
+        'Comment': '#7f848e',
+        'Operator': '#56b6c2',
+    }
+
+    def __init__(self):
+        self._blocks: OrderedDict[str, Optional[List[List[tuple[str, str]]]]] = OrderedDict()
+        self._lexers = {}
+
+    def highlight(self, language: str, lines: List[str]) -> Optional[List[List[tuple[str, str]]]]:
+        """Runs of colour and text for each line, None for unknown languages or without Pygments"""
+        key = hashlib.sha1((f"{language}\0" + "\n".join(lines)).encode()).hexdigest()
+        if key in self._blocks:
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+
+        runs = self._highlight(language, lines)
+        self._blocks[key] = runs
+        if len(self._blocks) > self.MAX_ENTRIES:
+            self._blocks.popitem(last=False)
+        return runs
+
+    def _highlight(self, language: str, lines: List[str]) -> Optional[List[List[tuple[str, str]]]]:
+        lexer = self._lexer(language)
+        if lexer is None:
+            return None
+
+        tokens: List[List[tuple[str, str]]] = [[]]
+        for token_type, value in lexer.get_tokens("\n".join(lines)):
+            color = self._color(token_type)
+            for index, part in enumerate(value.split("\n")):
+                if index > 0:
+                    tokens.append([])
+                if part:
+                    tokens[-1].append((color, part))
+        return [self._merge(line_tokens) for line_tokens in tokens[:len(lines)]]
+
+    def _lexer(self, language: str):
+        if language not in self._lexers:
+            try:
+                from pygments.lexers import get_lexer_by_name
+                from pygments.util import ClassNotFound
+            except ImportError:
+                self._lexers[language] = None
+                return None
+            try:
+                # Leading and trailing empty lines are kept, so tokens line up with the lines of the block
+                self._lexers[language] = get_lexer_by_name(language, stripnl=False)
+            except ClassNotFound:
+                self._lexers[language] = None
+        return self._lexers[language]
+
+    def _color(self, token_type) -> str:
+        while token_type.parent is not None:
+            color = self.COLORS.get(str(token_type)[len('Token.'):])
+            if color is not None:
+                return color
+            token_type = token_type.parent
+        return self.DEFAULT_COLOR
+
+    def _merge(self, tokens: List[tuple[str, str]]) -> List[tuple[str, str]]:
+        """Whitespace joins a neighbouring run, as do tokens of the same colour"""
+        runs: List[tuple[str, str]] = []
+        for color, text in tokens:
+            if runs and (runs[-1][0] == color or text.isspace()):
+                runs[-1] = (runs[-1][0], runs[-1][1] + text)
+            elif runs and runs[-1][1].isspace():
+                runs[-1] = (color, runs[-1][1] + text)
+            else:
+                runs.append((color, text))
+        if len(runs) > self.MAX_RUNS:
+            # The rest of the line is drawn in the default colour
+            rest = ''.join(text for _, text in runs[self.MAX_RUNS - 1:])
+            del runs[self.MAX_RUNS - 1:]
+            if runs[-1][0] == self.DEFAULT_COLOR:
+                runs[-1] = (self.DEFAULT_COLOR, runs[-1][1] + rest)
+            else:
+                runs.append((self.DEFAULT_COLOR, rest))
+        return runs
+
+
+class MeasuringCanvas:
+    """Canvas that draws nothing, slides are rendered into it to measure their height"""
+
+    def create_text(self, *args, **kwargs):
+        pass
+
+    def create_image(self, *args, **kwargs):
+        pass
+
+
 class SlideRenderer:
-    _images: ClassVar[dict[str, Image]] = {}
+    """Lays out slide elements, drawn to a Tk canvas or, for exports, to a PillowCanvas"""
 
-    def __init__(self, root: tk.Tk, canvas: tk.Canvas):
+    # Font scales tried, in order, until the slide fits above the slide number
+    FIT_SCALES = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5)
+    # Images are shrunk to this part of their height before fonts are
+    MIN_IMAGE_SCALE = 0.5
+    BOTTOM_MARGIN = 60
+
+    def __init__(self, canvas, fonts, images, width: int, height: int, layout: TextLayout,
+                 highlighter: CodeHighlighter):
         self.canvas = canvas
+        self._fonts = fonts
+        self._images = images
+        self._layout = layout
+        self._highlighter = highlighter
+
+        self._screen_width = width
+        self._screen_height = height
+        # Height of the images drawn by the last _render_elements
+        self._images_height = 0
+
+    @property
+    def max_image_size(self) -> tuple[int, int]:
+        return self.max_image_size_for(self._screen_width, self._screen_height)
+
+    @staticmethod
+    def max_image_size_for(screen_width: int, screen_height: int) -> tuple[int, int]:
+        """Images are scaled down to 90% of screen width and 80% of screen height"""
+        return int(screen_width * 0.9), int(screen_height * 0.8)
+
+    def render_slide(self, slide: Slide, slide_info: str) -> Optional[str]:
+        """Draws all elements, with images and fonts shrunk when the slide is too high, and the slide number. Returns
+        the path of the last video on the slide"""
+        scale, image_scale = self._fit_scale(slide)
+        _, video = self._render_elements(slide, scale, image_scale)
+        self.render_slide_number(slide_info)
+        return video
+
+    def _fit_scale(self, slide: Slide) -> tuple[float, float]:
+        """
+        Font and image scale the slide fits at. Images are shrunk to the height left by the text first, down to
+        MIN_IMAGE_SCALE, then fonts too. A slide that fits at no scale gets the smallest fonts, and images shrunk to at
+        least a tenth of their height.
+        """
+        # Image sizes come from the file headers, measuring decodes no images
+        measurer = SlideRenderer(MeasuringCanvas(), self._fonts, self._images.sizes,
+                                 self._screen_width, self._screen_height, self._layout, self._highlighter)
+        max_bottom = self._screen_height - self.BOTTOM_MARGIN
+
+        def image_scale(bottom: int, images_height: int) -> float:
+            return 1.0 - (bottom - max_bottom) / images_height if images_height else 0.0
+
+        def fit() -> tuple[float, float]:
+            for scale in self.FIT_SCALES:
+                bottom, _ = measurer._render_elements(slide, scale)
+                if bottom <= max_bottom:
+                    return scale, 1.0
+                if image_scale(bottom, measurer._images_height) >= self.MIN_IMAGE_SCALE:
+                    return scale, image_scale(bottom, measurer._images_height)
+            if measurer._images_height:
+                return self.FIT_SCALES[-1], max(image_scale(bottom, measurer._images_height), 0.1)
+            return self.FIT_SCALES[-1], 1.0
+
+        return self._layout.fit_scale(slide, self._screen_width, self._screen_height, self._file_stamps(slide), fit)
 
-        self._screen_width = root.winfo_width()
-        self._screen_height = root.winfo_height()
+    @staticmethod
+    def _file_stamps(slide: Slide) -> tuple[Optional[int], ...]:
+        """Modification times of the images and videos, None for missing files, e.g. copied into place later"""
+        stamps = []
+        for element in slide.elements:
+            if isinstance(element, (ImageElement, VideoElement)):
+                try:
+                    stamps.append(os.stat(element.path).st_mtime_ns)
+                except OSError:
+                    stamps.append(None)
+        return tuple(stamps)
+
+    def image_requests(self, slide: Slide) -> List[tuple[str, int, int]]:
+        """Paths of the images of the slide and the sizes they are drawn at, for prefetching"""
+        _, image_scale = self._fit_scale(slide)
+        requests = []
+        for element in slide.elements:
+            if isinstance(element, ImageElement):
+                try:
+                    requests.append((element.path, *self._image_box(element.path, image_scale)))
+                except OSError:
+                    # Error is shown when the slide loads the image itself
+                    continue
+        return requests
+
+    def _image_box(self, path: str, image_scale: float) -> tuple[int, int]:
+        """Size the image is scaled into, a shrunk image gets image_scale of the full height"""
+        max_width, max_height = self.max_image_size
+        if image_scale < 1.0:
+            height = self._images.sizes.photo_image(path, max_width, max_height).height()
+            max_height = max(int(height * image_scale), 1)
+        return max_width, max_height
+
+    def _render_elements(self, slide: Slide, scale: float, image_scale=1.0) -> tuple[int, Optional[str]]:
+        y = 100
+        x = 100
+        video = None
+        self._images_height = 0
+
+        for element in slide.elements:
+            match element:
+                case TitleElement(segments=segments, align=align):
+                    y = self.render_text(segments, x, y, align, is_title=True, scale=scale)
+                    y += round(30 * scale)
+
+                case TextElement(segments=segments, align=align):
+                    y = self.render_text(segments, x, y, align, scale=scale)
+                    y += round(10 * scale)
+
+                case CodeBlockElement(content=content, language=language):
+                    y = self.render_code_block(content, language, x, y, scale=scale)
+                    y += round(20 * scale)
 
-    def render_text(self, segments: List[TextSegment], x, y, align='left', is_title=False) -> int:
-        """Render formatted text with markdown styling"""
-        # Calculate total width for alignment
-        total_width = 0
-        for segment in segments:
-            temp_font = self._select_font(segment.format, is_title=is_title)
-            total_width += temp_font.measure(segment.text)
+                case ImageElement(path=path, alt=alt, align=align):
+                    y = self.render_image(path, align, x, y, image_scale)
+                    y += round(20 * scale)
+
+                case VideoElement(path=path, alt=alt, align=align):
+                    if os.path.exists(path):
+                        video_msg = f"🎬 Video: {alt}"
+                        y = self.render_video_text(video_msg, "(Press SPACE to play/pause)", x, y, scale=scale)
+                        video = path
+                    else:
+                        y = self.render_error_text(f"File not found: {path}", x, y)
+                    y += round(20 * scale)
 
-        # Adjust x based on alignment
+                case _:
+                    raise TypeError(type(element))
+
+        return y, video
+
+    def render_text(self, segments: List[TextSegment], x, y, align='left', is_title=False, scale=1.0) -> int:
+        """Render formatted text with markdown styling, wrapped at the right margin"""
+        runs = tuple(
+            (self._select_font(segment.format, is_title=is_title, scale=scale),
+             '#00ff00' if segment.format == 'code' else 'white',
+             segment.text)
+            for segment in segments
+        )
         screen_width = self._screen_width
-        if align == 'center':
-            x = (screen_width - total_width) // 2
-        elif align == 'right':
-            x = screen_width - total_width - 50
+        lines = self._layout.wrap(runs, screen_width - 150)
 
-        # Render each segment
-        current_x = x
-        for segment in segments:
-            use_font = self._select_font(segment.format, is_title=is_title)
-            fill = '#00ff00' if segment.format == 'code' else 'white'
+        for index, (line, line_width) in enumerate(lines):
+            if index > 0:
+                y += self._fonts.linespace(self._select_font(is_title=is_title, scale=scale))
 
-            self._render_text(use_font, segment.text, current_x, y, fill)
-            current_x += use_font.measure(segment.text)
+            # Adjust x based on alignment
+            line_x = x
+            if align == 'center':
+                line_x = (screen_width - line_width) // 2
+            elif align == 'right':
+                line_x = screen_width - line_width - 50
 
-        return y + self._select_font().metrics()['linespace']
+            for font, fill, text, offset in line:
+                self._render_text(font, text, line_x + offset, y, fill)
 
-    def _select_font(self, text_format='normal', is_title=False) -> Font:
-        base_title_size = 48
-        base_normal_size = 24
-        base_code_size = 20
+        # Below the last line by the normal line height, as before wrapping, the elements add their own spacing
+        return y + self._fonts.linespace(self._select_font(scale=scale))
 
-        title_font = tkfont.Font(family="Arial", size=base_title_size, weight="bold")
-        normal_font = tkfont.Font(family="Arial", size=base_normal_size)
+    @staticmethod
+    def _select_font(text_format='normal', is_title=False, scale=1.0) -> FontKey:
+        base_title_size = round(48 * scale)
+        base_normal_size = round(24 * scale)
+        base_code_size = round(20 * scale)
+
+        title_font = FontKey(family="Arial", size=base_title_size, weight="bold")
+        normal_font = FontKey(family="Arial", size=base_normal_size)
 
         font = title_font if is_title else normal_font
         match text_format:
             case 'code':
-                return tkfont.Font(family="Courier", size=base_code_size)
+                return FontKey(family="Courier", size=base_code_size)
             case 'bold':
                 # TODO Use self._normal_font family
-                return tkfont.Font(family="Arial", size=font.actual()['size'], weight="bold")
+                return FontKey(family="Arial", size=font.size, weight="bold")
             case 'italic':
-                return tkfont.Font(family="Arial", size=font.actual()['size'], slant="italic")
+                return FontKey(family="Arial", size=font.size, slant="italic")
             case 'bold_italic':
-                return tkfont.Font(family="Arial", size=font.actual()['size'], weight="bold", slant="italic")
+                return FontKey(family="Arial", size=font.size, weight="bold", slant="italic")
             case _:
                 return font
 
-    def _render_text(self, font: Font, text: str, x: int, y: int, fill = 'white'):
-        self.canvas.create_text(x, y, text=text, fill=fill, font=font, anchor='nw')
-        return y + font.metrics()['linespace']
-
-    def render_code_text(self, text, x, y) -> int:
-        font = self._select_font(text_format='code')
+    def _render_text(self, font: FontKey, text: str, x: int, y: int, fill = 'white'):
+        self.canvas.create_text(x, y, text=text, fill=fill, font=self._fonts.font(font), anchor='nw')
+        return y + self._fonts.linespace(font)
+
+    def render_code_block(self, lines: List[str], language: str, x, y, scale=1.0) -> int:
+        """Highlighted when the language is known, one canvas item per coloured run"""
+        runs = self._highlighter.highlight(language, lines) if language else None
+        if runs is None:
+            for line in lines:
+                y = self.render_code_text(line, x, y, scale=scale)
+            return y
+
+        font = self._select_font(text_format='code', scale=scale)
+        for line_runs in runs:
+            offset = 0
+            for fill, text in line_runs:
+                self._render_text(font, text, x + offset, y, fill)
+                offset += self._fonts.measure(font, text)
+            y += self._fonts.linespace(font)
+        return y
+
+    def render_code_text(self, text, x, y, scale=1.0) -> int:
+        font = self._select_font(text_format='code', scale=scale)
         return self._render_text(font, text, x, y, fill='#00ff00')
 
-    def render_image(self, path: str, align: str, x, y) -> int:
+    def render_image(self, path: str, align: str, x, y, image_scale=1.0) -> int:
         try:
-            # Load image with PIL if available
-            image = Image.open(path)
-
-            # Resize if too large (max 80% of screen height)
-            max_height = int(self._screen_height * 0.8)
-            max_width = int(self._screen_width * 0.9)
-
-            if image.height > max_height or image.width > max_width:
-                image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-
-            img = ImageTk.PhotoImage(image)
-
-            # Keep reference to prevent garbage collection
-            SlideRenderer._images[path] = img
+            # Prefetcher keeps reference to prevent garbage collection
+            img = self._images.photo_image(path, *self._image_box(path, image_scale))
 
             # Calculate position based on alignment
             screen_width = self._screen_width
@@ -323,40 +1186,846 @@ class SlideRenderer:
                 anchor = 'nw'
 
             self.canvas.create_image(img_x, y, image=img, anchor=anchor)
+            self._images_height += img.height()
             return y + img.height()
+        except FileNotFoundError:
+            return self.render_error_text(f"File not found: {path}", x, y)
         except Exception as e:
             msg = f"[Image error: {path} - {str(e)}]"
             return self.render_error_text(msg, x, y)
 
-    def render_video_text(self, name, label, x, y) -> int:
-        font = self._select_font(text_format='normal')
-        self.canvas.create_text(x, y, text=name, fill='yellow', font=font, anchor='nw')
+    def render_video_text(self, name, label, x, y, scale=1.0) -> int:
+        font = self._select_font(text_format='normal', scale=scale)
+        self.canvas.create_text(x, y, text=name, fill='yellow', font=self._fonts.font(font), anchor='nw')
         # TODO Hardcoded name line height 35px
-        font = self._select_font(text_format='code')
-        self.canvas.create_text(x, y + 35, text=label, fill='gray', font=font, anchor='nw')
-        return y + 35 + font.metrics()['linespace']
+        font = self._select_font(text_format='code', scale=scale)
+        self.canvas.create_text(x, y + 35, text=label, fill='gray', font=self._fonts.font(font), anchor='nw')
+        return y + 35 + self._fonts.linespace(font)
 
     def render_error_text(self, text, x, y) -> int:
         font = self._select_font(text_format='code')
-        self.canvas.create_text(x, y, text=text, fill='red', font=font, anchor='nw')
-        return y + font.metrics()['linespace']
+        self.canvas.create_text(x, y, text=text, fill='red', font=self._fonts.font(font), anchor='nw')
+        return y + self._fonts.linespace(font)
 
     def render_slide_number(self, text):
         font = self._select_font(text_format='code')
         screen_width = self._screen_width
         screen_height = self._screen_height
-        self.canvas.create_text(screen_width - 50, screen_height - 30, text=text, fill='gray', font=font, anchor='se')
+        self.canvas.create_text(screen_width - 50, screen_height - 30, text=text, fill='gray',
+                                font=self._fonts.font(font), anchor='se')
+
+
+class PillowFontRegistry:
+    """FontRegistry interface for exports, Tk font families mapped to TrueType files found by Pillow"""
+
+    # Tk sizes are points, rendered like Tk on a 96 dpi screen
+    PIXELS_PER_POINT = 96 / 72
+
+    FONT_FILES = {
+        "Courier": ("LiberationMono", "DejaVuSansMono"),
+        "Arial": ("LiberationSans", "DejaVuSans"),
+    }
+    STYLE_SUFFIXES = {
+        ("normal", "roman"): ("-Regular", ""),
+        ("bold", "roman"): ("-Bold",),
+        ("normal", "italic"): ("-Italic", "-Oblique"),
+        ("bold", "italic"): ("-BoldItalic", "-BoldOblique"),
+    }
+
+    def __init__(self):
+        self._fonts = {}
+        self._widths = {}
+
+    def font(self, key: FontKey):
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = self._load(key)
+        return font
+
+    def measure(self, key: FontKey, text: str) -> int:
+        width = self._widths.get((key, text))
+        if width is None:
+            width = self._widths[(key, text)] = round(self.font(key).getlength(text))
+        return width
+
+    def linespace(self, key: FontKey) -> int:
+        ascent, descent = self.font(key).getmetrics()
+        return ascent + descent
+
+    def _load(self, key: FontKey):
+        from PIL import ImageFont
+
+        size = round(key.size * self.PIXELS_PER_POINT)
+        # Missing bold or italic files fall back to the regular style of the same family
+        suffixes = self.STYLE_SUFFIXES[(key.weight, key.slant)] + self.STYLE_SUFFIXES[("normal", "roman")]
+        for name in self.FONT_FILES.get(key.family, self.FONT_FILES["Arial"]):
+            for suffix in suffixes:
+                try:
+                    return ImageFont.truetype(f"{name}{suffix}.ttf", size)
+                except OSError:
+                    pass
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow before 10.1 has a single bitmap default font, without sizes or metrics
+            raise RuntimeError("No Liberation or DejaVu fonts found, install fonts-liberation "
+                               "or Pillow 10.1 or newer") from None
+
+
+@dataclass(frozen=True)
+class PillowPhotoImage:
+    """Pillow image with the size methods of ImageTk.PhotoImage"""
+    image: Image.Image
+
+    def width(self) -> int:
+        return self.image.width
+
+    def height(self) -> int:
+        return self.image.height
+
+
+class PillowImages:
+    """ImagePrefetcher interface for exports, scaled images come from the shared disk cache or a bundle"""
+
+    # Recently used images, a slide is measured before it is drawn
+    MAX_IMAGES = 8
+
+    def __init__(self, source):
+        self._source = source
+        self.sizes = ImageSizes(source)
+        self._images: OrderedDict[ImageKey, PillowPhotoImage] = OrderedDict()
+
+    def photo_image(self, path: str, max_width: int, max_height: int) -> PillowPhotoImage:
+        key = self._source.image_key(path, max_width, max_height)
+        photo_image = self._images.get(key)
+        if photo_image is None:
+            image = self._source.load(key)
+            photo_image = PillowPhotoImage(image if image.mode in ('RGB', 'RGBX') else image.convert('RGBA'))
+            self._images[key] = photo_image
+            if len(self._images) > self.MAX_IMAGES:
+                self._images.popitem(last=False)
+        self._images.move_to_end(key)
+        return photo_image
+
+
+class PillowCanvas:
+    """The subset of tk.Canvas used by SlideRenderer, drawing into a Pillow image"""
+
+    TEXT_ANCHORS = {'nw': 'la', 'ne': 'ra', 'se': 'rd', 'sw': 'ld'}
+
+    def __init__(self, width: int, height: int, background='black'):
+        from PIL import ImageDraw
+
+        self.image = Image.new('RGB', (width, height), background)
+        self._draw = ImageDraw.Draw(self.image)
+
+    def create_text(self, x, y, text, fill, font, anchor='nw'):
+        self._draw.text((x, y), text, fill=fill, font=font, anchor=self.TEXT_ANCHORS[anchor])
+
+    def create_image(self, x, y, image: PillowPhotoImage, anchor='nw'):
+        if anchor == 'n':
+            x -= image.width() // 2
+        elif anchor == 'ne':
+            x -= image.width()
+        # Transparent images are blended over the background, as on the Tk canvas
+        mask = image.image if image.image.mode == 'RGBA' else None
+        self.image.paste(image.image, (int(x), int(y)), mask)
+
+
+class PdfWriter:
+    """
+    Minimal PDF writer with one JPEG image per page, the JPEG data is embedded as is. Pages are written as they
+    arrive, unlike Pillow's PDF plugin which re-encodes every page and holds them all in memory.
+    """
+
+    def __init__(self, file, page_width: float, page_height: float):
+        self._file = file
+        self._page_width = page_width
+        self._page_height = page_height
+        self._offsets = {}
+        self._page_ids = []
+        # Object 1 is the catalog and object 2 the page tree, both written last
+        self._next_id = 3
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_jpeg_page(self, jpeg: bytes, width: int, height: int):
+        image_id = self._write_object(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8 "
+            b"/Filter /DCTDecode /Length %d >>" % (width, height, len(jpeg)),
+            jpeg,
+        )
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (self._page_width, self._page_height)
+        content_id = self._write_object(b"<< /Length %d >>" % len(content), content)
+        page_id = self._write_object(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /XObject << /Im0 %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (self._page_width, self._page_height, image_id, content_id)
+        )
+        self._page_ids.append(page_id)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)), object_id=2)
+        self._write_object(b"<< /Type /Catalog /Pages 2 0 R >>", object_id=1)
+
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next_id)
+        for object_id in range(1, self._next_id):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[object_id])
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._next_id, xref_offset))
+
+    def _write_object(self, dictionary: bytes, stream: Optional[bytes] = None, object_id: Optional[int] = None) -> int:
+        if object_id is None:
+            object_id = self._next_id
+            self._next_id += 1
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n%s\n" % (object_id, dictionary))
+        if stream is not None:
+            self._file.write(b"stream\n%s\nendstream\n" % stream)
+        self._file.write(b"endobj\n")
+        return object_id
+
+
+# Per process state of export workers, set up once by _init_export_worker
+_export_worker = None
+
+
+def _init_export_worker(markdown_file: str, width: int, height: int):
+    global _export_worker
+    if DeckBundle.is_bundle(markdown_file):
+        bundle = DeckBundle(markdown_file)
+        slides, images = bundle.slides, PillowImages(bundle)
+    else:
+        slides, images = Parser(markdown_file).parse_markdown(), PillowImages(ImageCache())
+    fonts = PillowFontRegistry()
+    _export_worker = (slides, fonts, images, TextLayout(fonts), CodeHighlighter(), width, height)
+
+
+def _export_slide(index: int, image_format: str) -> bytes:
+    slides, fonts, images, layout, highlighter, width, height = _export_worker
+    canvas = PillowCanvas(width, height)
+    renderer = SlideRenderer(canvas=canvas, fonts=fonts, images=images, width=width, height=height, layout=layout,
+                             highlighter=highlighter)
+    renderer.render_slide(slides[index], f"Slide {index + 1} / {len(slides)}")
+
+    output = io.BytesIO()
+    if image_format == 'JPEG':
+        canvas.image.save(output, format='JPEG', quality=90)
+    else:
+        canvas.image.save(output, format='PNG', compress_level=1)
+    return output.getvalue()
+
+
+class BundleSlides(Sequence[Slide]):
+    """Slides loaded from a bundle, with the hashes of their markdown like LazySlides"""
+
+    def __init__(self, slides: List[Slide], hashes: List[str]):
+        self._slides = slides
+        self.hashes = hashes
+
+    def __len__(self) -> int:
+        return len(self._slides)
+
+    def __getitem__(self, index):
+        return self._slides[index]
+
+
+@dataclass(frozen=True)
+class BundleImage:
+    """Raw pixels of a scaled image in the bundle file"""
+    offset: int
+    mode: str
+    width: int
+    height: int
+
+
+class DeckBundle:
+    """
+    Deck compiled by --bundle, an uncompressed ZIP with the parsed slides as JSON and images scaled for common projector
+    resolutions as raw pixels. The file is memory-mapped and images are used in place, opening the deck and showing a
+    slide parse no markdown and decode no image files. Videos are extracted to the cache directory.
+    """
+
+    VERSION = 1
+    SLIDES_MEMBER = 'slides.json'
+    ELEMENT_TYPES = {
+        element_type.__name__: element_type
+        for element_type in (TitleElement, TextElement, CodeBlockElement, ImageElement, VideoElement)
+    }
+
+    def __init__(self, path: str):
+        with zipfile.ZipFile(path) as archive:
+            deck = json.loads(archive.read(self.SLIDES_MEMBER))
+            if deck.get('version') != self.VERSION:
+                raise ValueError(f"Unsupported bundle version: {deck.get('version')}")
+            infos = {info.filename: info for info in archive.infolist()}
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            video_paths = self._extract_videos(path, archive, deck['videos'])
+
+        # Largest first, for each image
+        self._images: dict[str, List[BundleImage]] = {
+            image_id: sorted(
+                (BundleImage(self._data_offset(infos[variant['member']]), variant['mode'], *variant['size'])
+                 for variant in variants),
+                key=lambda image: image.width * image.height,
+                reverse=True,
+            )
+            for image_id, variants in deck['images'].items()
+        }
+        self.slides = BundleSlides(
+            [Slide([self._element(element, video_paths) for element in slide['elements']], slide['notes'])
+             for slide in deck['slides']],
+            [slide['hash'] for slide in deck['slides']],
+        )
+
+    @staticmethod
+    def is_bundle(path: str) -> bool:
+        return zipfile.is_zipfile(path)
+
+    def image_key(self, path: str, max_width: int, max_height: int) -> ImageKey:
+        if path not in self._images:
+            raise FileNotFoundError(f"Not in bundle: {path}")
+        return ImageKey(path, 0, max_width, max_height)
+
+    def image_size(self, key: ImageKey) -> tuple[int, int]:
+        """Size of the image load returns, decodes nothing"""
+        variants = self._images[key.path]
+        fitting = [image for image in variants if image.width <= key.max_width and image.height <= key.max_height]
+        if fitting:
+            return fitting[0].width, fitting[0].height
+        return scaled_size(variants[-1].width, variants[-1].height, key.max_width, key.max_height)
+
+    def load(self, key: ImageKey) -> Image.Image:
+        """Largest bundled size that fits, a view of the mapped file. Smaller screens than bundled get a scaled copy"""
+        variants = self._images[key.path]
+        fitting = [image for image in variants if image.width <= key.max_width and image.height <= key.max_height]
+        variant = fitting[0] if fitting else variants[-1]
+        length = variant.width * variant.height * len(variant.mode)
+        data = memoryview(self._mmap)[variant.offset:variant.offset + length]
+        image = Image.frombuffer(variant.mode, (variant.width, variant.height), data, 'raw', variant.mode, 0, 1)
+        if not fitting:
+            image = image.copy()
+            image.thumbnail((key.max_width, key.max_height), Image.Resampling.LANCZOS)
+        return image
+
+    def _data_offset(self, info: zipfile.ZipInfo) -> int:
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Compressed bundle member: {info.filename}")
+        name_length, extra_length = struct.unpack('<HH', self._mmap[info.header_offset + 26:info.header_offset + 30])
+        return info.header_offset + 30 + name_length + extra_length
+
+    @staticmethod
+    def _extract_videos(path: str, archive: zipfile.ZipFile, videos: dict[str, str]) -> dict[str, str]:
+        bundle_stat = os.stat(path)
+        digest = hashlib.sha1(f"{os.path.abspath(path)}\0{bundle_stat.st_mtime_ns}".encode()).hexdigest()
+        directory = cache_directory() / "bundles" / digest
+        video_paths = {}
+        for video_id, member in videos.items():
+            video_path = directory / Path(member).name
+            if not video_path.exists():
+                directory.mkdir(parents=True, exist_ok=True)
+                tmp_path = video_path.with_suffix(f".{os.getpid()}.tmp")
+                with archive.open(member) as source, open(tmp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(tmp_path, video_path)
+            video_paths[video_id] = str(video_path)
+        return video_paths
+
+    def _element(self, data: dict, video_paths: dict[str, str]) -> Element:
+        data = dict(data)
+        element_type = self.ELEMENT_TYPES[data.pop('type')]
+        if 'segments' in data:
+            data['segments'] = [TextSegment(**segment) for segment in data['segments']]
+        if element_type is VideoElement:
+            data['path'] = video_paths.get(data['path'], data['path'])
+        return element_type(**data)
+
+
+class DeckBundler:
+    """Compiles a markdown deck into a DeckBundle, images are scaled for each of the screen sizes"""
+
+    # Common projector resolutions
+    SIZES = ((1920, 1080), (1280, 800), (1024, 768))
+
+    def __init__(self, markdown_file: str, sizes: Sequence[tuple[int, int]] = SIZES):
+        self.markdown_file = markdown_file
+        self.sizes = sizes
+
+    def write(self, output: str):
+        slides = Parser(self.markdown_file).parse_markdown()
+        cache = ImageCache()
+        images: dict[str, List[dict]] = {}
+        videos: dict[str, str] = {}
+
+        tmp_output = f"{output}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_output, 'w', zipfile.ZIP_STORED) as archive:
+            deck_slides = []
+            for index, slide in enumerate(slides):
+                elements = []
+                for element in slide.elements:
+                    data = dataclasses.asdict(element)
+                    data['type'] = type(element).__name__
+                    if isinstance(element, ImageElement):
+                        data['path'] = self._add_image(archive, cache, element.path, images)
+                    elif isinstance(element, VideoElement):
+                        data['path'] = self._add_video(archive, element.path, videos)
+                    elements.append(data)
+                deck_slides.append({'hash': slides.hashes[index], 'notes': slide.notes, 'elements': elements})
+
+            deck = {'version': DeckBundle.VERSION, 'slides': deck_slides, 'images': images, 'videos': videos}
+            archive.writestr(DeckBundle.SLIDES_MEMBER, json.dumps(deck))
+        os.replace(tmp_output, output)
+        print(f"Bundled {len(slides)} slides, {len(images)} images and {len(videos)} videos to {output}")
+
+    def _add_image(self, archive: zipfile.ZipFile, cache: ImageCache, path: str, images: dict[str, List[dict]]) -> str:
+        image_id = hashlib.sha1(path.encode()).hexdigest()
+        if image_id in images:
+            return image_id
+
+        variants = []
+        for width, height in self.sizes:
+            try:
+                image = cache.load(ImageKey.for_path(path, *SlideRenderer.max_image_size_for(width, height)))
+            except FileNotFoundError as e:
+                # Kept by path, the slide shows the file as not found
+                print(f"Image not bundled: {path} - {e}")
+                return path
+            except Exception as e:
+                print(f"Image not bundled: {path} - {e}")
+                return image_id
+            # Small images are the same for all sizes
+            if any(variant['size'] == [image.width, image.height] for variant in variants):
+                continue
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            mode = 'RGBA' if has_alpha else 'RGBX'
+            member = f"images/{image_id}/{image.width}x{image.height}.{mode.lower()}"
+            archive.writestr(member, image.convert(mode).tobytes())
+            variants.append({'member': member, 'mode': mode, 'size': [image.width, image.height]})
+        images[image_id] = variants
+        return image_id
+
+    @staticmethod
+    def _add_video(archive: zipfile.ZipFile, path: str, videos: dict[str, str]) -> str:
+        if not os.path.exists(path):
+            # Kept by path, the slide shows the file as not found
+            print(f"Video not bundled: {path} - file not found")
+            return path
+        video_id = hashlib.sha1(path.encode()).hexdigest()
+        if video_id not in videos:
+            member = f"videos/{video_id}{Path(path).suffix}"
+            archive.write(path, member)
+            videos[video_id] = member
+        return video_id
+
+
+class SlideExporter:
+    """Renders slides without a display in a process pool, into a PDF or a directory of PNG files"""
+
+    # Slides are sent to workers in chunks, so a worker parses neighbouring slides and reuses their images
+    CHUNK_SIZE = 4
+
+    def __init__(self, markdown_file: str, width: int, height: int, workers: Optional[int] = None):
+        self.markdown_file = markdown_file
+        self.width = width
+        self.height = height
+        self.workers = workers
+
+    def export(self, output: str):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        started_at = time.perf_counter()
+        if DeckBundle.is_bundle(self.markdown_file):
+            slide_count = len(DeckBundle(self.markdown_file).slides)
+        else:
+            slide_count = len(Parser(self.markdown_file).parse_markdown())
+        is_pdf = output.lower().endswith('.pdf')
+
+        # Spawned workers, the parser's path check thread must not be forked
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_export_worker,
+            initargs=(self.markdown_file, self.width, self.height),
+        ) as executor:
+            pages = executor.map(
+                _export_slide,
+                range(slide_count),
+                ['JPEG' if is_pdf else 'PNG'] * slide_count,
+                chunksize=self.CHUNK_SIZE,
+            )
+            if is_pdf:
+                self._write_pdf(output, pages)
+            else:
+                self._write_pngs(output, pages)
+
+        elapsed = time.perf_counter() - started_at
+        print(f"Exported {slide_count} slides to {output} in {elapsed:.1f} s")
+
+    def _write_pdf(self, output: str, pages):
+        # Pages are 10 inches wide, at the aspect ratio of the export resolution
+        page_width = 720
+        page_height = page_width * self.height / self.width
+        with open(output, 'wb') as file:
+            writer = PdfWriter(file, page_width, page_height)
+            for page in pages:
+                writer.add_jpeg_page(page, self.width, self.height)
+            writer.close()
+
+    @staticmethod
+    def _write_pngs(output: str, pages):
+        directory = Path(output)
+        directory.mkdir(parents=True, exist_ok=True)
+        for index, page in enumerate(pages):
+            (directory / f"slide-{index + 1:03d}.png").write_bytes(page)
+
+
+@dataclass(frozen=True)
+class FrameKey:
+    """Rendered slide, the slide number is part of the image"""
+    slide_hash: str
+    slide_info: str
+    width: int
+    height: int
+
+
+class SlideFrameCache:
+    """
+    Slides drawn offscreen with Pillow in a worker thread, for slides which aren't on screen, e.g. the next slide in
+    the presenter view. Drawing them never delays the Tk thread, frames are handed over by poll.
+    """
+
+    MAX_FRAMES = 8
+
+    def __init__(self, image_source):
+        self._image_source = image_source
+        self._frames: OrderedDict[FrameKey, Image.Image] = OrderedDict()
+        self._requests: queue.Queue[tuple[FrameKey, Slide]] = queue.Queue()
+        self._rendered: queue.Queue[tuple[FrameKey, Optional[Image.Image]]] = queue.Queue()
+        self._requested: set[FrameKey] = set()
+        # Replaced by prefetch, requests no longer wanted are skipped by the worker
+        self._wanted: frozenset[FrameKey] = frozenset()
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def prefetch(self, slides: List[tuple[FrameKey, Slide]]):
+        """Frames in the order of rendering, replaces frames requested before"""
+        self._wanted = frozenset(key for key, _ in slides)
+        for key, slide in slides:
+            if key not in self._frames and key not in self._requested:
+                self._requested.add(key)
+                self._requests.put((key, slide))
+
+    def poll(self) -> bool:
+        """True when frames were rendered since the last poll"""
+        rendered = False
+        while not self._rendered.empty():
+            key, frame = self._rendered.get_nowait()
+            self._requested.discard(key)
+            if frame is not None:
+                self._frames[key] = frame
+                rendered = True
+        while len(self._frames) > self.MAX_FRAMES:
+            self._frames.popitem(last=False)
+        return rendered
+
+    def get(self, key: FrameKey) -> Optional[Image.Image]:
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+        return frame
+
+    def _work(self):
+        fonts = PillowFontRegistry()
+        images = PillowImages(self._image_source)
+        layout = TextLayout(fonts)
+        highlighter = CodeHighlighter()
+        while True:
+            key, slide = self._requests.get()
+            if key not in self._wanted:
+                self._rendered.put((key, None))
+                continue
+            try:
+                canvas = PillowCanvas(key.width, key.height)
+                renderer = SlideRenderer(canvas, fonts, images, key.width, key.height, layout, highlighter)
+                renderer.render_slide(slide, key.slide_info)
+                frame = canvas.image
+            except Exception as e:
+                print(f"Slide not rendered offscreen: {e}")
+                frame = None
+            self._rendered.put((key, frame))
+
+
+class PresenterView:
+    """Window for the presenter with the current and next slide, the time since the start and the speaker notes"""
+
+    CURRENT_SIZE = (640, 360)
+    NEXT_SIZE = (400, 225)
+
+    def __init__(self, root: tk.Tk, frames: SlideFrameCache, geometry: Optional[str] = None):
+        self._frames = frames
+        self.window = tk.Toplevel(root)
+        self.window.title("Presenter View")
+        self.window.configure(bg='black')
+        if geometry:
+            self.window.geometry(geometry)
+
+        label_options = dict(bg='black', fg='gray', font=("Arial", 14))
+        self._current = tk.Label(self.window, text="Current", compound='top', **label_options)
+        self._next = tk.Label(self.window, text="Next", compound='top', **label_options)
+        self._timer = tk.Label(self.window, bg='black', fg='white', font=("Courier", 32, "bold"))
+        self._notes = tk.Text(self.window, bg='black', fg='white', font=("Arial", 18), wrap='word',
+                              highlightthickness=0, borderwidth=0)
+        self._current.grid(row=0, column=0, rowspan=2, sticky='nw', padx=10, pady=10)
+        self._next.grid(row=0, column=1, sticky='nw', padx=10, pady=10)
+        self._timer.grid(row=1, column=1, sticky='nw', padx=10)
+        self._notes.grid(row=2, column=0, columnspan=2, sticky='nsew', padx=10, pady=10)
+        self.window.grid_rowconfigure(2, weight=1)
+        self.window.grid_columnconfigure(1, weight=1)
+
+        self._keys: tuple[Optional[FrameKey], Optional[FrameKey]] = (None, None)
+        self._shown: dict[tk.Label, Optional[FrameKey]] = {self._current: None, self._next: None}
+        # Tk shows photo images only while they are referenced
+        self._photo_images: dict[tk.Label, ImageTk.PhotoImage] = {}
+        self._started_at = time.monotonic()
+        self._tick()
+
+    def show(self, current: FrameKey, following: Optional[FrameKey], notes: str):
+        self._keys = (current, following)
+        self._notes.configure(state='normal')
+        self._notes.delete('1.0', 'end')
+        self._notes.insert('1.0', notes)
+        self._notes.configure(state='disabled')
+        self.update_frames()
+
+    def update_frames(self):
+        """Shows frames rendered by now, the others are shown by a later call"""
+        current, following = self._keys
+        self._show_frame(self._current, current, self.CURRENT_SIZE)
+        self._show_frame(self._next, following, self.NEXT_SIZE)
+
+    def _show_frame(self, label: tk.Label, key: Optional[FrameKey], size: tuple[int, int]):
+        if key is not None and key == self._shown[label]:
+            return
+        frame = self._frames.get(key) if key is not None else None
+        if frame is None:
+            label.configure(image='')
+            self._photo_images.pop(label, None)
+            self._shown[label] = None
+            return
+        # Integer reduction is much faster than resampling and good enough for a preview
+        factor = max(-(-frame.width // size[0]), -(-frame.height // size[1]), 1)
+        photo_image = ImageTk.PhotoImage(frame.reduce(factor))
+        label.configure(image=photo_image)
+        self._photo_images[label] = photo_image
+        self._shown[label] = key
+
+    def _tick(self):
+        elapsed = int(time.monotonic() - self._started_at)
+        self._timer.configure(text=f"{elapsed // 3600}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d}  "
+                                   f"({time.strftime('%H:%M')})")
+        self.window.after(1000, self._tick)
+
+
+class VideoPlayer:
+    """
+    mpv embedded into the canvas with --wid and controlled over its JSON IPC socket. The process is started paused
+    before the video slide is shown, so the first frame is already decoded when playback starts.
+    """
+
+    CONNECT_TIMEOUT_S = 0.01
+
+    def __init__(self, master: tk.Misc):
+        self._frame = tk.Frame(master, bg='black')
+        # Other users can create files in /tmp, the socket lives in a private directory created by mkdtemp (mode 0700)
+        self._socket_directory = tempfile.mkdtemp(prefix="present-mpv-", dir=os.environ.get("XDG_RUNTIME_DIR") or None)
+        self._socket_path = os.path.join(self._socket_directory, "mpv.sock")
+        self._process: Optional[subprocess.Popen] = None
+        self._connection: Optional[socket.socket] = None
+        # Commands sent before mpv accepts connections, flushed by poll
+        self._pending: List[bytes] = []
+        self.path: Optional[str] = None
+        self.visible = False
+
+    def prepare(self, path: str):
+        """Loads the video paused, reusing a running mpv process"""
+        if path == self.path and self._process is not None:
+            return
+        self.path = path
+        if self._process is None:
+            self._spawn(path)
+        else:
+            self._command("loadfile", path)
+            self._command("set_property", "pause", True)
+
+    def toggle(self, path: str):
+        """Shows and plays the video, or pauses and resumes it when it is already shown"""
+        if path != self.path or self._process is None:
+            self.hide()
+            self.prepare(path)
+            if self._process is None:
+                return
+        if self.visible:
+            self._command("cycle", "pause")
+        else:
+            self._frame.place(x=0, y=0, relwidth=1, relheight=1)
+            self._frame.lift()
+            self.visible = True
+            self._command("set_property", "pause", False)
+
+    def seek(self, seconds: float):
+        if self.visible:
+            self._command("seek", seconds, "relative")
+
+    def hide(self):
+        """Pauses and rewinds, the embedded window is removed from the slide"""
+        if self.visible:
+            self._frame.place_forget()
+            self.visible = False
+            self._command("set_property", "pause", True)
+            self._command("seek", 0, "absolute")
+
+    def poll(self):
+        """Connects to a started mpv, sends pending commands and drains its event messages"""
+        if self._process is None:
+            return
+        if self._process.poll() is not None:
+            print(f"Video player exited: {self.path}")
+            self._reset()
+            return
+        if self._connection is None:
+            self._connect()
+        if self._connection is None:
+            return
+
+        try:
+            while self._pending:
+                self._connection.sendall(self._pending.pop(0))
+            while self._connection.recv(65536):
+                pass
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            print(f"Video player connection lost: {e}")
+            self.close()
+
+    def close(self):
+        if self._process is not None:
+            self._process.terminate()
+        self._reset()
+        shutil.rmtree(self._socket_directory, ignore_errors=True)
+
+    def _spawn(self, path: str):
+        try:
+            os.unlink(self._socket_path)
+        except FileNotFoundError:
+            pass
+        try:
+            # Keys stay with the presenter, mpv only draws into the frame
+            self._process = subprocess.Popen([
+                'mpv',
+                f'--wid={self._frame.winfo_id()}',
+                f'--input-ipc-server={self._socket_path}',
+                '--pause',
+                '--keep-open=yes',
+                '--no-terminal',
+                '--no-osc',
+                '--no-input-default-bindings',
+                '--input-vo-keyboard=no',
+                '--input-cursor=no',
+                path,
+            ], stdin=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"Error playing video: {e}")
+            self.path = None
+
+    def _connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.CONNECT_TIMEOUT_S)
+        try:
+            connection.connect(self._socket_path)
+        except OSError:
+            connection.close()
+            return
+        connection.setblocking(False)
+        self._connection = connection
+
+    def _command(self, *command):
+        self._pending.append(json.dumps({"command": command}).encode() + b"\n")
+        self.poll()
+
+    def _reset(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._frame.place_forget()
+        self._process = None
+        self._connection = None
+        self._pending = []
+        self.path = None
+        self.visible = False
+
+
+class Crossfade:
+    """Blends the offscreen frame of the previous slide into the new one, on a canvas above the slide canvases"""
+
+    STEPS = 8
+    STEP_MS = 20
+
+    def __init__(self, master: tk.Misc):
+        self._canvas = tk.Canvas(master, bg='black', highlightthickness=0)
+        self._item = self._canvas.create_image(0, 0, anchor='nw')
+        self._photo_image: Optional[ImageTk.PhotoImage] = None
+        self._after_id = None
+
+    def start(self, old: Image.Image, new: Image.Image):
+        self.stop()
+        self._canvas.place(x=0, y=0, relwidth=1, relheight=1)
+        # Canvas.lift raises canvas items (tag_raise), not the widget
+        tk.Misc.tkraise(self._canvas)
+        # First step is drawn with the new slide, so the new slide is never shown before the fade
+        self._step(old, new, 1)
+
+    def stop(self):
+        if self._after_id is not None:
+            self._canvas.after_cancel(self._after_id)
+            self._after_id = None
+        self._canvas.place_forget()
+        self._photo_image = None
+
+    def _step(self, old: Image.Image, new: Image.Image, step: int):
+        if step >= self.STEPS:
+            self._after_id = None
+            self.stop()
+            return
+        self._photo_image = ImageTk.PhotoImage(Image.blend(old, new, step / self.STEPS))
+        self._canvas.itemconfigure(self._item, image=self._photo_image)
+        self._after_id = self._canvas.after(self.STEP_MS, self._step, old, new, step + 1)
 
 
 class MarkdownPresenter:
-    def __init__(self, markdown_file):
+    # Images of this many slides before and after the current one are loaded in advance
+    PREFETCH_SLIDES = 2
+    POLL_INTERVAL_MS = 50
+    VIDEO_SEEK_S = 5
+
+    def __init__(self, markdown_file, presenter_view=False, presenter_geometry: Optional[str] = None,
+                 transition='cut'):
         self.markdown_file = markdown_file
+        self.transition = transition
         self.current_slide = 0
         self.slides = []
         self.current_video = None
 
-        # Parse markdown file
-        self.slides = Parser(markdown_file).parse_markdown()
+        # Parse markdown file, bundles are loaded as they are and not watched
+        image_source = None
+        if DeckBundle.is_bundle(markdown_file):
+            self.parser = None
+            self.watcher = None
+            image_source = DeckBundle(markdown_file)
+            self.slides = image_source.slides
+        else:
+            self.parser = Parser(markdown_file)
+            self.slides = self.parser.parse_markdown()
+            self.watcher = FileWatcher(markdown_file)
 
         # Setup GUI
         self.root = tk.Tk()
@@ -369,71 +2038,178 @@ class MarkdownPresenter:
         self.base_normal_size = 24
         self.base_code_size = 20
 
-        # Create canvas for rendering
-        self.canvas = tk.Canvas(self.root, bg='black', highlightthickness=0)
-        self.canvas.pack(fill=tk.BOTH, expand=True)
+        # Fonts and text measurements are reused by all slides
+        self.fonts = FontRegistry()
+        self.layout = TextLayout(self.fonts)
+        self.highlighter = CodeHighlighter()
+        self.images = ImagePrefetcher(ImageCache(), image_source)
+        self.frames = SlideFrameCache(self.images.source)
+
+        # Slides are drawn on the canvas below and raised when complete, the visible canvas is self.canvas
+        self.canvases = tuple(tk.Canvas(self.root, bg='black', highlightthickness=0) for _ in range(2))
+        for canvas in self.canvases:
+            canvas.place(x=0, y=0, relwidth=1, relheight=1)
+        self.canvas = self.canvases[1]
+        self.crossfade = Crossfade(self.root)
+        self._shown_frame_key: Optional[FrameKey] = None
+        self.video_player = VideoPlayer(self.root)
 
         # Wait for window to be fully rendered to get accurate dimensions
         self.root.update_idletasks()
 
-        # Bind keys
-        self.root.bind('<Right>', lambda e: self.next_slide())
-        self.root.bind('<Left>', lambda e: self.prev_slide())
-        self.root.bind('<space>', lambda e: self.toggle_video())
-        self.root.bind('<Escape>', lambda e: self.root.quit())
-        self.root.bind('q', lambda e: self.root.quit())
+        self.presenter_view = None
+        if presenter_view:
+            self.presenter_view = PresenterView(self.root, self.frames, presenter_geometry)
+            self._bind_keys(self.presenter_view.window)
+        self._bind_keys(self.root)
 
         # Display first slide
         self.display_slide()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _bind_keys(self, window):
+        window.bind('<Right>', lambda e: self.next_slide())
+        window.bind('<Left>', lambda e: self.prev_slide())
+        window.bind('<space>', lambda e: self.toggle_video())
+        window.bind('<period>', lambda e: self.video_player.seek(self.VIDEO_SEEK_S))
+        window.bind('<comma>', lambda e: self.video_player.seek(-self.VIDEO_SEEK_S))
+        window.bind('<Escape>', lambda e: self.root.quit())
+        window.bind('q', lambda e: self.root.quit())
 
     def display_slide(self):
-        """Display current slide"""
-        self.canvas.delete('all')
+        """Draws the current slide on the hidden canvas and raises it, so a partly drawn slide is never visible"""
+        self.video_player.hide()
+        self.crossfade.stop()
 
         if self.current_slide >= len(self.slides):
+            self.canvas.delete('all')
             return
 
         slide = self.slides[self.current_slide]
+        shown_canvas = self.canvas
+        self.canvas = self.canvases[0] if shown_canvas is self.canvases[1] else self.canvases[1]
+        self.canvas.delete('all')
 
         slide_renderer = SlideRenderer(
-            root=self.root,
-            canvas=self.canvas
+            canvas=self.canvas,
+            fonts=self.fonts,
+            images=self.images,
+            width=self.root.winfo_width(),
+            height=self.root.winfo_height(),
+            layout=self.layout,
+            highlighter=self.highlighter,
         )
 
-        y = 100
-        x = 100
-
-        for element in slide.elements:
-            match element:
-                case TitleElement(segments=segments, align=align):
-                    y = slide_renderer.render_text(segments, x, y, align, is_title=True)
-                    y += 30
-
-                case TextElement(segments=segments, align=align):
-                    y = slide_renderer.render_text(segments, x, y, align)
-                    y += 10
+        video = slide_renderer.render_slide(slide, self._slide_info(self.current_slide))
+        if video is not None:
+            self.current_video = video
+
+        # Canvas.lift raises canvas items (tag_raise), not the widget
+        tk.Misc.tkraise(self.canvas)
+        shown_canvas.delete('all')
+        self._start_transition()
+
+        # Parses nearby slides too, after the slide is drawn
+        self.root.after_idle(self._prefetch_images, slide_renderer)
+        if self.presenter_view is not None or self.transition == 'fade':
+            self.root.after_idle(self._prefetch_frames)
+        if self.presenter_view is not None:
+            self.root.after_idle(self._update_presenter_view)
+
+    def _start_transition(self):
+        """Fades from cached offscreen frames, cuts when a frame isn't rendered yet"""
+        old_key = self._shown_frame_key
+        new_key = self._shown_frame_key = self._frame_key(self.current_slide)
+        if self.transition != 'fade' or old_key is None or old_key == new_key:
+            return
+        old_frame = self.frames.get(old_key)
+        new_frame = self.frames.get(new_key)
+        if old_frame is not None and new_frame is not None and old_frame.size == new_frame.size:
+            self.crossfade.start(old_frame, new_frame)
 
-                case CodeBlockElement(content=content):
-                    for line in content:
-                        y = slide_renderer.render_code_text(line, x, y)
-                    y += 20
+    def _slide_info(self, index: int) -> str:
+        return f"Slide {index + 1} / {len(self.slides)}"
 
-                case ImageElement(path=path, alt=alt, align=align):
-                    y = slide_renderer.render_image(path, align, x, y)
-                    y += 20
+    def _frame_key(self, index: int) -> FrameKey:
+        return FrameKey(self.slides.hashes[index], self._slide_info(index),
+                        self.root.winfo_width(), self.root.winfo_height())
 
-                case VideoElement(path=path, alt=alt, align=align):
-                    video_msg = f"🎬 Video: {alt}"
-                    y = slide_renderer.render_video_text(video_msg, "(Press SPACE to play/pause)", x, y)
-                    self.current_video = path
-                    y += 20
+    def _prefetch_frames(self):
+        """Offscreen frames of the current slide, the next two and the previous one"""
+        if self.current_slide >= len(self.slides):
+            return
+        indexes = [self.current_slide]
+        indexes += range(self.current_slide + 1, min(self.current_slide + 3, len(self.slides)))
+        if self.current_slide > 0:
+            indexes.append(self.current_slide - 1)
+        self.frames.prefetch([(self._frame_key(index), self.slides[index]) for index in indexes])
 
-                case _:
-                    raise TypeError(type(element))
+    def _update_presenter_view(self):
+        """Current and next slide come from offscreen frames"""
+        if self.current_slide >= len(self.slides):
+            return
+        following = self._frame_key(self.current_slide + 1) if self.current_slide + 1 < len(self.slides) else None
+        self.presenter_view.show(self._frame_key(self.current_slide), following,
+                                 self.slides[self.current_slide].notes)
+
+    def _prefetch_images(self, slide_renderer: 'SlideRenderer'):
+        """Images of the current slide are kept, following slides are loaded before previous ones"""
+        indexes = [self.current_slide]
+        indexes += range(self.current_slide + 1, min(self.current_slide + self.PREFETCH_SLIDES + 1, len(self.slides)))
+        indexes += range(self.current_slide - 1, max(self.current_slide - self.PREFETCH_SLIDES, 0) - 1, -1)
+
+        # At the size they are drawn at, fitting a slide measures image sizes from the file headers
+        self.images.prefetch([
+            request
+            for index in indexes
+            for request in slide_renderer.image_requests(self.slides[index])
+        ])
+
+        # Code blocks of nearby slides are tokenised now, not when their slide is shown
+        for index in indexes:
+            for element in self.slides[index].elements:
+                if isinstance(element, CodeBlockElement) and element.language:
+                    self.highlighter.highlight(element.language, element.content)
+
+        # A video on this or the next slide is loaded, so SPACE only has to unpause it
+        for index in indexes[:2]:
+            videos = [element.path for element in self.slides[index].elements
+                      if isinstance(element, VideoElement) and os.path.exists(element.path)]
+            if videos:
+                self.video_player.prepare(videos[-1])
+                break
+
+    def reload(self):
+        """Reparses changed slides, the current slide is rendered again only when it, or the slide count, changed"""
+        old_hashes = self.slides.hashes
+        slides = self.parser.reparse_markdown()
+        if slides is None:
+            return
 
-        # Display slide number
-        slide_info = f"Slide {self.current_slide + 1} / {len(self.slides)}"
-        slide_renderer.render_slide_number(slide_info)
+        self.slides = slides
+        new_hashes = slides.hashes
+        self.current_slide = max(min(self.current_slide, len(slides) - 1), 0)
+        current_changed = (
+            len(new_hashes) != len(old_hashes)
+            or self.current_slide >= len(new_hashes)
+            or new_hashes[self.current_slide] != old_hashes[self.current_slide]
+        )
+        if current_changed:
+            self.current_video = None
+            self.display_slide()
+        elif self.presenter_view is not None:
+            # The next slide or the notes may have changed
+            self._prefetch_frames()
+            self._update_presenter_view()
+
+    def _poll(self):
+        self.images.poll()
+        self.video_player.poll()
+        if self.frames.poll() and self.presenter_view is not None:
+            self.presenter_view.update_frames()
+        if self.watcher is not None and self.watcher.changed():
+            self.reload()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll)
 
     def next_slide(self):
         """Go to next slide"""
@@ -452,36 +2228,359 @@ class MarkdownPresenter:
     def toggle_video(self):
         """Toggle video playback"""
         if self.current_video:
-            print(f"Playing video: {self.current_video}")
-            # Open video with system player
-            try:
-                import subprocess
-                subprocess.Popen(['mpv', '--fullscreen', self.current_video])
-            except Exception as e:
-                print(f"Error playing video: {e}")
+            self.video_player.toggle(self.current_video)
         else:
             # If no video, space acts as next slide
             self.next_slide()
 
     def run(self):
         """Start the presentation"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.video_player.close()
+
+    def benchmark(self, rounds=20, report_path: Optional[str] = None):
+        """Render every slide repeatedly, including Tk drawing, and print mean times and the number of Tk fonts. With a
+        report path, the slides are first stepped through like in a talk and a JSON report is written"""
+        import resource
+
+        self.root.update()
+        report = self._benchmark_transitions() if report_path else {}
+        render_ms = self._benchmark_rendering(rounds)
+        tk_fonts = len(tkfont.names(self.root))
+
+        # Same slides with a Tk font per lookup and nothing memoised, like before fonts were shared
+        fonts, layout = self.fonts, self.layout
+        self.fonts = UnsharedFontRegistry()
+        unshared_render_ms = self._benchmark_rendering(rounds, fresh_layout=True)
+        self.fonts, self.layout = fonts, layout
+
+        for index, (elapsed_ms, unshared_ms) in enumerate(zip(render_ms, unshared_render_ms)):
+            print(f"Slide {index + 1}: {elapsed_ms:.2f} ms, unshared fonts {unshared_ms:.2f} ms")
+        print(f"Mean: {statistics.fmean(render_ms):.2f} ms, unshared fonts {statistics.fmean(unshared_render_ms):.2f} ms")
+        print(f"Tk fonts: {tk_fonts}")
+        print(f"Image cache: {self.images.cache.stats()}")
+
+        if report_path:
+            report.update({
+                "render_ms": percentiles(render_ms),
+                "unshared_fonts_render_ms": percentiles(unshared_render_ms),
+                "tk_fonts": tk_fonts,
+                "tk_images": len(self.root.tk.call('image', 'names')),
+                "image_cache": self.images.cache.stats(),
+                # Kilobytes on Linux
+                "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            })
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+        self.video_player.close()
+        self.root.destroy()
+
+    # Time between transitions of the benchmark, for prefetching like in a talk
+    BENCHMARK_DWELL_MS = 100
+
+    def _benchmark_rendering(self, rounds: int, fresh_layout=False) -> List[float]:
+        """Mean milliseconds per slide, a fresh layout per render memoises no line breaks across renders"""
+        render_ms = []
+        for index in range(len(self.slides)):
+            self.current_slide = index
+            started_at = time.perf_counter()
+            for _ in range(rounds):
+                if fresh_layout:
+                    self.layout = TextLayout(self.fonts)
+                self.display_slide()
+                self.root.update_idletasks()
+            render_ms.append((time.perf_counter() - started_at) * 1000 / rounds)
+        return render_ms
+
+    def _benchmark_transitions(self) -> dict:
+        """Parse time of a fresh parser, then latency of each transition until the new slide is drawn"""
+        started_at = time.perf_counter()
+        if self.parser is None:
+            slides = DeckBundle(self.markdown_file).slides
+        else:
+            slides = Parser(self.markdown_file).parse_markdown()
+        index_ms = (time.perf_counter() - started_at) * 1000
+        for _ in slides:
+            pass
+        parse_ms = (time.perf_counter() - started_at) * 1000
+
+        fonts_before = len(tkfont.names(self.root))
+        items_before = self._created_canvas_items()
+        latencies = []
+        max_items = 0
+        self.current_slide = 0
+        self.display_slide()
+        self.root.update()
+        for _ in range(len(self.slides) - 1):
+            dwell_until = time.perf_counter() + self.BENCHMARK_DWELL_MS / 1000
+            while time.perf_counter() < dwell_until:
+                self.root.update()
+                time.sleep(0.005)
+
+            started_at = time.perf_counter()
+            self.next_slide()
+            self.root.update_idletasks()
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            max_items = max(max_items, len(self.canvas.find_all()))
+
+        return {
+            "slides": len(self.slides),
+            "index_ms": index_ms,
+            "parse_ms": parse_ms,
+            "transition_ms": percentiles(latencies),
+            "tk_fonts_created": len(tkfont.names(self.root)) - fonts_before,
+            "canvas_items_created": self._created_canvas_items() - items_before - len(self.canvases),
+            "canvas_items_max": max_items,
+        }
+
+    def _created_canvas_items(self) -> int:
+        """Item ids of a canvas only grow, a new item's id is the number of items created on it"""
+        created = 0
+        for canvas in self.canvases:
+            probe = canvas.create_line(0, 0, 0, 0)
+            canvas.delete(probe)
+            created += probe
+        return created
+
+
+def percentiles(values: List[float]) -> dict[str, float]:
+    """Nearest-rank percentiles in milliseconds"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(percent: int) -> float:
+        return round(ordered[max(-(-len(ordered) * percent // 100) - 1, 0)], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class BenchmarkSuite:
+    """
+    Generates text, code and image decks and benchmarks each in a separate present.py process, under Xvfb when
+    installed, with an empty image cache. Results of the processes are written as one JSON report.
+    """
+
+    SCREEN = (1920, 1080)
+    TEXT_SLIDES = 60
+    CODE_SLIDES = 60
+    IMAGE_SLIDES = 30
+    IMAGE_FILES = 6
+    IMAGE_SIZE = (4000, 3000)
+
+    def __init__(self, report_path: Optional[str] = None, rounds=5):
+        self.report_path = report_path
+        self.rounds = rounds
+
+    def run(self):
+        import platform
+
+        with tempfile.TemporaryDirectory(prefix="present-benchmark-") as directory:
+            decks = self.generate(Path(directory))
+            env = dict(os.environ, XDG_CACHE_HOME=str(Path(directory) / "cache"))
+            xvfb = self._start_xvfb()
+            if xvfb is not None:
+                process, display = xvfb
+                env["DISPLAY"] = display
+            elif not env.get("DISPLAY"):
+                print("Error: Xvfb is not installed and there is no display: sudo apt install xvfb")
+                sys.exit(1)
+
+            try:
+                results = {name: self._run_deck(deck, env) for name, deck in decks.items()}
+            finally:
+                if xvfb is not None:
+                    xvfb[0].terminate()
+                    xvfb[0].wait()
+
+        report = {
+            "python": platform.python_version(),
+            "tk": tk.TkVersion,
+            "display": "xvfb" if xvfb is not None else "display",
+            "rounds": self.rounds,
+            "decks": results,
+        }
+        if self.report_path:
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Benchmark report written to {self.report_path}")
+        else:
+            print(json.dumps(report, indent=2))
+
+    def generate(self, directory: Path) -> dict[str, Path]:
+        """Markdown decks by name, large JPEGs are shared by the slides of the image deck"""
+        words = ("slide", "layout", "render", "canvas", "memoised", "**bold**", "*italic*", "`code`", "transition",
+                 "presenter", "fonts", "images", "wrapped", "markdown")
+        text_slides = []
+        for index in range(self.TEXT_SLIDES):
+            paragraphs = [
+                " ".join(words[(index + paragraph + word) % len(words)] for word in range(40))
+                for paragraph in range(4)
+            ]
+            text_slides.append(f"# Text slide {index + 1}\n" + "\n".join(paragraphs) + f"\n<center>Centered {index}</center>")
+
+        code_lines = [
+            "def fibonacci(n: int) -> int:",
+            '    """Returns the n-th Fibonacci number"""  # comment',
+            "    if n < 2:",
+            "        return n",
+            "    return fibonacci(n - 1) + fibonacci(n - 2)",
+            "",
+        ]
+        code_slides = [
+            f"# Code slide {index + 1}\n```python\n" + "\n".join(code_lines * 4) + "\n```"
+            for index in range(self.CODE_SLIDES)
+        ]
+
+        image_paths = []
+        for index in range(self.IMAGE_FILES):
+            image_path = directory / f"photo-{index}.jpg"
+            noise = Image.effect_noise(self.IMAGE_SIZE, 40 + index * 10)
+            gradient = Image.linear_gradient('L').resize(self.IMAGE_SIZE)
+            Image.merge('RGB', (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(
+                image_path, quality=90)
+            image_paths.append(image_path)
+        image_slides = [
+            f"# Image slide {index + 1}\n<center>![Photo]({image_paths[index % len(image_paths)].name})</center>"
+            for index in range(self.IMAGE_SLIDES)
+        ]
+
+        decks = {}
+        for name, slides in (("text", text_slides), ("code", code_slides), ("images", image_slides)):
+            decks[name] = directory / f"{name}.md"
+            decks[name].write_text("\n\n---\n\n".join(slides))
+        return decks
+
+    def _run_deck(self, deck: Path, env: dict[str, str]) -> dict:
+        report_path = deck.with_suffix(".json")
+        command = [sys.executable, os.path.abspath(__file__), str(deck), '--benchmark', '--report', str(report_path),
+                   '--rounds', str(self.rounds)]
+        print(f"Benchmarking {deck.name}")
+        completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            return {"error": f"exit code {completed.returncode}"}
+        with open(report_path) as f:
+            return json.load(f)
+
+    def _start_xvfb(self) -> Optional[tuple[subprocess.Popen, str]]:
+        """Xvfb on a free display, None when it is not installed"""
+        if shutil.which('Xvfb') is None:
+            return None
+        read_fd, write_fd = os.pipe()
+        width, height = self.SCREEN
+        process = subprocess.Popen(
+            ['Xvfb', '-displayfd', str(write_fd), '-screen', '0', f'{width}x{height}x24', '-nolisten', 'tcp'],
+            pass_fds=(write_fd,),
+            stderr=subprocess.DEVNULL,
+        )
+        os.close(write_fd)
+        # The display number is written once the server accepts connections
+        with os.fdopen(read_fd) as f:
+            display = f.readline().strip()
+        if not display:
+            process.wait()
+            return None
+        return process, f":{display}"
+
+
+def screen_size(value: str) -> tuple[int, int]:
+    """WIDTHxHEIGHT argument"""
+    match = re.fullmatch(r'(\d+)x(\d+)', value)
+    if match is None or 0 in (int(match[1]), int(match[2])):
+        raise argparse.ArgumentTypeError(f"invalid size {value!r}, expected WIDTHxHEIGHT, e.g. 1920x1080")
+    return int(match[1]), int(match[2])
+
+
+def screen_sizes(value: str) -> List[tuple[int, int]]:
+    """Comma separated WIDTHxHEIGHT argument"""
+    return [screen_size(size) for size in value.split(',')]
+
+
+def window_geometry(value: str) -> str:
+    """Tk window geometry argument, WIDTHxHEIGHT, +X+Y or both"""
+    if not value or re.fullmatch(r'=?(\d+x\d+)?([+-]-?\d+[+-]-?\d+)?', value) is None:
+        raise argparse.ArgumentTypeError(f"invalid geometry {value!r}, expected e.g. 1280x800+1920+0")
+    return value
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"invalid count {value!r}, expected a positive number")
+    return number
+
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 presenter.py <markdown_file>")
-        print("\nExample markdown format:")
-        print("# Title Slide")
-        print("This is **bold** and this is *italic*")
-        print("This is `code`")
-        print("---")
-        print("# Second Slide")
-        print("<center>Centered text</center>")
-        print("![Image](path/to/image.png)")
-        sys.exit(1)
-
-    presenter = MarkdownPresenter(sys.argv[1])
-    presenter.run()
+    parser = argparse.ArgumentParser(
+        description="Fullscreen presentation of a markdown deck or a bundle",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="example markdown format:\n"
+               "  # Title Slide\n"
+               "  This is **bold** and this is *italic*\n"
+               "  This is `code`\n"
+               "  ---\n"
+               "  # Second Slide\n"
+               "  <center>Centered text</center>\n"
+               "  ![Image](path/to/image.png)",
+    )
+    parser.add_argument("markdown_file", nargs="?", metavar="FILE", help="markdown deck or .present bundle")
+    parser.add_argument("--presenter", action="store_true",
+                        help="open the presenter view with the next slide, a timer and the speaker notes")
+    parser.add_argument("--presenter-geometry", type=window_geometry, metavar="GEOMETRY",
+                        help="size and position of the presenter view, e.g. 1280x800+1920+0")
+    parser.add_argument("--transition", choices=("cut", "fade"), default="cut",
+                        help="transition between slides (default: %(default)s)")
+    parser.add_argument("--export", metavar="OUTPUT",
+                        help="export the slides to a PDF file, or to a directory of PNG files, and exit")
+    parser.add_argument("--size", type=screen_size, default=(1920, 1080), metavar="WIDTHxHEIGHT",
+                        help="size of exported slides (default: 1920x1080)")
+    parser.add_argument("--bundle", metavar="OUTPUT", help="write the deck as a single bundle file and exit")
+    parser.add_argument("--sizes", type=screen_sizes, default=DeckBundler.SIZES, metavar="WIDTHxHEIGHT,...",
+                        help="screen sizes images of the bundle are scaled for "
+                             "(default: 1920x1080,1280x800,1024x768)")
+    parser.add_argument("--benchmark", action="store_true", help="time rendering of every slide and exit")
+    parser.add_argument("--report", metavar="FILE", help="write a JSON report of the benchmark to FILE")
+    parser.add_argument("--rounds", type=positive_int, default=20,
+                        help="renders of each slide by the benchmark (default: %(default)s)")
+    parser.add_argument("--benchmark-suite", nargs="?", const="", metavar="REPORT",
+                        help="benchmark synthetic decks under Xvfb and write a JSON report, needs no FILE")
+    args = parser.parse_args()
+
+    if args.benchmark_suite is not None:
+        BenchmarkSuite(args.benchmark_suite or None).run()
+        return
+
+    if args.markdown_file is None:
+        parser.error("the markdown file is required")
+
+    if args.bundle:
+        DeckBundler(args.markdown_file, args.sizes).write(args.bundle)
+        return
+
+    if args.export:
+        width, height = args.size
+        SlideExporter(args.markdown_file, width, height).export(args.export)
+        return
+
+    presenter = MarkdownPresenter(args.markdown_file, presenter_view=args.presenter,
+                                  presenter_geometry=args.presenter_geometry, transition=args.transition)
+    if args.benchmark:
+        presenter.benchmark(args.rounds, args.report)
+    else:
+        presenter.run()
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -4,27 +4,75 @@
 1. Overview - of all images in the directory.
 2. Detail - of a selected image (space)
 - UI - orchestration logic
-- OverviewModel / DetailModel - mutable application state
+- OverviewModel / DetailModel - mutable application state, overview images are updated and loaded only around the
+  viewport
+- GridLayout / JustifiedLayout - positions of overview images, square cells or lazily laid out rows keeping aspect
+  ratios (j)
 - ImageLoader - loads and resizes images in a worker thread (for the most cases) to prevent blocking UI
-- Renderer - draws Ui and images onto the screen
+- ThumbnailCache - persistent cache of resized images, can be filled in advance by `preview.py --warm DIR...`
+- MetadataIndex - persistent SQLite index of image metadata (EXIF date, dimensions, orientation) used for sorting
+  and filtering, filled incrementally in a worker thread
+- Renderer - draws Ui and images onto the screen, BandRenderer composites overview tiles into a few band images
+  (`preview.py --bands`)
+- PreviewApplication - windows of one process, sharing the image loader and its caches
+- PreviewDaemon - optional single instance (`preview.py --daemon`), later invocations open a new window in the running
+  process over a Unix socket, unless they pass options the daemon does not apply
+- BatchExporter - resizes and re-encodes marked images in a process pool
+- DuplicateFinder - groups near-duplicate images of a directory tree by perceptual hashes (`preview.py --duplicates`)
+- FilenameFilter - incremental fuzzy or glob filter of image names typed after '/'
+- TerminalApplication - overview and detail drawn by sixel graphics into a terminal (`preview.py --terminal`), uses
+  the same UI, models and image loader as the Tk application
+- InputCoalescer - applies accumulated scrolls, zooms and selection moves at most once per frame, FrameStats
+  histogram of their frame times (`preview.py --frame-stats`)
+- StartupTrace - timeline of the startup (`preview.py --startup-trace`)
+- MemoryProfiler - JSON report of cache bytes, live photo images and Python allocations (`preview.py --memory-report`)
+
+Heavy modules (Pillow, Tk, SQLite, process pool) are imported lazily, so the window is shown, or a running daemon is
+contacted, before they are loaded.
 """
+from __future__ import annotations
+
+import time
+
+_MODULE_STARTED_AT = time.perf_counter()
+
+import argparse
+import bisect
+import hashlib
 import io
+import json
+import os
 import queue
+import re
+import select
+import socket
+import subprocess
+import sys
+import termios
 import threading
-from dataclasses import dataclass
+import tty
+from dataclasses import dataclass, field
 from pathlib import Path
 from queue import Queue
-from tkinter import Canvas, Event, Tk
-from typing import Dict, Optional, Set, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+    import tracemalloc
+    from tkinter import Canvas, Event, Tk, Toplevel
 
-from PIL import Image, ImageTk
-from PIL.Image import Resampling
-from PIL.ImageTk import PhotoImage
+    from PIL import Image
+    from PIL.Image import Resampling
+    from PIL.ImageTk import PhotoImage
 
 
 @dataclass(frozen=True)
 class ImageFile:
-    name: str
+    path: Path
+
+    @property
+    def name(self) -> str:
+        return self.path.name
 
 
 @dataclass(frozen=True)
@@ -88,6 +136,8 @@ class Rectangle:
 class ImageLoadContext:
     image_loader: 'ImageLoader'
     mouse_position: Position
+    # Window the requests belong to, ImageLoader.cancel only drops requests of one owner
+    owner: object = None
 
 
 @dataclass(frozen=True)
@@ -102,6 +152,209 @@ class LoadedImage:
     photo_image: PhotoImage
 
 
+@dataclass(frozen=True)
+class ImageMetadata:
+    size: int
+    mtime_ns: int
+    width: int
+    height: int
+    orientation: int
+    taken_at: Optional[str]
+
+    @property
+    def oriented_dimensions(self) -> Dimensions:
+        # EXIF orientations 5-8 are rotated by 90 degrees
+        if self.orientation in (5, 6, 7, 8):
+            return Dimensions(self.height, self.width)
+        else:
+            return Dimensions(self.width, self.height)
+
+    def is_stat_equal(self, stat: os.stat_result) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+@dataclass(frozen=True)
+class ImageArrangement:
+    sort: str = "name"
+    orientation: str = "all"
+
+    SORTS = ("name", "date", "size")
+    ORIENTATIONS = ("all", "landscape", "portrait", "square")
+
+    def next_sort(self) -> "ImageArrangement":
+        return ImageArrangement(self._next(self.SORTS, self.sort), self.orientation)
+
+    def next_orientation(self) -> "ImageArrangement":
+        return ImageArrangement(self.sort, self._next(self.ORIENTATIONS, self.orientation))
+
+    def apply(self, image_files: list[ImageFile], metadata: Dict[ImageFile, ImageMetadata]) -> list[ImageFile]:
+        """Works with already indexed metadata only, images not yet indexed are kept at the end"""
+        image_files = [f for f in image_files if self._matches_orientation(metadata.get(f))]
+
+        match self.sort:
+            case "date":
+                def key(f: ImageFile):
+                    m = metadata.get(f)
+                    taken_at = m.taken_at if m and m.taken_at else None
+                    return taken_at is None, taken_at or "", f.name
+            case "size":
+                def key(f: ImageFile):
+                    m = metadata.get(f)
+                    return m is None, -(m.width * m.height) if m else 0, f.name
+            case _:
+                def key(f: ImageFile):
+                    return f.name
+
+        return sorted(image_files, key=key)
+
+    def _matches_orientation(self, m: Optional[ImageMetadata]) -> bool:
+        if self.orientation == "all":
+            return True
+        elif m is None or m.width == 0 or m.height == 0:
+            return False
+
+        dimensions = m.oriented_dimensions
+        match self.orientation:
+            case "landscape":
+                return dimensions.width > dimensions.height
+            case "portrait":
+                return dimensions.width < dimensions.height
+            case _:
+                return dimensions.width == dimensions.height
+
+    @staticmethod
+    def _next(values: Tuple[str, ...], value: str) -> str:
+        return values[(values.index(value) + 1) % len(values)]
+
+    def __str__(self) -> str:
+        return f"sort: {self.sort}, orientation: {self.orientation}"
+
+
+class FilenameFilter:
+    """
+    Type-to-filter of image files by name, case-insensitive. A query with glob characters (*?[) is matched as a glob
+    against the start of the name ("img_2024*", "*_edit"), otherwise as a fuzzy subsequence ("bch" matches
+    "beach.jpg"). Matches of every typed prefix are kept. Both kinds of queries only narrow when a character is added,
+    an unclosed [ matches any character, so a new character filters the previous matches only and backspace is a
+    lookup.
+    """
+    _GLOB_CHARACTERS = frozenset("*?[")
+    _GLOB_STAR = (".*", None)
+
+    def __init__(self, image_files: list[ImageFile]):
+        self._image_files: list[ImageFile] = []
+        self._names: list[str] = []
+        # (query, indexes of matching image files), the first entry is the empty query
+        self._results: list[Tuple[str, list[int] | range]] = [("", range(0))]
+        self.set_image_files(image_files)
+
+    @property
+    def query(self) -> str:
+        return self._results[-1][0]
+
+    @property
+    def indexes(self) -> list[int] | range:
+        """Indexes of matching image files, in the order of image files"""
+        return self._results[-1][1]
+
+    def set_image_files(self, image_files: list[ImageFile]):
+        """Replaces re-arranged image files, the current query is matched again"""
+        query = self.query
+        self._image_files = image_files
+        self._names = [image_file.name.lower() for image_file in image_files]
+        self._results = [("", range(len(image_files)))]
+        if query:
+            self._results.append((query, self._match(query, self._results[0][1])))
+
+    def push(self, character: str):
+        previous_query, previous_matches = self._results[-1]
+        query = previous_query + character.lower()
+        self._results.append((query, self._match(query, previous_matches)))
+
+    def pop(self):
+        if len(self._results) > 2:
+            self._results.pop()
+        elif len(self._results) == 2:
+            query = self._results.pop()[0][:-1]
+            if query:
+                self._results.append((query, self._match(query, self._results[0][1])))
+
+    def clear(self):
+        del self._results[1:]
+
+    def _match(self, query: str, candidates: list[int] | range) -> list[int]:
+        names = self._names
+        if self._is_glob(query):
+            # Name only needs to start with a match, so trailing * are left out and a leading * is a search
+            tokens = self._glob_tokens(query)
+            while tokens and tokens[-1] == self._GLOB_STAR:
+                tokens.pop()
+            anchored = not tokens or tokens[0] != self._GLOB_STAR
+            while tokens and tokens[0] == self._GLOB_STAR:
+                tokens.pop(0)
+            if not tokens:
+                return list(candidates)
+            if all(literal is not None for _, literal in tokens):
+                text = "".join(literal for _, literal in tokens)
+                if anchored:
+                    return [i for i in candidates if names[i].startswith(text)]
+                return [i for i in candidates if text in names[i]]
+            pattern = re.compile("".join(regex for regex, _ in tokens), re.DOTALL)
+            match = pattern.match if anchored else pattern.search
+            return [i for i in candidates if match(names[i])]
+        elif len(query) == 1:
+            return [i for i in candidates if query in names[i]]
+        else:
+            # "a[^b]*b[^c]*c" does not backtrack, unlike "a.*?b.*?c", the last character is checked first, which is
+            # faster than the regular expression and rejects most names
+            pattern = re.escape(query[0]) + "".join(f"[^{re.escape(c)}]*{re.escape(c)}" for c in query[1:])
+            search = re.compile(pattern).search
+            last = query[-1]
+            return [i for i in candidates if last in names[i] and search(names[i])]
+
+    def _is_glob(self, query: str) -> bool:
+        return not self._GLOB_CHARACTERS.isdisjoint(query)
+
+    @staticmethod
+    def _glob_tokens(query: str) -> list[Tuple[str, Optional[str]]]:
+        """
+        Regular expression and literal character of every glob token, like fnmatch.translate, except that an unclosed
+        [ matches any character, so adding a character to a query never widens its matches
+        """
+        tokens: list[Tuple[str, Optional[str]]] = []
+        i = 0
+        while i < len(query):
+            character = query[i]
+            i += 1
+            if character == "*":
+                if tokens[-1:] != [FilenameFilter._GLOB_STAR]:
+                    tokens.append(FilenameFilter._GLOB_STAR)
+            elif character == "?":
+                tokens.append((".", None))
+            elif character == "[":
+                j = i
+                if j < len(query) and query[j] == "!":
+                    j += 1
+                if j < len(query) and query[j] == "]":
+                    j += 1
+                while j < len(query) and query[j] != "]":
+                    j += 1
+                if j >= len(query):
+                    # Rest of the query is the unclosed set
+                    tokens.append((".", None))
+                    break
+                characters = re.sub(r"([\\\[&~|])", r"\\\1", query[i:j])
+                if characters.startswith("!"):
+                    characters = "^" + characters[1:]
+                elif characters.startswith("^"):
+                    characters = "\\" + characters
+                tokens.append((f"[{characters}]", None))
+                i = j + 1
+            else:
+                tokens.append((re.escape(character), character))
+        return tokens
+
+
 @dataclass(frozen=True)
 class Viewport:
     width: int
@@ -114,6 +367,7 @@ class OverviewImage:
     position: Position
     dimensions: Dimensions
     selected: bool
+    marked: bool
 
     @property
     def inner_rect(self) -> Rectangle:
@@ -172,16 +426,284 @@ class OverviewImagePlaceholder(OverviewImage):
             position=self.position,
             dimensions=self.dimensions,
             selected=self.selected,
+            marked=self.marked,
             photo_image=photo_image,
         )
 
 
+class GridLayout:
+    """Square cells of the image size, row by row"""
+    aspect_ratio_aware = False
+
+    def __init__(self):
+        self._count = 0
+        self._columns = 1
+        self._image_size = 1
+
+    def update(self, count: int, aspect_ratio: Callable[[int], float], viewport_width: int, image_size: int):
+        self._count = count
+        self._columns = max(1, viewport_width // image_size)
+        self._image_size = image_size
+
+    def update_aspect_ratios(self, aspect_ratios: Dict[int, float]) -> range:
+        return range(0)
+
+    @property
+    def content_height(self) -> int:
+        rows = (self._count + self._columns - 1) // self._columns
+        return rows * self._image_size
+
+    def laid_out_height(self, height: int) -> int:
+        return self.content_height
+
+    def index_range(self, y1: int, y2: int) -> range:
+        first_row = max(0, y1 // self._image_size)
+        last_row = max(0, (y2 - 1) // self._image_size)
+        return range(min(self._count, first_row * self._columns), min(self._count, (last_row + 1) * self._columns))
+
+    def rect(self, index: int) -> Rectangle:
+        return Rectangle(
+            position=Position(
+                x=(index % self._columns) * self._image_size,
+                y=(index // self._columns) * self._image_size,
+            ),
+            dimensions=Dimensions.for_size(self._image_size),
+        )
+
+    def index_at(self, position: Position) -> Optional[int]:
+        column = position.x // self._image_size
+        row = position.y // self._image_size
+        index = row * self._columns + column
+        if position.x < 0 or position.y < 0 or column >= self._columns or index >= self._count:
+            return None
+        return index
+
+    def index_above(self, index: int) -> Optional[int]:
+        above = index - self._columns
+        return above if above >= 0 else None
+
+    def index_below(self, index: int) -> Optional[int]:
+        below = index + self._columns
+        return below if below < self._count else None
+
+
+class JustifiedLayout:
+    """
+    Rows of images scaled to a common height, so every full row spans the viewport width. Row offsets are sorted,
+    so hit-testing and up/down navigation are binary searches. Rows are laid out lazily, only as far as an image or an
+    offset is asked for, so a new layout of many images costs only the visible rows. When aspect ratios change, only
+    rows from the first changed image are laid out again, until row boundaries match the previous layout.
+    """
+    aspect_ratio_aware = True
+
+    def __init__(self):
+        self._count = 0
+        self._aspect_ratio: Callable[[int], float] = lambda index: 1.0
+        # Aspect ratios read so far, from the start
+        self._aspect_ratios: list[float] = []
+        self._viewport_width = 1
+        self._image_size = 1
+        self._row_starts: list[int] = []
+        self._row_offsets: list[int] = []
+        self._row_heights: list[int] = []
+        # Images before this index are laid out
+        self._laid_out = 0
+        self._image_rows: list[int] = []
+        self._xs: list[int] = []
+        self._widths: list[int] = []
+
+    def update(self, count: int, aspect_ratio: Callable[[int], float], viewport_width: int, image_size: int):
+        self._count = count
+        self._aspect_ratio = aspect_ratio
+        self._aspect_ratios = []
+        self._viewport_width = max(1, viewport_width)
+        self._image_size = image_size
+        self._image_rows = [0] * count
+        self._xs = [0] * count
+        self._widths = [0] * count
+        self._row_starts, self._row_offsets, self._row_heights = [], [], []
+        self._laid_out = 0
+
+    def update_aspect_ratios(self, aspect_ratios: Dict[int, float]) -> range:
+        """Returns indexes of laid out images whose dimensions may have changed"""
+        for index, aspect_ratio in aspect_ratios.items():
+            if index < len(self._aspect_ratios):
+                self._aspect_ratios[index] = aspect_ratio
+        if not aspect_ratios or min(aspect_ratios) >= self._laid_out:
+            # Images are not laid out yet, new aspect ratios are read when they are
+            return range(0)
+        first_row = self._image_rows[min(aspect_ratios)]
+        return self._layout_rows(first_row, max(aspect_ratios) + 1)
+
+    @property
+    def content_height(self) -> int:
+        self._lay_out_until_index(self._count - 1)
+        return self._laid_out_bottom()
+
+    def laid_out_height(self, height: int) -> int:
+        """Lays out rows until they are at least height tall, less only when all images are laid out"""
+        while self._laid_out < self._count and self._laid_out_bottom() < height:
+            self._lay_out_row()
+        return self._laid_out_bottom()
+
+    def index_range(self, y1: int, y2: int) -> range:
+        """Images of rows intersecting offsets from y1 to y2"""
+        self.laid_out_height(y2)
+        if not self._row_starts:
+            return range(0)
+        first_row = max(0, bisect.bisect_right(self._row_offsets, y1) - 1)
+        last_row = max(0, bisect.bisect_left(self._row_offsets, y2) - 1)
+        return range(self._row_starts[first_row], self._row_end(last_row))
+
+    def rect(self, index: int) -> Rectangle:
+        self._lay_out_until_index(index)
+        row = self._image_rows[index]
+        return Rectangle(
+            position=Position(self._xs[index], self._row_offsets[row]),
+            dimensions=Dimensions(self._widths[index], self._row_heights[row]),
+        )
+
+    def index_at(self, position: Position) -> Optional[int]:
+        self.laid_out_height(position.y + 1)
+        row = bisect.bisect_right(self._row_offsets, position.y) - 1
+        if row < 0 or position.y >= self._row_offsets[row] + self._row_heights[row]:
+            return None
+        return self._index_in_row_at(row, position.x)
+
+    def index_above(self, index: int) -> Optional[int]:
+        self._lay_out_until_index(index)
+        row = self._image_rows[index]
+        return self._index_in_row_at(row - 1, self._center_x(index)) if row > 0 else None
+
+    def index_below(self, index: int) -> Optional[int]:
+        self._lay_out_until_index(index)
+        row = self._image_rows[index]
+        self._lay_out_until_index(self._row_end(row))
+        if row + 1 >= len(self._row_starts):
+            return None
+        return self._index_in_row_at(row + 1, self._center_x(index))
+
+    def _center_x(self, index: int) -> int:
+        return self._xs[index] + self._widths[index] // 2
+
+    def _row_end(self, row: int) -> int:
+        return self._row_starts[row + 1] if row + 1 < len(self._row_starts) else self._laid_out
+
+    def _laid_out_bottom(self) -> int:
+        if not self._row_offsets:
+            return 0
+        return self._row_offsets[-1] + self._row_heights[-1]
+
+    def _index_in_row_at(self, row: int, x: int) -> Optional[int]:
+        start = self._row_starts[row]
+        end = self._row_end(row)
+        index = bisect.bisect_right(self._xs, x, start, end) - 1
+        if index < start or x >= self._xs[index] + self._widths[index]:
+            return None
+        return index
+
+    def _lay_out_until_index(self, index: int):
+        while self._laid_out <= index and self._laid_out < self._count:
+            self._lay_out_row()
+
+    def _lay_out_row(self):
+        start = self._laid_out
+        end, height = self._fill_row(start)
+        self._place_row(start, end, height, self._laid_out_bottom())
+
+    def _layout_rows(self, first_row: int, changed_until: int) -> range:
+        old_row_starts = self._row_starts[first_row:]
+        old_row_offsets = self._row_offsets[first_row:]
+        old_row_heights = self._row_heights[first_row:]
+        old_laid_out = self._laid_out
+        # Row start index -> position in the old rows, to detect boundaries matching the previous layout
+        old_rows = {start: i for i, start in enumerate(old_row_starts)}
+
+        del self._row_starts[first_row:]
+        del self._row_offsets[first_row:]
+        del self._row_heights[first_row:]
+
+        start = old_row_starts[0]
+        first_changed = start
+        self._laid_out = start
+        while start < old_laid_out:
+            old_row = old_rows.get(start)
+            if start >= changed_until and old_row is not None and start != first_changed:
+                # Remaining rows are the same as before, only shifted
+                shift = self._laid_out_bottom() - old_row_offsets[old_row]
+                row_shift = len(self._row_starts) - (first_row + old_row)
+                if row_shift:
+                    self._image_rows[start:old_laid_out] = [
+                        row + row_shift for row in self._image_rows[start:old_laid_out]
+                    ]
+                self._row_starts.extend(old_row_starts[old_row:])
+                self._row_offsets.extend(offset + shift for offset in old_row_offsets[old_row:])
+                self._row_heights.extend(old_row_heights[old_row:])
+                self._laid_out = old_laid_out
+                return range(first_changed, start)
+
+            self._lay_out_row()
+            start = self._laid_out
+        # Rest is laid out lazily
+        return range(first_changed, start)
+
+    def _fill_row(self, start: int) -> Tuple[int, int]:
+        """Images are added to the row until its width at the image size reaches the viewport width"""
+        aspect_ratios = self._aspect_ratios
+        width = 0.0
+        end = start
+        while end < self._count and width < self._viewport_width:
+            if end >= len(aspect_ratios):
+                aspect_ratios.extend(self._aspect_ratio(i) for i in range(end, min(self._count, end + 64)))
+            width += aspect_ratios[end] * self._image_size
+            end += 1
+
+        if width < self._viewport_width:
+            # Last row is not stretched
+            return end, self._image_size
+        return end, max(1, round(self._image_size * self._viewport_width / width))
+
+    def _place_row(self, start: int, end: int, height: int, y: int):
+        row = len(self._row_starts)
+        self._row_starts.append(start)
+        self._row_offsets.append(y)
+        self._row_heights.append(height)
+        self._laid_out = end
+
+        full_width = sum(self._aspect_ratios[start:end]) * height
+        scale = self._viewport_width / full_width if full_width > self._viewport_width else 1.0
+        cumulative_width = 0.0
+        x = 0
+        for index in range(start, end):
+            cumulative_width += self._aspect_ratios[index] * height * scale
+            next_x = round(cumulative_width)
+            self._image_rows[index] = row
+            self._xs[index] = x
+            self._widths[index] = max(1, next_x - x)
+            x = next_x
+
+
 @dataclass
 class OverviewModel:
+    """
+    Images of the overview, optionally filtered. Only images around the viewport are kept at positions and dimensions
+    of the layout and requested from the image loader, so scrolling, zooming and filtering cost the visible images
+    rather than all of them. Images farther away are updated once they come close to the viewport.
+    """
     viewport: Viewport
     scroll_offset: int
     image_size: int
     images: list[OverviewImage]
+    marked_image_files: Set[ImageFile] = field(default_factory=set)
+    aspect_ratios: Dict[ImageFile, float] = field(default_factory=dict)
+    layout: GridLayout | JustifiedLayout = field(default_factory=GridLayout)
+
+    def __post_init__(self):
+        # Images of all image files, images are those at indexes of them
+        self._all_images: list[OverviewImage] = list(self.images)
+        self._indexes: list[int] | range = range(len(self.images))
+        # Images updated to the layout and requested, one viewport height around the viewport
+        self._updated_range = range(0)
 
     @property
     def min_scroll_offset(self) -> int:
@@ -190,52 +712,111 @@ class OverviewModel:
     @property
     def max_scroll_offset(self) -> int:
         viewport_height = self.viewport.height
-        images_height = self._calculate_image_position(len(self.images) - 1).y + self.image_size
+        images_height = self.layout.content_height
         return min(viewport_height - images_height, 0)
 
     @property
     def max_image_size(self) -> int:
         return self.viewport.width
 
+    @property
+    def visible_images(self) -> list[OverviewImage]:
+        visible_range = self.layout.index_range(-self.scroll_offset, self.viewport.height - self.scroll_offset)
+        return self.images[visible_range.start:visible_range.stop]
+
     def set_viewport(self, viewport: Viewport, load_context: ImageLoadContext):
+        width_changed = viewport.width != self.viewport.width
         self.viewport = viewport
         if self.image_size > self.max_image_size:
             self.set_image_size(self.max_image_size, load_context)
+        elif width_changed:
+            self._layout_images(load_context)
         else:
-            self._recalculate_image_positions()
+            self._update_images(load_context)
 
-    def set_scroll_offset(self, scroll_offset: int):
+    def set_scroll_offset(self, scroll_offset: int, load_context: ImageLoadContext):
         self.scroll_offset = scroll_offset
-        self._recalculate_image_positions()
+        self._update_images(load_context)
+
+    def clamp_scroll_offset(self, scroll_offset: int) -> int:
+        """Lays out only rows down to the bottom of the viewport, unless it is past the end of the images"""
+        scroll_offset = min(scroll_offset, self.min_scroll_offset)
+        viewport_bottom = self.viewport.height - scroll_offset
+        if self.layout.laid_out_height(viewport_bottom) < viewport_bottom:
+            scroll_offset = max(scroll_offset, self.max_scroll_offset)
+        return scroll_offset
+
+    def set_layout(self, layout: GridLayout | JustifiedLayout, load_context: ImageLoadContext):
+        self.layout = layout
+        self._layout_images(load_context)
+
+    def set_aspect_ratios(self, aspect_ratios: Dict[ImageFile, float], load_context: ImageLoadContext) -> bool:
+        """Lays out again only the rows affected by the new aspect ratios, returns whether any image moved"""
+        self.aspect_ratios.update(aspect_ratios)
+        if not self.layout.aspect_ratio_aware:
+            return False
+
+        changed = {}
+        for i, image in enumerate(self.images):
+            if image.image_file in aspect_ratios:
+                changed[i] = aspect_ratios[image.image_file]
+        changed_indexes = self.layout.update_aspect_ratios(changed)
+        if not changed_indexes:
+            return False
+
+        self._clamp_scroll_offset()
+        self._update_images(load_context)
+        return True
+
+    def set_image_files(
+            self,
+            image_files: list[ImageFile],
+            load_context: ImageLoadContext,
+            indexes: Optional[list[int] | range] = None,
+    ):
+        """
+        Re-orders images and shows only those at indexes of image files, or all of them. Already loaded images are
+        kept, so no file needs to be read.
+        """
+        current_images = {image.image_file: image for image in self._all_images}
+
+        images: list[OverviewImage] = []
+        for image_file in image_files:
+            image = current_images.get(image_file)
+            if image is None:
+                image = OverviewImagePlaceholder(
+                    image_file=image_file,
+                    position=Position(0, 0),
+                    dimensions=Dimensions.for_size(self.image_size),
+                    selected=False,
+                    marked=image_file in self.marked_image_files,
+                )
+            images.append(image)
+        self._all_images = images
+
+        self.filter_images(indexes if indexes is not None else range(len(images)), load_context)
+
+    def filter_images(self, indexes: list[int] | range, load_context: ImageLoadContext):
+        """Shows only images at indexes of the image files set by set_image_files, costs only the visible images"""
+        self._indexes = indexes
+        self.images = list(map(self._all_images.__getitem__, indexes))
+        self._layout_images(load_context)
 
     def set_image_size(self, image_size: int, load_context: ImageLoadContext):
         old_image_size = self.image_size
         self.image_size = image_size
+        self._update_layout()
 
         content_y = load_context.mouse_position.y - self.scroll_offset
         new_scroll_offset = round(load_context.mouse_position.y - content_y * self.image_size / old_image_size)
+        self.scroll_offset = self.clamp_scroll_offset(new_scroll_offset)
 
-        if new_scroll_offset < self.max_scroll_offset:
-            self.scroll_offset = self.max_scroll_offset
-        elif new_scroll_offset > self.min_scroll_offset:
-            self.scroll_offset = self.min_scroll_offset
-        else:
-            self.scroll_offset = new_scroll_offset
-
-        for i, image in enumerate(self.images):
-            self.images[i] = OverviewImagePlaceholder(
-                image_file=image.image_file,
-                position=self._calculate_image_position(i).with_scroll_offset(self.scroll_offset),
-                dimensions=Dimensions.for_size(self.image_size),
-                selected=image.selected,
-            )
-            image.selected = image.contains_position(load_context.mouse_position)
-
-        self.load_missing_images(load_context)
+        self._update_images(load_context)
 
     def load_missing_images(self, load_context: ImageLoadContext):
         images_to_load: list[Tuple[int, OverviewImagePlaceholder]] = []
-        for i, image in enumerate(self.images):
+        for i in self._updated_range:
+            image = self.images[i]
             if isinstance(image, OverviewImagePlaceholder):
                 images_to_load.append((i, image))
 
@@ -248,82 +829,115 @@ class OverviewModel:
                 image_file=image.image_file,
                 dimensions=image.inner_rect.dimensions,
             )
-            loaded_image = load_context.image_loader.request_image(request)
+            loaded_image = load_context.image_loader.request_image(request, load_context.owner)
             # Image(s) close to mouse cursor immediate low quality render to prevent flicker
             if not loaded_image and i == 0:
                 loaded_image = load_context.image_loader.get_low_quality_image(request)
 
             if loaded_image:
-                self.images[original_index] = image.to_loaded_image(loaded_image.photo_image)
+                self._set_image(original_index, image.to_loaded_image(loaded_image.photo_image))
 
-    def _recalculate_image_positions(self):
-        for i, image in enumerate(self.images):
-            image.position = self._calculate_image_position(i).with_scroll_offset(self.scroll_offset)
+    def _layout_images(self, load_context: ImageLoadContext):
+        self._update_layout()
+        self._clamp_scroll_offset()
+        self._update_images(load_context)
 
-    def _calculate_image_position(self, index: int) -> Position:
-        return self.calculate_image_position(index, self.viewport, self.image_size)
+    def _update_layout(self):
+        if self.layout.aspect_ratio_aware:
+            images = self.images
+            aspect_ratios = self.aspect_ratios
 
-    @staticmethod
-    def calculate_image_position(index: int, viewport: Viewport, image_size: int) -> Position:
-        viewport_width = viewport.width
-        image_width = image_size
-        image_height = image_size
+            def aspect_ratio(index: int) -> float:
+                return aspect_ratios.get(images[index].image_file, 1.0)
+        else:
+            def aspect_ratio(index: int) -> float:
+                return 1.0
+        self.layout.update(len(self.images), aspect_ratio, self.viewport.width, self.image_size)
+
+    def _update_images(self, load_context: ImageLoadContext):
+        """Images around the viewport are moved to the layout and the missing ones are requested"""
+        margin = self.viewport.height
+        self._updated_range = self.layout.index_range(
+            -self.scroll_offset - margin,
+            self.viewport.height - self.scroll_offset + margin,
+        )
+        for i in self._updated_range:
+            self._update_image(i)
+        self.load_missing_images(load_context)
 
-        columns = max(1, viewport_width // image_width)
-        return Position(
-            x=(index % columns) * image_width,
-            y=(index // columns) * image_height,
+    def _update_image(self, index: int) -> OverviewImage:
+        """Image whose dimensions changed by the layout is replaced by a placeholder, to be loaded again"""
+        image = self.images[index]
+        rect = self.layout.rect(index)
+        position = rect.position.with_scroll_offset(self.scroll_offset)
+        if image.dimensions == rect.dimensions:
+            image.position = position
+            return image
+
+        placeholder = OverviewImagePlaceholder(
+            image_file=image.image_file,
+            position=position,
+            dimensions=rect.dimensions,
+            selected=image.selected,
+            marked=image.marked,
         )
+        self._set_image(index, placeholder)
+        return placeholder
 
-    def find_selected_image(self) -> Optional[OverviewImage]:
-        index = self._find_selected_image_index()
-        return self.images[index] if index is not None else None
+    def _set_image(self, index: int, image: OverviewImage):
+        self.images[index] = image
+        # Filtered out images keep their loaded photo images
+        self._all_images[self._indexes[index]] = image
 
-    def find_selected_image_and_previous(self) -> Tuple[Optional[OverviewImage], Optional[OverviewImage]]:
-        index = self._find_selected_image_index()
-        if index is None:
-            return None, None
-        elif index == 0:
-            return self.images[index], None
-        else:
-            return self.images[index], self.images[index - 1]
+    def _clamp_scroll_offset(self):
+        self.scroll_offset = self.clamp_scroll_offset(self.scroll_offset)
 
-    def find_selected_image_and_next(self) -> Tuple[Optional[OverviewImage], Optional[OverviewImage]]:
-        index = self._find_selected_image_index()
-        if index is None:
-            return None, None
-        elif index == len(self.images) - 1:
-            return self.images[index], None
+    def toggle_marked(self, image: OverviewImage):
+        image.marked = not image.marked
+        if image.marked:
+            self.marked_image_files.add(image.image_file)
         else:
-            return self.images[index], self.images[index + 1]
+            self.marked_image_files.discard(image.image_file)
 
-    def find_selected_image_and_above(self) -> Tuple[Optional[OverviewImage], Optional[OverviewImage]]:
-        index = self._find_selected_image_index()
-        if index is None:
-            return None, None
+    def find_image_at(self, position: Position) -> Optional[OverviewImage]:
+        index = self.layout.index_at(Position(position.x, position.y - self.scroll_offset))
+        return self.images[index] if index is not None else None
 
-        selected_image = self.images[index]
-        for index in range(index - 1, -1, -1):
-            image = self.images[index]
-            if image.position.x == selected_image.position.x:
-                return selected_image, image
-        else:
-            return selected_image, None
+    def find_selected_image(self) -> Optional[OverviewImage]:
+        index = self._find_selected_image_index()
+        # Selected image may be far from the viewport, its position would be stale
+        return self._update_image(index) if index is not None else None
 
-    def find_selected_image_and_bellow(self) -> Tuple[Optional[OverviewImage], Optional[OverviewImage]]:
+    def find_selected_image_and_moved(
+            self,
+            columns: int,
+            rows: int,
+    ) -> Tuple[Optional[OverviewImage], Optional[OverviewImage]]:
+        """Image moved from the selected one by rows (down is positive) and then by columns in the order of images"""
         index = self._find_selected_image_index()
         if index is None:
             return None, None
 
-        selected_image = self.images[index]
-        for index in range(index + 1, len(self.images)):
-            image = self.images[index]
-            if image.position.x == selected_image.position.x:
-                return selected_image, image
-        else:
-            return selected_image, None
+        moved_index = index
+        for _ in range(abs(rows)):
+            if rows > 0:
+                row_index = self.layout.index_below(moved_index)
+            else:
+                row_index = self.layout.index_above(moved_index)
+            if row_index is None:
+                break
+            moved_index = row_index
+        moved_index = min(max(moved_index + columns, 0), len(self.images) - 1)
+
+        if moved_index == index:
+            return self._update_image(index), None
+        return self._update_image(index), self._update_image(moved_index)
 
     def _find_selected_image_index(self) -> Optional[int]:
+        # Selected image is usually close to the viewport
+        for i in self._updated_range:
+            if self.images[i].selected:
+                return i
         for i, image in enumerate(self.images):
             if image.selected:
                 return i
@@ -331,15 +945,16 @@ class OverviewModel:
             return None
 
     def create_loaded_image(self, loaded_image: LoadedImage) -> Optional[OverviewLoadedImage]:
-        # Loop in a loop can be optimized
-        for i, image in enumerate(self.images):
+        # Only images around the viewport are requested
+        for i in self._updated_range:
+            image = self.images[i]
             if not isinstance(image, OverviewImagePlaceholder):
                 continue
             if not image.is_for_loaded_image(loaded_image):
                 continue
 
             overview_loaded_image = image.to_loaded_image(loaded_image.photo_image)
-            self.images[i] = overview_loaded_image
+            self._set_image(i, overview_loaded_image)
             return overview_loaded_image
         else:
             return None
@@ -363,35 +978,320 @@ class DetailModel:
 
 
 class ImageFilesScanner:
-    @staticmethod
-    def scan() -> list[ImageFile]:
-        image_suffixes = {
-            ".jpg", ".jpeg", ".png", ".gif", ".bmp",
-            ".tiff", ".webp", ".svg", ".ico"
-        }
+    IMAGE_SUFFIXES = {
+        ".jpg", ".jpeg", ".png", ".gif", ".bmp",
+        ".tiff", ".webp", ".svg", ".ico"
+    }
 
+    @staticmethod
+    def scan(directory: Path) -> list[ImageFile]:
         image_files = []
-        for file in Path.cwd().iterdir():
-            if not file.is_file() or file.suffix.lower() not in image_suffixes:
+        for file in directory.iterdir():
+            if not file.is_file() or file.suffix.lower() not in ImageFilesScanner.IMAGE_SUFFIXES:
                 continue
-            image_files.append(ImageFile(file.name))
+            image_files.append(ImageFile(file))
 
         image_files.sort(key=lambda f: f.name)
 
         return image_files
 
+    @staticmethod
+    def scan_tree(directory: Path) -> list[ImageFile]:
+        image_files = []
+        for dir_path, _, file_names in os.walk(directory.resolve()):
+            for file_name in file_names:
+                if Path(file_name).suffix.lower() in ImageFilesScanner.IMAGE_SUFFIXES:
+                    image_files.append(ImageFile(Path(dir_path) / file_name))
+
+        image_files.sort(key=lambda f: f.path)
+
+        return image_files
+
+
+def cache_directory() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "preview"
+
+
+class ThumbnailCache:
+    """
+    Resized images stored as PNG files. Entries are keyed by image path, file size, mtime and requested dimensions,
+    so a changed file is never served from the cache.
+
+    Only the common overview image sizes are stored, other zoom levels are decoded on every request. The cache is
+    trimmed to MAX_BYTES by removing the least recently used entries, hits refresh the entry mtime.
+    """
+    STORED_IMAGE_SIZES = (100, 150, 200)
+    MAX_BYTES = 1024 * 1024 * 1024
 
-class ImageLoader:
     def __init__(self):
+        self._directory = cache_directory() / "thumbnails"
+        self._stored_dimensions = set(self.stored_dimensions())
+
+    @staticmethod
+    def stored_dimensions() -> list[Dimensions]:
+        # Requests are made for inner dimensions of the overview images, see OverviewModel.load_missing_images
+        dimensions = []
+        for image_size in ThumbnailCache.STORED_IMAGE_SIZES:
+            placeholder = OverviewImagePlaceholder(
+                image_file=ImageFile(Path()),
+                position=Position(0, 0),
+                dimensions=Dimensions.for_size(image_size),
+                selected=False,
+                marked=False,
+            )
+            dimensions.append(placeholder.inner_rect.dimensions)
+        return dimensions
+
+    def entry_path(self, request: LoadImageRequest) -> Path:
+        stat = request.image_file.path.stat()
+        key = (f"{request.image_file.path}\0{stat.st_size}\0{stat.st_mtime_ns}\0"
+               f"{request.dimensions.width}x{request.dimensions.height}")
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self._directory / digest[:2] / f"{digest}.png"
+
+    def load(self, request: LoadImageRequest) -> Image.Image:
+        from PIL import Image
+
+        if request.dimensions not in self._stored_dimensions:
+            return ImageLoader.decode_thumbnail(request)
+
+        entry_path = self.entry_path(request)
+        try:
+            image = Image.open(entry_path)
+            image.load()
+            self._touch(entry_path)
+            return image
+        except OSError:
+            pass
+
+        image = ImageLoader.decode_thumbnail(request)
+        self._store(entry_path, image)
+        return image
+
+    def trim(self, max_bytes: int = MAX_BYTES):
+        """Removes least recently used entries until the cache fits into max_bytes"""
+        entries = []
+        total = 0
+        try:
+            subdirectories = list(os.scandir(self._directory))
+        except FileNotFoundError:
+            return
+        for subdirectory in subdirectories:
+            try:
+                with os.scandir(subdirectory.path) as it:
+                    for entry in it:
+                        # Entries being written by other processes end in .tmp
+                        if not entry.name.endswith(".png"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            except NotADirectoryError:
+                continue
+
+        if total <= max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= max_bytes:
+                break
+
+    @staticmethod
+    def _touch(entry_path: Path):
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _store(entry_path: Path, image: Image.Image):
+        """A failed write, e.g. a full disk, only loses the cache entry, the decoded image is still used"""
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write and rename, so concurrent readers never see a partially written entry
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Thumbnail cache not written: {e}", file=sys.stderr)
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+
+class MetadataIndex:
+    """
+    One SQLite database per directory tree. Rows are keyed by a path relative to the root and invalidated by file
+    size and mtime. Main thread reads the whole index once, the worker thread only indexes new or changed files.
+    """
+    EXIF_ORIENTATION = 0x0112
+    _EXIF_DATE_TIME = 0x0132
+    _EXIF_IFD = 0x8769
+    _EXIF_DATE_TIME_ORIGINAL = 0x9003
+
+    _COMMIT_BATCH_SIZE = 100
+
+    def __init__(self, root: Path):
+        self._root = root
+        root_hash = hashlib.sha1(str(root).encode()).hexdigest()
+        self._database_path = cache_directory() / "index" / f"{root_hash}.sqlite"
+        self._database_path.parent.mkdir(parents=True, exist_ok=True)
+        self._out_queue: Queue[Tuple[ImageFile, ImageMetadata]] = Queue()
+
+    def load(self, image_files: list[ImageFile]) -> Dict[ImageFile, ImageMetadata]:
+        """Reads the index, files not indexed yet or changed since are indexed in the background"""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT path, size, mtime_ns, width, height, orientation, taken_at FROM images"
+            ).fetchall()
+        finally:
+            connection.close()
+        indexed = {path: ImageMetadata(*values) for path, *values in rows}
+
+        metadata: Dict[ImageFile, ImageMetadata] = {}
+        for image_file in image_files:
+            image_metadata = indexed.get(self._key(image_file))
+            if image_metadata:
+                metadata[image_file] = image_metadata
+
+        MetadataIndex._Worker(self, image_files, metadata.copy()).start()
+        return metadata
+
+    def poll_indexed_images(self) -> list[Tuple[ImageFile, ImageMetadata]]:
+        items = []
+        while not self._out_queue.empty():
+            try:
+                items.append(self._out_queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _connect(self) -> sqlite3.Connection:
+        import sqlite3
+
+        connection = sqlite3.connect(self._database_path)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                orientation INTEGER NOT NULL,
+                taken_at TEXT
+            )
+        """)
+        return connection
+
+    def _key(self, image_file: ImageFile) -> str:
+        return str(image_file.path.relative_to(self._root))
+
+    @staticmethod
+    def read_metadata(image_file: ImageFile, stat: os.stat_result) -> ImageMetadata:
+        """Reads image header and EXIF only, pixel data are not decoded"""
+        from PIL import Image
+
+        try:
+            with Image.open(image_file.path) as image:
+                exif = image.getexif()
+                taken_at = exif.get_ifd(MetadataIndex._EXIF_IFD).get(MetadataIndex._EXIF_DATE_TIME_ORIGINAL)
+                return ImageMetadata(
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    width=image.width,
+                    height=image.height,
+                    orientation=int(exif.get(MetadataIndex.EXIF_ORIENTATION, 1)),
+                    taken_at=str(taken_at or exif.get(MetadataIndex._EXIF_DATE_TIME) or "") or None,
+                )
+        except Exception:
+            # Unreadable files are indexed as well, so they are not re-read on every start
+            return ImageMetadata(stat.st_size, stat.st_mtime_ns, 0, 0, 1, None)
+
+    class _Worker(threading.Thread):
+        def __init__(
+                self,
+                index: 'MetadataIndex',
+                image_files: list[ImageFile],
+                metadata: Dict[ImageFile, ImageMetadata],
+        ):
+            super().__init__(daemon=True)
+            self._index = index
+            self._image_files = image_files
+            self._metadata = metadata
+
+        def run(self):
+            connection = self._index._connect()
+            try:
+                pending = 0
+                for image_file in self._image_files:
+                    try:
+                        stat = image_file.path.stat()
+                    except OSError:
+                        continue
+
+                    indexed_metadata = self._metadata.get(image_file)
+                    if indexed_metadata and indexed_metadata.is_stat_equal(stat):
+                        continue
+
+                    metadata = MetadataIndex.read_metadata(image_file, stat)
+                    connection.execute(
+                        "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (self._index._key(image_file), metadata.size, metadata.mtime_ns, metadata.width,
+                         metadata.height, metadata.orientation, metadata.taken_at),
+                    )
+                    self._index._out_queue.put((image_file, metadata))
+
+                    pending += 1
+                    if pending >= MetadataIndex._COMMIT_BATCH_SIZE:
+                        connection.commit()
+                        pending = 0
+                connection.commit()
+            finally:
+                connection.close()
+
+
+class TkPhotoImageFactory:
+    @staticmethod
+    def from_image(image: Image.Image) -> PhotoImage:
+        from PIL import ImageTk
+
+        return ImageTk.PhotoImage(image)
+
+    @staticmethod
+    def from_ppm(image_data: bytes) -> PhotoImage:
+        from PIL import ImageTk
+
+        return ImageTk.PhotoImage(data=image_data)
+
+
+class ImageLoader:
+    def __init__(self, thumbnail_cache: ThumbnailCache, photo_image_factory=TkPhotoImageFactory()):
+        """Photo image factory converts loaded images for a renderer, see TkPhotoImageFactory"""
+        self._photo_image_factory = photo_image_factory
         self._in_queue: Queue[LoadImageRequest] = Queue()
         self._out_queue: Queue[ImageLoader._LoadedRawImage] = Queue()
-        ImageLoader._Worker(self._in_queue, self._out_queue).start()
+        ImageLoader._Worker(thumbnail_cache, self._in_queue, self._out_queue).start()
+        threading.Thread(target=thumbnail_cache.trim, daemon=True).start()
 
         self._requested_images: Set[LoadImageRequest] = set()
         self._loaded_images: Dict[ImageFile, ImageLoader._LoadedRawImage] = {}
         self._loaded_photo_images: Dict[LoadImageRequest, LoadedImage] = {}
+        # Loader is shared by all windows, requested and loaded images are kept while any window still wants them
+        self._owners: Dict[LoadImageRequest, Set[object]] = {}
 
-    def request_image(self, request: LoadImageRequest) -> Optional[LoadedImage]:
+    def request_image(self, request: LoadImageRequest, owner: object = None) -> Optional[LoadedImage]:
+        self._owners.setdefault(request, set()).add(owner)
         if request in self._loaded_photo_images:
             return self._loaded_photo_images[request]
         elif request not in self._requested_images:
@@ -407,10 +1307,13 @@ class ImageLoader:
             try:
                 loaded_image = self._out_queue.get_nowait()
                 self._loaded_images[loaded_image.request.image_file] = loaded_image
+                if loaded_image.request not in self._owners:
+                    # Cancelled by all windows while it was loaded
+                    continue
 
                 loaded_photo_image = LoadedImage(
                     request=loaded_image.request,
-                    photo_image=loaded_image.to_photo_image(),
+                    photo_image=self._photo_image_factory.from_ppm(loaded_image.image_data),
                 )
                 self._loaded_photo_images[loaded_image.request] = loaded_photo_image
 
@@ -419,8 +1322,23 @@ class ImageLoader:
                 break
         return items
 
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by the in-memory caches, photo images are counted as 4 bytes per pixel like Tk"""
+        return {
+            "requested_images": len(self._requested_images),
+            "raw_images": len(self._loaded_images),
+            "raw_image_bytes": sum(len(raw_image.image_data) for raw_image in self._loaded_images.values()),
+            "photo_images": len(self._loaded_photo_images),
+            "photo_image_bytes": sum(
+                loaded_image.photo_image.width() * loaded_image.photo_image.height() * 4
+                for loaded_image in self._loaded_photo_images.values()
+            ),
+        }
+
     def get_low_quality_image(self, request: LoadImageRequest) -> Optional[LoadedImage]:
         if request.image_file in self._loaded_images:
+            from PIL import Image
+
             loaded_image = self._loaded_images[request.image_file]
 
             image = Image.open(io.BytesIO(loaded_image.image_data))
@@ -429,53 +1347,82 @@ class ImageLoader:
             image = self._resize_image(image, request.dimensions)
             return LoadedImage(
                 request=request,
-                photo_image=ImageTk.PhotoImage(image),
+                photo_image=self._photo_image_factory.from_image(image),
             )
         else:
             return None
 
-    def cancel(self):
-        self._requested_images = set()
-        self._loaded_photo_images = {}
-        self._clear_queue(self._in_queue)
-        self._clear_queue(self._out_queue)
+    def cancel(self, owner: object = None):
+        """Drops requests and photo images of one window, images other windows still want are kept"""
+        for request, owners in list(self._owners.items()):
+            owners.discard(owner)
+            if not owners:
+                del self._owners[request]
+                self._requested_images.discard(request)
+                self._loaded_photo_images.pop(request, None)
+
+        pending = []
+        while True:
+            try:
+                pending.append(self._in_queue.get_nowait())
+            except queue.Empty:
+                break
+        for request in pending:
+            if request in self._owners:
+                self._in_queue.put(request)
+
+    @staticmethod
+    def open_at_size(image_file: ImageFile, dimensions: Dimensions) -> Image.Image:
+        """Decode stage shared by thumbnails and exports, JPEG files are decoded directly at a reduced scale"""
+        from PIL import Image
+
+        image = Image.open(image_file.path)
+        image.draft("RGB", (dimensions.width, dimensions.height))
+        return image
 
     @staticmethod
-    def load_image(image_file: ImageFile, dimensions: Dimensions) -> ImageTk.PhotoImage:
-        image = Image.open(image_file.name)
-        image = ImageLoader._resize_image(image, dimensions, Resampling.LANCZOS)
-        return ImageTk.PhotoImage(image)
+    def decode_thumbnail(request: LoadImageRequest) -> Image.Image:
+        """Decode and resize pipeline shared by the worker thread and the thumbnail cache warm-up"""
+        image = ImageLoader.open_at_size(request.image_file, request.dimensions)
+        image = ImageLoader._resize_image(image, request.dimensions)
+        return image.convert("RGB")
+
+    def load_image(self, image_file: ImageFile, dimensions: Dimensions) -> PhotoImage:
+        from PIL import Image
+
+        image = Image.open(image_file.path)
+        image = ImageLoader._resize_image(image, dimensions, Image.Resampling.LANCZOS)
+        return self._photo_image_factory.from_image(image)
 
     @staticmethod
     def _resize_image(
             image: Image.Image,
             dimensions: Dimensions,
-            resampling: Resampling = Resampling.NEAREST,
+            resampling: Optional[Resampling] = None,
     ) -> Image.Image:
+        from PIL.Image import Resampling
+
+        if resampling is None:
+            resampling = Resampling.NEAREST
         scale = min(dimensions.width / image.width, dimensions.height / image.height)
         new_width = int(image.width * scale)
         new_height = int(image.height * scale)
         return image.resize((new_width, new_height), resample=resampling)
 
-    @staticmethod
-    def _clear_queue(q: Queue):
-        try:
-            while True:
-                q.get_nowait()
-        except queue.Empty:
-            pass
-
     @dataclass(frozen=True)
     class _LoadedRawImage:
         request: LoadImageRequest
         image_data: bytes
 
-        def to_photo_image(self) -> ImageTk.PhotoImage:
-            return ImageTk.PhotoImage(data=self.image_data)
-
     class _Worker(threading.Thread):
-        def __init__(self, in_queue: Queue[LoadImageRequest], out_queue: Queue['ImageLoader._LoadedRawImage']):
+        def __init__(
+                self,
+                thumbnail_cache: ThumbnailCache,
+                in_queue: Queue[LoadImageRequest],
+                out_queue: Queue['ImageLoader._LoadedRawImage'],
+        ):
             super().__init__(daemon=True)
+            self._thumbnail_cache = thumbnail_cache
             self._in_queue = in_queue
             self._out_queue = out_queue
 
@@ -484,8 +1431,7 @@ class ImageLoader:
                 request = self._in_queue.get()
 
                 try:
-                    image = Image.open(request.image_file.name)
-                    image = ImageLoader._resize_image(image, request.dimensions)
+                    image = self._thumbnail_cache.load(request)
 
                     buf = io.BytesIO()
                     buf.write(f"P6\n{image.width} {image.height}\n255\n".encode())
@@ -501,8 +1447,13 @@ class ImageLoader:
 
 
 class Renderer:
-    def __init__(self, canvas: Canvas):
+    _IMAGE_FILLS = ("#01302f", "#3b2c05")
+
+    def __init__(self, canvas: Canvas, startup_trace: StartupTrace, clusters: Optional[Dict[ImageFile, int]] = None):
+        """Images of the same cluster (e.g. duplicates) share a background, neighbouring clusters alternate"""
         self._canvas = canvas
+        self._startup_trace = startup_trace
+        self._clusters = clusters or {}
 
     def viewport(self) -> Viewport:
         return Viewport(
@@ -510,12 +1461,24 @@ class Renderer:
             height=self._canvas.winfo_height(),
         )
 
+    def render_progress(self, text: str):
+        self._canvas.delete("all")
+        self._canvas.create_text(
+            self._canvas.winfo_width() // 2,
+            self._canvas.winfo_height() // 2,
+            text=text,
+            fill="white",
+            tags="progress",
+        )
+
     def render_overview(self, overview_model: OverviewModel):
         self._canvas.delete("all")
+        if overview_model.images:
+            self._startup_trace.mark("first placeholder")
 
         canvas_height = self._canvas.winfo_height()
 
-        for image in overview_model.images:
+        for image in overview_model.visible_images:
             if image.outer_rect.y1 > canvas_height or image.outer_rect.y2 < 0:
                 continue
 
@@ -525,7 +1488,7 @@ class Renderer:
                 image.inner_rect.x2,
                 image.inner_rect.y2,
                 width=2,
-                fill="#01302f",
+                fill=self._fill(image),
             )
 
             if isinstance(image, OverviewLoadedImage):
@@ -534,6 +1497,7 @@ class Renderer:
             self.render_overview_image_highlight(image)
 
     def render_overview_image(self, image: OverviewLoadedImage):
+        self._startup_trace.mark("first thumbnail")
         self._canvas.create_image(
             image.photo_rect.x1,
             image.photo_rect.y1,
@@ -542,14 +1506,13 @@ class Renderer:
         )
 
     def render_overview_image_highlight(self, image: OverviewImage):
-        outline = "white" if image.selected else "black"
         self._canvas.create_rectangle(
             image.inner_rect.x1,
             image.inner_rect.y1,
             image.inner_rect.x2,
             image.inner_rect.y2,
             width=2,
-            outline=outline,
+            outline=self._outline(image),
         )
 
     def render_detail(self, image: DetailModel):
@@ -561,102 +1524,337 @@ class Renderer:
             anchor='nw',
         )
 
+    def _fill(self, image: OverviewImage) -> str:
+        return self._IMAGE_FILLS[self._clusters.get(image.image_file, 0) % len(self._IMAGE_FILLS)]
 
-class WindowManager:
-    def __init__(self, root: Tk):
-        self._root = root
+    @staticmethod
+    def _outline(image: OverviewImage) -> str:
+        if image.selected:
+            return "white"
+        elif image.marked:
+            return "#ffb000"
+        else:
+            return "black"
 
-    def set_title(self, title: str):
-        self._root.title(f"Preview {title}")
 
-    def reset_title(self):
-        self._root.title(f"Preview {Path.cwd()}")
+class PillowImage:
+    """Loaded image kept as a Pillow image, for renderers compositing images themselves"""
 
+    def __init__(self, image: Image.Image):
+        self.image = image
 
-class UI:
-    _KEY_HOME = 110
-    _KEY_END = 115
-    _KEY_PAGE_UP = 112
-    _KEY_PAGE_DOWN = 117
+    def width(self) -> int:
+        return self.image.width
 
-    _START_SCROLL_OFFSET = 0
-    _START_IMAGE_SIZE = 100
+    def height(self) -> int:
+        return self.image.height
 
-    _MOUSE_SCROLL_SPEED = 75
-    _MOUSE_ZOOM_SPEED = 10
 
-    def __init__(
-            self,
-            window_manager: WindowManager,
-            image_loader: ImageLoader,
-            renderer: Renderer,
-            image_files: list[ImageFile]
-    ):
-        self._window_manager = window_manager
-        self._image_loader = image_loader
-        self._renderer = renderer
+class PillowImageFactory:
+    @staticmethod
+    def from_image(image: Image.Image) -> PillowImage:
+        return PillowImage(image.convert("RGB"))
 
-        self._mouse_position = Position(0, 0)
+    @staticmethod
+    def from_ppm(image_data: bytes) -> PillowImage:
+        from PIL import Image
+
+        return PillowImage(Image.open(io.BytesIO(image_data)).convert("RGB"))
+
+
+class BandRenderer(Renderer):
+    """
+    Overview composited by Pillow into bands of the viewport width, one canvas image per band instead of an image and
+    two rectangles per tile, which keeps Tk redraws fast with thousands of small tiles. Bands are placed in content
+    coordinates, so scrolling only moves them. A band is composited again only when one of its tiles changed, arrived
+    thumbnails and highlights are composited together once Tk is idle. Needs images loaded by PillowImageFactory.
+    """
+    _BAND_HEIGHT = 256
+    _BACKGROUND = "#00201e"
+
+    @dataclass
+    class _Band:
+        tiles: tuple
+        width: int
+        photo_image: PhotoImage
+        item: int
+
+    def __init__(self, canvas: Canvas, startup_trace: StartupTrace, clusters: Optional[Dict[ImageFile, int]] = None):
+        super().__init__(canvas, startup_trace, clusters)
+        self._overview_model: Optional[OverviewModel] = None
+        self._bands: Dict[int, BandRenderer._Band] = {}
+        self._detail_photo_image: Optional[PhotoImage] = None
+        self._render_scheduled = False
+        self._progress_shown = False
+
+    def render_progress(self, text: str):
+        super().render_progress(text)
+        self._bands.clear()
+        self._progress_shown = True
 
-        self._detail_model: Optional[DetailModel] = None
-        self._overview_model = self._create_overview_model(image_files)
+    def render_overview(self, overview_model: OverviewModel):
+        self._overview_model = overview_model
+        if self._detail_photo_image:
+            self._canvas.delete("detail")
+            self._detail_photo_image = None
+        if overview_model.images:
+            self._startup_trace.mark("first placeholder")
+
+        viewport = self.viewport()
+        scroll_offset = overview_model.scroll_offset
+        band_height = self._BAND_HEIGHT
+        first_band = -scroll_offset // band_height
+        last_band = (viewport.height - scroll_offset - 1) // band_height
+
+        band_images: Dict[int, list[OverviewImage]] = {band: [] for band in range(first_band, last_band + 1)}
+        for image in overview_model.visible_images:
+            y1 = image.position.y - scroll_offset
+            y2 = y1 + image.dimensions.height
+            for band in range(max(first_band, y1 // band_height), min(last_band, (y2 - 1) // band_height) + 1):
+                band_images[band].append(image)
+
+        for band in list(self._bands):
+            if band not in band_images:
+                self._canvas.delete(self._bands.pop(band).item)
+
+        for band, images in band_images.items():
+            tiles = tuple(self._tile_key(image, scroll_offset) for image in images)
+            existing_band = self._bands.get(band)
+            if existing_band is None or existing_band.tiles != tiles or existing_band.width != viewport.width:
+                self._composite_band(band, images, tiles, viewport.width, scroll_offset)
+            self._canvas.coords(self._bands[band].item, 0, band * band_height + scroll_offset)
+
+        if self._progress_shown:
+            # Canvas is not cleared for the overview, bands are reused
+            self._canvas.delete("progress")
+            self._progress_shown = False
+
+    def render_overview_image(self, image: OverviewLoadedImage):
+        self._startup_trace.mark("first thumbnail")
+        self._schedule_render()
+
+    def render_overview_image_highlight(self, image: OverviewImage):
+        self._schedule_render()
+
+    def render_detail(self, image: DetailModel):
+        from PIL import ImageTk
+
+        self._canvas.delete("all")
+        self._bands.clear()
+        self._overview_model = None
+        self._detail_photo_image = ImageTk.PhotoImage(image.photo_image.image)
+        self._canvas.create_image(
+            image.photo_rect.x1,
+            image.photo_rect.y1,
+            image=self._detail_photo_image,
+            anchor='nw',
+            tags="detail",
+        )
+
+    def _schedule_render(self):
+        if not self._render_scheduled:
+            self._render_scheduled = True
+            self._canvas.after_idle(self._render_scheduled_overview)
+
+    def _render_scheduled_overview(self):
+        self._render_scheduled = False
+        if self._overview_model is not None:
+            self.render_overview(self._overview_model)
+
+    @staticmethod
+    def _tile_key(image: OverviewImage, scroll_offset: int) -> tuple:
+        photo_image = image.photo_image if isinstance(image, OverviewLoadedImage) else None
+        return (
+            image.image_file, image.position.x, image.position.y - scroll_offset, image.dimensions,
+            photo_image, image.selected, image.marked,
+        )
+
+    def _composite_band(self, band: int, images: list[OverviewImage], tiles: tuple, width: int, scroll_offset: int):
+        from PIL import Image, ImageDraw, ImageTk
+
+        band_image = Image.new("RGB", (width, self._BAND_HEIGHT), self._BACKGROUND)
+        draw = ImageDraw.Draw(band_image)
+        # Screen y of the band top
+        top = band * self._BAND_HEIGHT + scroll_offset
+        for image in images:
+            inner_rect = image.inner_rect
+            box = (inner_rect.x1, inner_rect.y1 - top, inner_rect.x2, inner_rect.y2 - top)
+            draw.rectangle(box, fill=self._fill(image))
+            if isinstance(image, OverviewLoadedImage):
+                photo_rect = image.photo_rect
+                band_image.paste(image.photo_image.image, (photo_rect.x1, photo_rect.y1 - top))
+            draw.rectangle(box, outline=self._outline(image), width=2)
+
+        existing_band = self._bands.get(band)
+        if existing_band is not None and existing_band.width == width:
+            existing_band.photo_image.paste(band_image)
+            existing_band.tiles = tiles
+            return
+
+        if existing_band is not None:
+            self._canvas.delete(existing_band.item)
+        photo_image = ImageTk.PhotoImage(band_image)
+        item = self._canvas.create_image(0, top, image=photo_image, anchor="nw")
+        self._bands[band] = BandRenderer._Band(tiles, width, photo_image, item)
+
+
+class WindowManager:
+    def __init__(self, window: Tk | Toplevel, directory: Path, on_close: Callable[[], None]):
+        self._window = window
+        self._directory = directory
+        self._on_close = on_close
+
+    def set_title(self, title: str):
+        self._window.title(f"Preview {title}")
+
+    def reset_title(self):
+        self._window.title(f"Preview {self._directory}")
+
+    def close(self):
+        self._on_close()
+
+
+class UI:
+    _KEY_HOME = 110
+    _KEY_END = 115
+    _KEY_PAGE_UP = 112
+    _KEY_PAGE_DOWN = 117
+
+    _START_SCROLL_OFFSET = 0
+    _START_IMAGE_SIZE = 100
+
+    _MOUSE_SCROLL_SPEED = 75
+    _MOUSE_ZOOM_SPEED = 10
+
+    # A sorted or filtered arrangement is applied again once indexing has been idle this long, not per indexed batch
+    _ARRANGE_DEBOUNCE_S = 0.5
+
+    def __init__(
+            self,
+            window_manager: WindowManager,
+            image_loader: ImageLoader,
+            metadata_index: MetadataIndex,
+            batch_exporter: BatchExporter,
+            renderer: Renderer,
+            image_files: list[ImageFile]
+    ):
+        self._window_manager = window_manager
+        self._image_loader = image_loader
+        self._metadata_index = metadata_index
+        self._batch_exporter = batch_exporter
+        self._renderer = renderer
+
+        self._mouse_position = Position(0, 0)
+
+        self._image_files = image_files
+        self._image_metadata = metadata_index.load(image_files)
+        self._arrangement = ImageArrangement()
+        self._last_indexed_at: Optional[float] = None
+        self._filename_filter = FilenameFilter(image_files)
+        self._filter_input_active = False
+
+        self._detail_model: Optional[DetailModel] = None
+        self._overview_model = self._create_overview_model(image_files)
 
     @property
     def _is_detail_mode(self) -> bool:
         return self._detail_model is not None
 
+    @property
+    def is_filter_input_active(self) -> bool:
+        return self._filter_input_active
+
     def mouse_select(self, event: Event):
         self._mouse_position.x = event.x
         self._mouse_position.y = event.y
         if self._is_detail_mode:
             return
 
-        for image in self._overview_model.images:
-            if image.selected and not image.contains_position(self._mouse_position):
-                image.selected = False
-                self._renderer.render_overview_image_highlight(image)
-            elif not image.selected and image.contains_position(self._mouse_position):
+        selected_image = self._overview_model.find_selected_image()
+        image = self._overview_model.find_image_at(self._mouse_position)
+        if selected_image is not image:
+            if selected_image:
+                selected_image.selected = False
+                self._renderer.render_overview_image_highlight(selected_image)
+            if image:
                 image.selected = True
                 self._renderer.render_overview_image_highlight(image)
         self._set_window_title()
 
-    def mouse_scroll(self, event: Event):
+    def mouse_mark(self, event: Event):
         if self._is_detail_mode:
             return
 
+        image = self._overview_model.find_image_at(Position(event.x, event.y))
+        if image:
+            self._overview_model.toggle_marked(image)
+            self._renderer.render_overview_image_highlight(image)
+
+    def mark_selected(self):
+        image = self._overview_model.find_selected_image()
+        if image:
+            self._overview_model.toggle_marked(image)
+            if not self._is_detail_mode:
+                self._renderer.render_overview_image_highlight(image)
+
+    def export_marked(self):
+        """Exports marked images, or the selected one if nothing is marked"""
+        image_files = sorted(self._overview_model.marked_image_files, key=lambda f: f.path)
+        if not image_files:
+            selected_image = self._overview_model.find_selected_image()
+            image_files = [selected_image.image_file] if selected_image else []
+        self._batch_exporter.export(image_files, self)
+
+    def process_export_progress(self):
+        progress = self._batch_exporter.poll_progress(self)
+        if progress is None:
+            return
+
+        failed = f", {progress.failed} failed" if progress.failed else ""
+        if progress.finished:
+            self._window_manager.set_title(f"exported {progress.total} images{failed}")
+        else:
+            self._window_manager.set_title(f"exporting {progress.done}/{progress.total}{failed}")
+
+    def mouse_scroll(self, event: Event):
         if event.num == 4:
-            min_offset = self._overview_model.min_scroll_offset
-            new_offset = min(self._overview_model.scroll_offset + self._MOUSE_SCROLL_SPEED, min_offset)
+            self.scroll_by(1)
         elif event.num == 5:
-            max_offset = self._overview_model.max_scroll_offset
-            new_offset = max(self._overview_model.scroll_offset - self._MOUSE_SCROLL_SPEED, max_offset)
-        else:
+            self.scroll_by(-1)
+
+    def scroll_by(self, steps: int):
+        """Mouse wheel steps, positive steps scroll up"""
+        if self._is_detail_mode or steps == 0:
             return
 
+        new_offset = self._overview_model.scroll_offset + steps * self._MOUSE_SCROLL_SPEED
+        new_offset = self._overview_model.clamp_scroll_offset(new_offset)
+
         if self._overview_model.scroll_offset == new_offset:
             return
 
-        self._overview_model.set_scroll_offset(new_offset)
+        self._overview_model.set_scroll_offset(new_offset, self._create_image_load_context())
         self._renderer.render_overview(self._overview_model)
         self._set_window_title()
 
     def mouse_zoom(self, event: Event):
-        if self._is_detail_mode:
-            return
-
         if event.num == 4:
-            max_image_size = self._overview_model.max_image_size
-            new_image_size = min(self._overview_model.image_size + self._MOUSE_ZOOM_SPEED, max_image_size)
+            self.zoom_by(1)
         elif event.num == 5:
-            min_image_size = 1
-            new_image_size = max(self._overview_model.image_size - self._MOUSE_ZOOM_SPEED, min_image_size)
-        else:
+            self.zoom_by(-1)
+
+    def zoom_by(self, steps: int):
+        """Mouse wheel steps, positive steps zoom in"""
+        if self._is_detail_mode or steps == 0:
             return
 
+        new_image_size = self._overview_model.image_size + steps * self._MOUSE_ZOOM_SPEED
+        new_image_size = min(max(new_image_size, 1), self._overview_model.max_image_size)
+
         if self._overview_model.image_size == new_image_size:
             return
 
-        self._image_loader.cancel()
+        self._cancel_image_loading()
         self._overview_model.set_image_size(new_image_size, self._create_image_load_context())
         self._renderer.render_overview(self._overview_model)
         self._set_window_title()
@@ -671,7 +1869,7 @@ class UI:
         else:
             image_size = max_image_size
 
-        self._image_loader.cancel()
+        self._cancel_image_loading()
         self._overview_model.set_image_size(image_size, self._create_image_load_context())
         self._renderer.render_overview(self._overview_model)
         self._set_window_title()
@@ -690,7 +1888,7 @@ class UI:
         if self._overview_model.scroll_offset == new_offset:
             return
 
-        self._overview_model.set_scroll_offset(new_offset)
+        self._overview_model.set_scroll_offset(new_offset, self._create_image_load_context())
         self._renderer.render_overview(self._overview_model)
 
     def scroll_page(self, event: Event):
@@ -699,112 +1897,65 @@ class UI:
 
         viewport_height = self._renderer.viewport().height
         if event.keycode == self._KEY_PAGE_UP:
-            min_offset = self._overview_model.min_scroll_offset
-            new_offset = min(self._overview_model.scroll_offset + viewport_height, min_offset)
+            new_offset = self._overview_model.clamp_scroll_offset(self._overview_model.scroll_offset + viewport_height)
         elif event.keycode == self._KEY_PAGE_DOWN:
-            max_offset = self._overview_model.max_scroll_offset
-            new_offset = max(self._overview_model.scroll_offset - viewport_height, max_offset)
+            new_offset = self._overview_model.clamp_scroll_offset(self._overview_model.scroll_offset - viewport_height)
         else:
             return
 
         if self._overview_model.scroll_offset == new_offset:
             return
 
-        self._overview_model.set_scroll_offset(new_offset)
+        self._overview_model.set_scroll_offset(new_offset, self._create_image_load_context())
         self._renderer.render_overview(self._overview_model)
 
     def select_previous(self):
-        selected_image, previous_image = self._overview_model.find_selected_image_and_previous()
-        if selected_image is None or previous_image is None:
-            return
+        self.move_selection(-1, 0)
 
-        selected_image.selected = False
-        previous_image.selected = True
+    def select_next(self):
+        self.move_selection(1, 0)
+
+    def select_above(self):
+        self.move_selection(0, -1)
 
-        changed_offset = self._adjust_scroll_offset_to_selected_image(previous_image)
+    def select_below(self):
+        self.move_selection(0, 1)
 
+    def move_selection(self, columns: int, rows: int):
+        """Moves by rows first, then by columns in the order of images, detail mode moves by columns only"""
         if self._is_detail_mode:
-            self._detail_model = self._create_detail_model(previous_image)
-            self._renderer.render_detail(self._detail_model)
-        else:
-            if changed_offset:
-                self._renderer.render_overview(self._overview_model)
-            else:
-                self._renderer.render_overview_image_highlight(selected_image)
-                self._renderer.render_overview_image_highlight(previous_image)
-        self._set_window_title()
+            rows = 0
 
-    def select_next(self):
-        selected_image, next_image = self._overview_model.find_selected_image_and_next()
-        if selected_image is None or next_image is None:
+        selected_image, moved_image = self._overview_model.find_selected_image_and_moved(columns, rows)
+        if selected_image is None or moved_image is None:
             return
 
         selected_image.selected = False
-        next_image.selected = True
+        moved_image.selected = True
 
-        changed_offset = self._adjust_scroll_offset_to_selected_image(next_image)
+        changed_offset = self._adjust_scroll_offset_to_selected_image(moved_image)
 
         if self._is_detail_mode:
-            self._detail_model = self._create_detail_model(next_image)
+            self._detail_model = self._create_detail_model(moved_image)
             self._renderer.render_detail(self._detail_model)
         else:
             if changed_offset:
                 self._renderer.render_overview(self._overview_model)
             else:
                 self._renderer.render_overview_image_highlight(selected_image)
-                self._renderer.render_overview_image_highlight(next_image)
-        self._set_window_title()
-
-    def select_above(self):
-        if self._is_detail_mode:
-            return
-
-        selected_image, above_image = self._overview_model.find_selected_image_and_above()
-        if selected_image is None or above_image is None:
-            return
-
-        selected_image.selected = False
-        above_image.selected = True
-
-        changed_offset = self._adjust_scroll_offset_to_selected_image(above_image)
-
-        if changed_offset:
-            self._renderer.render_overview(self._overview_model)
-        else:
-            self._renderer.render_overview_image_highlight(selected_image)
-            self._renderer.render_overview_image_highlight(above_image)
-        self._set_window_title()
-
-    def select_below(self):
-        if self._is_detail_mode:
-            return
-
-        selected_image, bellow_image = self._overview_model.find_selected_image_and_bellow()
-        if selected_image is None or bellow_image is None:
-            return
-
-        selected_image.selected = False
-        bellow_image.selected = True
-
-        changed_offset = self._adjust_scroll_offset_to_selected_image(bellow_image)
-
-        if changed_offset:
-            self._renderer.render_overview(self._overview_model)
-        else:
-            self._renderer.render_overview_image_highlight(selected_image)
-            self._renderer.render_overview_image_highlight(bellow_image)
+                self._renderer.render_overview_image_highlight(moved_image)
         self._set_window_title()
 
     def _adjust_scroll_offset_to_selected_image(self, image: OverviewImage) -> bool:
         if image.outer_rect.y1 < 0:
             scroll_offset_delta = 0 - image.outer_rect.y1
             new_offset = self._overview_model.scroll_offset + scroll_offset_delta
-            self._overview_model.set_scroll_offset(new_offset)
+            self._overview_model.set_scroll_offset(new_offset, self._create_image_load_context())
             return True
         elif image.outer_rect.y2 > self._overview_model.viewport.height:
             scroll_offset_delta = image.outer_rect.y2 - self._overview_model.viewport.height
             new_offset = self._overview_model.scroll_offset - scroll_offset_delta
-            self._overview_model.set_scroll_offset(new_offset)
+            self._overview_model.set_scroll_offset(new_offset, self._create_image_load_context())
             return True
         else:
             return False
@@ -820,13 +1971,13 @@ class UI:
                 self._renderer.render_detail(self._detail_model)
         self._set_window_title()
 
-    def exit_preview_or_quit(self, root: Tk):
+    def exit_preview_or_quit(self):
         if self._is_detail_mode:
             self._detail_model = None
             self._renderer.render_overview(self._overview_model)
             self._set_window_title()
         else:
-            root.quit()
+            self._window_manager.close()
 
     def initialize(self):
         if self._is_detail_mode:
@@ -838,22 +1989,109 @@ class UI:
             self._renderer.render_overview(self._overview_model)
         self._set_window_title()
 
-    def process_loaded_images(self):
-        if self._is_detail_mode:
-            return
-
-        loaded_images = self._image_loader.poll_loaded_images()
+    def process_loaded_images(self, loaded_images: list[LoadedImage]):
         for loaded_image in loaded_images:
-            if self._is_detail_mode:
-                continue
-
             overview_loaded_image = self._overview_model.create_loaded_image(loaded_image)
-            if overview_loaded_image:
+            if overview_loaded_image and not self._is_detail_mode:
                 self._renderer.render_overview_image(overview_loaded_image)
 
+    def process_indexed_images(self):
+        indexed_images = self._metadata_index.poll_indexed_images()
+        if not indexed_images:
+            if self._last_indexed_at is not None and time.monotonic() - self._last_indexed_at >= self._ARRANGE_DEBOUNCE_S:
+                self._arrange_images()
+            return
+
+        for image_file, metadata in indexed_images:
+            self._image_metadata[image_file] = metadata
+
+        aspect_ratios = self._aspect_ratios(dict(indexed_images))
+        if self._arrangement != ImageArrangement():
+            # Sorting everything again per batch would be O(n log n) on every poll while a large tree is indexed
+            self._overview_model.aspect_ratios.update(aspect_ratios)
+            self._last_indexed_at = time.monotonic()
+        elif self._overview_model.set_aspect_ratios(aspect_ratios, self._create_image_load_context()):
+            if not self._is_detail_mode:
+                self._renderer.render_overview(self._overview_model)
+
+    def filter_key(self, character: str, keysym: str) -> bool:
+        """
+        '/' starts typing a filter of image names, Return keeps the filter and ends typing, Escape clears it.
+        Returns whether the key was used by the filter.
+        """
+        if self._is_detail_mode:
+            return False
+
+        if not self._filter_input_active:
+            if character == "/":
+                self._filter_input_active = True
+                self._set_window_title()
+                return True
+            elif keysym == "Escape" and self._filename_filter.query:
+                self._filename_filter.clear()
+                self._apply_filter()
+                return True
+            return False
+
+        if keysym == "Escape":
+            self._filter_input_active = False
+            self._filename_filter.clear()
+        elif keysym == "Return":
+            self._filter_input_active = False
+        elif keysym == "BackSpace":
+            self._filename_filter.pop()
+        elif character and character.isprintable():
+            self._filename_filter.push(character)
+        else:
+            return True
+        self._apply_filter()
+        return True
+
+    def toggle_layout(self):
+        """Switches between the square grid and justified rows keeping image aspect ratios"""
+        self._cancel_image_loading()
+        if self._overview_model.layout.aspect_ratio_aware:
+            layout: GridLayout | JustifiedLayout = GridLayout()
+        else:
+            layout = JustifiedLayout()
+        self._overview_model.set_layout(layout, self._create_image_load_context())
+        if not self._is_detail_mode:
+            self._renderer.render_overview(self._overview_model)
+
+    def toggle_sort(self):
+        self._arrangement = self._arrangement.next_sort()
+        self._arrange_images()
+        self._window_manager.set_title(str(self._arrangement))
+
+    def toggle_orientation_filter(self):
+        self._arrangement = self._arrangement.next_orientation()
+        self._arrange_images()
+        self._window_manager.set_title(str(self._arrangement))
+
+    def _arrange_images(self):
+        self._last_indexed_at = None
+        image_files = self._arrangement.apply(self._image_files, self._image_metadata)
+        self._filename_filter.set_image_files(image_files)
+        self._overview_model.set_image_files(
+            image_files, self._create_image_load_context(), self._filename_filter.indexes,
+        )
+        if not self._is_detail_mode:
+            self._renderer.render_overview(self._overview_model)
+
+    def _apply_filter(self):
+        # Only rows around the viewport are laid out and requested, filtered out images keep their loaded
+        # thumbnails, so images coming back need no new decode requests
+        self._overview_model.filter_images(self._filename_filter.indexes, self._create_image_load_context())
+        self._renderer.render_overview(self._overview_model)
+        self._set_window_title()
+
     def _set_window_title(self):
         if self._is_detail_mode:
             self._window_manager.set_title(self._detail_model.image_file.name)
+        elif self._filter_input_active:
+            self._window_manager.set_title(
+                f"/{self._filename_filter.query} ({len(self._overview_model.images)} images)"
+            )
         else:
             selected_image = self._overview_model.find_selected_image()
             if selected_image:
@@ -861,24 +2099,22 @@ class UI:
             else:
                 self._window_manager.reset_title()
 
+    def _cancel_image_loading(self):
+        self._image_loader.cancel(self)
+
     def _create_image_load_context(self) -> ImageLoadContext:
-        return ImageLoadContext(self._image_loader, self._mouse_position)
+        return ImageLoadContext(self._image_loader, self._mouse_position, self)
 
     def _create_overview_model(self, image_files: list[ImageFile]) -> OverviewModel:
         image_placeholders: list[OverviewImagePlaceholder] = []
-        for i, image_file in enumerate(image_files):
-            image_position = OverviewModel.calculate_image_position(
-                index=i,
-                viewport=self._renderer.viewport(),
-                image_size=self._START_IMAGE_SIZE,
-            )
+        for image_file in image_files:
             image_placeholder = OverviewImagePlaceholder(
                 image_file=image_file,
-                position=image_position.with_scroll_offset(self._START_SCROLL_OFFSET),
+                position=Position(0, 0),
                 dimensions=Dimensions.for_size(self._START_IMAGE_SIZE),
-                selected=False
+                selected=False,
+                marked=False,
             )
-            image_placeholder.selected = image_placeholder.contains_position(self._mouse_position)
             image_placeholders.append(image_placeholder)
 
         model = OverviewModel(
@@ -886,10 +2122,23 @@ class UI:
             scroll_offset=self._START_SCROLL_OFFSET,
             image_size=self._START_IMAGE_SIZE,
             images=image_placeholders,
+            aspect_ratios=self._aspect_ratios(self._image_metadata),
         )
-        model.load_missing_images(self._create_image_load_context())
+        model.set_layout(GridLayout(), self._create_image_load_context())
+        image_under_mouse = model.find_image_at(self._mouse_position)
+        if image_under_mouse:
+            image_under_mouse.selected = True
         return model
 
+    @staticmethod
+    def _aspect_ratios(metadata: Dict[ImageFile, ImageMetadata]) -> Dict[ImageFile, float]:
+        # Thumbnails are not rotated by EXIF orientation, so the stored dimensions are used as is
+        return {
+            image_file: image_metadata.width / image_metadata.height
+            for image_file, image_metadata in metadata.items()
+            if image_metadata.width and image_metadata.height
+        }
+
     def _create_detail_model(self, image: OverviewImage) -> DetailModel:
         viewport = self._renderer.viewport()
         image_dimensions = Dimensions(
@@ -904,55 +2153,1349 @@ class UI:
         )
 
 
-def main():
-    files = ImageFilesScanner().scan()
-    if len(files) == 0:
-        print("No images found")
-        return
+class ThumbnailCacheWarmer:
+    """Fills the thumbnail cache for common overview image sizes without opening a window"""
 
-    root = Tk()
-    canvas = Canvas(root, bg="#00201e", highlightthickness=0)
-    canvas.pack(fill="both", expand=True)
+    def warm(self, directories: list[Path]):
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        self._lower_priority()
+
+        image_files: list[ImageFile] = []
+        for directory in directories:
+            image_files.extend(ImageFilesScanner.scan_tree(directory))
+
+        dimensions = ThumbnailCache.stored_dimensions()
+        total = len(image_files)
+        generated = 0
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = [executor.submit(ThumbnailCacheWarmer._warm_image, f, dimensions) for f in image_files]
+            for done, future in enumerate(as_completed(futures), start=1):
+                generated += future.result()
+                print(f"\rWarming thumbnails {done}/{total}, generated {generated}", end="", file=sys.stderr)
+        print(file=sys.stderr)
+        ThumbnailCache().trim()
+
+    @staticmethod
+    def _lower_priority():
+        # Worker processes inherit both CPU and IO priority
+        os.nice(10)
+        try:
+            subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())], check=False)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _warm_image(image_file: ImageFile, dimensions: list[Dimensions]) -> int:
+        thumbnail_cache = ThumbnailCache()
+        generated = 0
+        for d in dimensions:
+            request = LoadImageRequest(image_file, d)
+            try:
+                if thumbnail_cache.entry_path(request).exists():
+                    continue
+                thumbnail_cache.load(request)
+                generated += 1
+            except Exception:
+                pass
+        return generated
+
+
+@dataclass(frozen=True)
+class ExportSettings:
+    # Relative directory is resolved against the directory of exported images
+    directory: Path
+    max_size: int
+    format: str
+    quality: int
+    keep_metadata: bool
+
+
+@dataclass(frozen=True)
+class ExportProgress:
+    done: int
+    failed: int
+    total: int
+
+    @property
+    def finished(self) -> bool:
+        return self.done == self.total
+
+
+class BatchExporter:
+    """
+    Exports images in a process pool, one task per image, so all cores are used. Tk thread only polls the futures.
+    Images are auto-rotated by EXIF, resized to fit max size and re-encoded, metadata are stripped unless kept.
+
+    Exporter is shared by all windows, progress is tracked per owner window. Each image is exported relative to its
+    own directory, images with the same stem keep their original suffix in the name, e.g. a.png.jpg and a.jpg.jpg.
+    """
+
+    def __init__(self, settings: ExportSettings):
+        self._settings = settings
+        self._executor = None
+        self._futures: Dict[object, list] = {}
+
+    def export(self, image_files: list[ImageFile], owner: object = None):
+        if not image_files:
+            return
+
+        if self._executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Forking a process running Tk and worker threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        futures = self._futures.setdefault(owner, [])
+        for image_file, export_path in self._export_paths(image_files).items():
+            export_path.parent.mkdir(parents=True, exist_ok=True)
+            futures.append(self._executor.submit(BatchExporter._export_image, image_file, export_path, self._settings))
+
+    def poll_progress(self, owner: object = None) -> Optional[ExportProgress]:
+        """Returns None when the owner exports nothing, finished progress is returned once"""
+        futures = self._futures.get(owner)
+        if not futures:
+            return None
+
+        done = [f for f in futures if f.done()]
+        progress = ExportProgress(
+            done=len(done),
+            failed=sum(1 for f in done if f.exception() is not None),
+            total=len(futures),
+        )
+        if progress.finished:
+            del self._futures[owner]
+        return progress
+
+    def _export_paths(self, image_files: list[ImageFile]) -> Dict[ImageFile, Path]:
+        suffix = ".jpg" if self._settings.format == "jpeg" else f".{self._settings.format}"
+        # Stems of all images per source directory, so exports of a.png and a.jpg never overwrite each other, even
+        # when they are exported separately
+        stem_counts: Dict[Path, Dict[str, int]] = {}
+        export_paths: Dict[ImageFile, Path] = {}
+        used_paths: Set[Path] = set()
+        for image_file in image_files:
+            source_directory = image_file.path.parent
+            if source_directory not in stem_counts:
+                stem_counts[source_directory] = {}
+                for file_name in os.listdir(source_directory):
+                    if Path(file_name).suffix.lower() in ImageFilesScanner.IMAGE_SUFFIXES:
+                        stem = Path(file_name).stem
+                        stem_counts[source_directory][stem] = stem_counts[source_directory].get(stem, 0) + 1
+
+            path = image_file.path
+            name = path.stem if stem_counts[source_directory].get(path.stem, 0) <= 1 else path.name
+            export_path = source_directory / self._settings.directory / f"{name}{suffix}"
+            # Absolute export directory collects images of several source directories
+            n = 2
+            while export_path in used_paths:
+                export_path = source_directory / self._settings.directory / f"{name}-{n}{suffix}"
+                n += 1
+            used_paths.add(export_path)
+            export_paths[image_file] = export_path
+        return export_paths
+
+    @staticmethod
+    def _export_image(image_file: ImageFile, export_path: Path, settings: ExportSettings):
+        from PIL import Image, ImageOps
+
+        max_dimensions = Dimensions.for_size(settings.max_size)
+        with ImageLoader.open_at_size(image_file, max_dimensions) as image:
+            exif = image.getexif()
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimensions.width, max_dimensions.height), Image.Resampling.LANCZOS)
+
+            save_options = {"quality": settings.quality}
+            if settings.keep_metadata:
+                # Image is rotated already
+                exif[MetadataIndex.EXIF_ORIENTATION] = 1
+                save_options["exif"] = exif.tobytes()
+
+            image.convert("RGB").save(
+                export_path,
+                format=settings.format.upper(),
+                **save_options,
+            )
+
+
+class PerceptualHashCache:
+    """Perceptual hashes stored next to the thumbnails, invalidated by file size and mtime"""
 
-    window_manager = WindowManager(root)
-    image_loader = ImageLoader()
-    renderer = Renderer(canvas)
-    ui = UI(window_manager, image_loader, renderer, files)
+    def __init__(self):
+        import sqlite3
+
+        database_path = cache_directory() / "thumbnails" / "hashes.sqlite"
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(database_path)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+        """)
+
+    def get_all(self, image_files: list[ImageFile]) -> Dict[ImageFile, int]:
+        rows = self._connection.execute("SELECT path, size, mtime_ns, hash FROM hashes").fetchall()
+        indexed = {path: (size, mtime_ns, image_hash) for path, size, mtime_ns, image_hash in rows}
+
+        hashes: Dict[ImageFile, int] = {}
+        for image_file in image_files:
+            row = indexed.get(str(image_file.path))
+            if row is None:
+                continue
+            try:
+                stat = image_file.path.stat()
+            except OSError:
+                continue
+            size, mtime_ns, image_hash = row
+            if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                hashes[image_file] = int(image_hash, 16)
+        return hashes
+
+    def put_all(self, hashes: list[Tuple[ImageFile, int]]):
+        rows = []
+        for image_file, image_hash in hashes:
+            stat = image_file.path.stat()
+            rows.append((str(image_file.path), stat.st_size, stat.st_mtime_ns, format(image_hash, "016x")))
+        self._connection.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", rows)
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+class BKTree:
+    """Metric tree over Hamming distance, search visits only subtrees which can contain hashes within the radius"""
+
+    def __init__(self):
+        self._root: Optional[Tuple[int, list[ImageFile], Dict[int, Tuple]]] = None
+
+    def add(self, image_hash: int, image_file: ImageFile):
+        if self._root is None:
+            self._root = (image_hash, [image_file], {})
+            return
+
+        node = self._root
+        while True:
+            node_hash, node_files, children = node
+            distance = (image_hash ^ node_hash).bit_count()
+            if distance == 0:
+                node_files.append(image_file)
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (image_hash, [image_file], {})
+                return
+            node = child
+
+    def search(self, image_hash: int, radius: int) -> list[ImageFile]:
+        found: list[ImageFile] = []
+        nodes = [self._root] if self._root else []
+        while nodes:
+            node_hash, node_files, children = nodes.pop()
+            distance = (image_hash ^ node_hash).bit_count()
+            if distance <= radius:
+                found.extend(node_files)
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    nodes.append(child)
+        return found
+
+
+class DuplicateFinder:
+    """
+    pHash of every image is computed in a process pool, batches of images are hashed at once by NumPy. Near-duplicates
+    are found by a BK-tree lookup of each hash and merged into groups.
+    """
+    _BATCH_SIZE = 64
+    _HASH_IMAGE_SIZE = 32
+    _HASH_SIZE = 8
+
+    def __init__(self, max_distance: int):
+        self._max_distance = max_distance
+
+    def find(self, directory: Path) -> list[list[ImageFile]]:
+        image_files = ImageFilesScanner.scan_tree(directory)
+        hashes = self._hash(image_files)
+
+        tree = BKTree()
+        for image_file, image_hash in hashes.items():
+            tree.add(image_hash, image_file)
+
+        # Union-find, so chains of similar images end up in one group
+        parents: Dict[ImageFile, ImageFile] = {}
+
+        def find_root(f: ImageFile) -> ImageFile:
+            while parents.get(f, f) != f:
+                f = parents[f]
+            return f
+
+        for image_file, image_hash in hashes.items():
+            for similar_file in tree.search(image_hash, self._max_distance):
+                root, similar_root = find_root(image_file), find_root(similar_file)
+                if root != similar_root:
+                    parents[similar_root] = root
+
+        groups: Dict[ImageFile, list[ImageFile]] = {}
+        for image_file in hashes:
+            groups.setdefault(find_root(image_file), []).append(image_file)
+        duplicates = [sorted(group, key=lambda f: f.path) for group in groups.values() if len(group) > 1]
+        duplicates.sort(key=lambda group: group[0].path)
+        return duplicates
+
+    def _hash(self, image_files: list[ImageFile]) -> Dict[ImageFile, int]:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        hash_cache = PerceptualHashCache()
+        try:
+            hashes = hash_cache.get_all(image_files)
+            missing = [f for f in image_files if f not in hashes]
+            batches = [missing[i:i + self._BATCH_SIZE] for i in range(0, len(missing), self._BATCH_SIZE)]
+
+            done = 0
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                futures = [executor.submit(DuplicateFinder._hash_batch, batch) for batch in batches]
+                for future in as_completed(futures):
+                    batch_hashes = future.result()
+                    hash_cache.put_all(batch_hashes)
+                    hashes.update(batch_hashes)
+                    done += self._BATCH_SIZE
+                    print(f"\rHashing images {min(done, len(missing))}/{len(missing)}", end="", file=sys.stderr)
+            if missing:
+                print(file=sys.stderr)
+        finally:
+            hash_cache.close()
+        return hashes
+
+    @staticmethod
+    def _hash_batch(image_files: list[ImageFile]) -> list[Tuple[ImageFile, int]]:
+        import numpy as np
+        from PIL import Image
+
+        size = DuplicateFinder._HASH_IMAGE_SIZE
+        pixels = []
+        hashed_files = []
+        for image_file in image_files:
+            try:
+                with Image.open(image_file.path) as image:
+                    image.draft("L", (size * 2, size * 2))
+                    image = image.convert("L").resize((size, size), Image.Resampling.BILINEAR)
+                    pixels.append(np.asarray(image, dtype=np.float32))
+                    hashed_files.append(image_file)
+            except Exception:
+                pass
+        if not pixels:
+            return []
+
+        # 2D DCT-II of all images at once, low frequencies are compared against their median
+        k = np.arange(size)
+        dct = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size)).astype(np.float32)
+        coefficients = (dct @ np.stack(pixels) @ dct.T)[:, :DuplicateFinder._HASH_SIZE, :DuplicateFinder._HASH_SIZE]
+        coefficients = coefficients.reshape(len(pixels), -1)
+        bits = coefficients > np.median(coefficients[:, 1:], axis=1, keepdims=True)
+        packed = np.packbits(bits, axis=1).view(">u8").ravel()
+        return list(zip(hashed_files, (int(h) for h in packed)))
+
+
+class StartupTrace:
+    """Timeline of the first occurrence of startup events, measured from the start of the module import"""
+    _LAST_EVENT = "first thumbnail"
+
+    def __init__(self, enabled: bool):
+        self._enabled = enabled
+        self._events: Dict[str, float] = {}
+        self._printed = False
+
+    def mark(self, event: str):
+        if not self._enabled or event in self._events:
+            return
+        self._events[event] = time.perf_counter()
+        if event == self._LAST_EVENT:
+            self.print()
+
+    def print(self):
+        if not self._enabled or self._printed:
+            return
+        self._printed = True
+        for event, at in sorted(self._events.items(), key=lambda item: item[1]):
+            print(f"{(at - _MODULE_STARTED_AT) * 1000:8.1f} ms  {event}", file=sys.stderr)
+
+
+class MemoryProfiler:
+    """
+    Memory accounting of a long session (`preview.py --memory-report FILE`): periodic tracemalloc snapshots, bytes
+    held by in-memory caches and live photo images. The JSON report is written on F12 and at exit, growth of Python
+    allocations is reported against the first snapshot.
+    """
+    _SNAPSHOT_INTERVAL_S = 30
+    _TOP_STATISTICS = 25
+
+    def __init__(self, report_path: Optional[Path]):
+        self._report_path = report_path
+        self._sources: Dict[str, Callable[[], Dict[str, int]]] = {}
+        self._timeline: list[dict] = []
+        self._first_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._last_snapshot_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._report_path is not None
+
+    def start(self):
+        """Starts tracing allocations, only by the applications writing the report, tracing slows down Python"""
+        if self.enabled:
+            import tracemalloc
+            tracemalloc.start()
+
+    def add_source(self, name: str, usage: Callable[[], Dict[str, int]]):
+        """Usage is a flat dict of counts and bytes, e.g. ImageLoader.memory_usage"""
+        self._sources[name] = usage
+
+    def poll(self):
+        if self.enabled and time.monotonic() - self._last_snapshot_at >= self._SNAPSHOT_INTERVAL_S:
+            self._take_snapshot()
+
+    def write_report(self):
+        if not self.enabled:
+            return
+
+        snapshot = self._take_snapshot()
+        import tracemalloc
+        traced_bytes, traced_peak_bytes = tracemalloc.get_traced_memory()
+        report = {
+            "uptime_s": round(time.perf_counter() - _MODULE_STARTED_AT, 1),
+            "rss_bytes": self._rss_bytes(),
+            "peak_rss_bytes": self._peak_rss_bytes(),
+            "traced_bytes": traced_bytes,
+            "traced_peak_bytes": traced_peak_bytes,
+            "sources": {name: usage() for name, usage in self._sources.items()},
+            "top_allocations": [
+                {"location": str(statistic.traceback), "bytes": statistic.size, "count": statistic.count}
+                for statistic in snapshot.statistics("lineno")[:self._TOP_STATISTICS]
+            ],
+            "growth_since_first_snapshot": [
+                {"location": str(statistic.traceback), "bytes": statistic.size_diff, "count": statistic.count_diff}
+                for statistic in snapshot.compare_to(self._first_snapshot, "lineno")[:self._TOP_STATISTICS]
+            ],
+            "timeline": self._timeline,
+        }
+
+        tmp_path = self._report_path.with_name(self._report_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(report, indent=2))
+        os.replace(tmp_path, self._report_path)
+        print(f"Memory report written to {self._report_path}", file=sys.stderr)
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        if self._first_snapshot is None:
+            self._first_snapshot = snapshot
+        self._last_snapshot_at = time.monotonic()
+
+        entry = {
+            "at_s": round(time.perf_counter() - _MODULE_STARTED_AT, 1),
+            "rss_bytes": self._rss_bytes(),
+            "traced_bytes": tracemalloc.get_traced_memory()[0],
+        }
+        for name, usage in self._sources.items():
+            for key, value in usage().items():
+                entry[f"{name}.{key}"] = value
+        self._timeline.append(entry)
+        return snapshot
+
+    @staticmethod
+    def _rss_bytes() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _peak_rss_bytes() -> int:
+        import resource
+
+        # Kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class FrameStats:
+    """Histogram of times to apply coalesced input and redraw, printed at exit (`preview.py --frame-stats`)"""
+    _BUCKETS_MS = (4, 8, 16.7, 33.3, 50, 100, 250)
+
+    def __init__(self, enabled: bool):
+        self._enabled = enabled
+        self._counts = [0] * (len(self._BUCKETS_MS) + 1)
+        self._frames = 0
+        self._events = 0
+        self._dropped_frames = 0
+
+    def record(self, duration_s: float, events: int, frame_interval_s: float):
+        if not self._enabled:
+            return
+        duration_ms = duration_s * 1000
+        self._counts[bisect.bisect_left(self._BUCKETS_MS, duration_ms)] += 1
+        self._frames += 1
+        self._events += events
+        # Frames the display showed without an update while this one was applied
+        self._dropped_frames += int(duration_s // frame_interval_s)
+
+    def print(self):
+        if not self._enabled or not self._frames:
+            return
+        print(f"{self._frames} frames, {self._events} input events, {self._dropped_frames} dropped frames",
+              file=sys.stderr)
+        lower_ms = 0.0
+        for upper_ms, count in zip(self._BUCKETS_MS + (float("inf"),), self._counts):
+            label = f"{lower_ms:g}-{upper_ms:g} ms" if upper_ms != float("inf") else f">{lower_ms:g} ms"
+            bar = "#" * round(40 * count / self._frames)
+            print(f"{label:>14} {count:6} {bar}".rstrip(), file=sys.stderr)
+            lower_ms = upper_ms
+
+
+class InputCoalescer:
+    """
+    Mouse moves, wheel scrolls, zoom steps and selection moves are accumulated and applied to the UI at most once per
+    display frame, so a fast wheel spin or a held arrow key redraws once per frame instead of once per event.
+    Other actions flush the accumulated input first, to keep the order of input.
+    """
+    FRAME_INTERVAL_S = 1 / 60
+
+    def __init__(
+            self,
+            ui: UI,
+            frame_stats: FrameStats,
+            schedule: Optional[Callable[[int, Callable[[], None]], object]] = None,
+            redraw: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Schedule runs a callback after a delay in milliseconds, e.g. Tk `after`, without it the caller flushes.
+        Redraw forces pending drawing, e.g. Tk `update_idletasks`, so frame times include it.
+        """
+        self._ui = ui
+        self._frame_stats = frame_stats
+        self._schedule = schedule
+        self._redraw = redraw
+        self._flush_scheduled = False
+        self._last_flush_at = 0.0
+
+        self._mouse_event: Optional[Event | TerminalEvent] = None
+        self._scroll_steps = 0
+        self._zoom_steps = 0
+        self._columns = 0
+        self._rows = 0
+        self._events = 0
+
+    def mouse_move(self, event: Event):
+        self._mouse_event = event
+        self._add_event()
+
+    def mouse_scroll(self, event: Event | TerminalEvent):
+        self._scroll_steps += self._wheel_steps(event)
+        self._add_event()
+
+    def mouse_zoom(self, event: Event | TerminalEvent):
+        self._zoom_steps += self._wheel_steps(event)
+        self._add_event()
+
+    def move_selection(self, columns: int, rows: int):
+        self._columns += columns
+        self._rows += rows
+        self._add_event()
+
+    def flush(self):
+        self._flush_scheduled = False
+        if not self._events:
+            return
+
+        started_at = time.perf_counter()
+        events = self._events
+        mouse_event, self._mouse_event = self._mouse_event, None
+        scroll_steps, self._scroll_steps = self._scroll_steps, 0
+        zoom_steps, self._zoom_steps = self._zoom_steps, 0
+        columns, self._columns = self._columns, 0
+        rows, self._rows = self._rows, 0
+        self._events = 0
+
+        if mouse_event is not None:
+            self._ui.mouse_select(mouse_event)
+        self._ui.zoom_by(zoom_steps)
+        self._ui.scroll_by(scroll_steps)
+        if columns or rows:
+            self._ui.move_selection(columns, rows)
+        if self._redraw:
+            self._redraw()
+
+        self._last_flush_at = time.perf_counter()
+        self._frame_stats.record(self._last_flush_at - started_at, events, self.FRAME_INTERVAL_S)
+
+    def _add_event(self):
+        self._events += 1
+        if self._schedule is None or self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        next_frame_in_s = self._last_flush_at + self.FRAME_INTERVAL_S - time.perf_counter()
+        self._schedule(max(0, round(next_frame_in_s * 1000)), self.flush)
+
+    @staticmethod
+    def _wheel_steps(event: Event | TerminalEvent) -> int:
+        if event.num == 4:
+            return 1
+        elif event.num == 5:
+            return -1
+        return 0
+
+
+@dataclass(frozen=True)
+class ScannedDirectory:
+    window: Tk | Toplevel
+    canvas: Canvas
+    renderer: Renderer
+    directory: Path
+    files: list[ImageFile]
+    on_close: Callable[[], None]
+
+
+class PreviewApplication:
+    """Windows of one process share the image loader, i.e. its worker thread and in-memory caches"""
+    _POLL_INTERVAL_MS = 50
+    _COALESCED_KEYSYMS = frozenset(("Left", "Right", "Up", "Down"))
+
+    def __init__(
+            self,
+            root: Tk,
+            startup_trace: StartupTrace,
+            memory_profiler: MemoryProfiler,
+            frame_stats: FrameStats,
+            export_settings: ExportSettings,
+            daemon: Optional['PreviewDaemon'] = None,
+            band_rendering: bool = False,
+    ):
+        """Band rendering composites the overview into a few images, see BandRenderer"""
+        self._root = root
+        self._startup_trace = startup_trace
+        self._memory_profiler = memory_profiler
+        self._frame_stats = frame_stats
+        self._daemon = daemon
+        self._band_rendering = band_rendering
+        memory_profiler.start()
+        if band_rendering:
+            self._image_loader = ImageLoader(ThumbnailCache(), PillowImageFactory())
+        else:
+            self._image_loader = ImageLoader(ThumbnailCache())
+        self._batch_exporter = BatchExporter(export_settings)
+        memory_profiler.add_source("image_loader", self._image_loader.memory_usage)
+        memory_profiler.add_source("tk", self._tk_image_usage)
+        self._uis: list[UI] = []
+        self._scanned_directories: Queue[ScannedDirectory] = Queue()
+
+    def open_window(
+            self,
+            window: Tk | Toplevel,
+            directory: Path,
+            on_close: Callable[[], None],
+            files: Optional[list[ImageFile]] = None,
+            clusters: Optional[Dict[ImageFile, int]] = None,
+    ) -> Optional[UI]:
+        """Without files the window is shown with a progress first, the directory is scanned in a worker thread"""
+        from tkinter import Canvas
+
+        canvas = Canvas(window, bg="#00201e", highlightthickness=0)
+        canvas.pack(fill="both", expand=True)
+        canvas.bind("<Map>", lambda e: self._startup_trace.mark("window mapped"), add="+")
+        if self._band_rendering:
+            renderer = BandRenderer(canvas, self._startup_trace, clusters)
+        else:
+            renderer = Renderer(canvas, self._startup_trace, clusters)
+
+        if files is not None:
+            return self._create_ui(ScannedDirectory(window, canvas, renderer, directory, files, on_close))
+
+        progress = f"Scanning {directory}"
+        canvas.bind("<Configure>", lambda e: renderer.render_progress(progress))
+
+        def scan():
+            scanned_files = ImageFilesScanner.scan(directory)
+            self._startup_trace.mark("scan finished")
+            self._scanned_directories.put(
+                ScannedDirectory(window, canvas, renderer, directory, scanned_files, on_close)
+            )
 
-    canvas.bind("<Configure>", lambda e: ui.initialize())
+        threading.Thread(target=scan, daemon=True).start()
+        return None
+
+    def _create_ui(self, scanned_directory: ScannedDirectory) -> UI:
+        window = scanned_directory.window
+        canvas = scanned_directory.canvas
+
+        window_manager = WindowManager(window, scanned_directory.directory, scanned_directory.on_close)
+        metadata_index = MetadataIndex(scanned_directory.directory)
+        renderer = scanned_directory.renderer
+        ui = UI(window_manager, self._image_loader, metadata_index, self._batch_exporter, renderer,
+                scanned_directory.files)
+        self._uis.append(ui)
+
+        canvas.bind("<Configure>", lambda e: ui.initialize())
+        if canvas.winfo_ismapped():
+            ui.initialize()
+
+        # Scheduled flush is skipped when the window was closed in the meantime
+        coalescer = InputCoalescer(
+            ui,
+            self._frame_stats,
+            lambda delay_ms, flush: window.after(delay_ms, lambda: ui in self._uis and flush()),
+            window.update_idletasks,
+        )
+
+        canvas.bind('<Motion>', lambda e: coalescer.mouse_move(e))
+        canvas.bind('<Button-1>', lambda e: ui.mouse_mark(e))
+
+        canvas.bind("<Button-4>", lambda e: coalescer.mouse_scroll(e))
+        canvas.bind("<Button-5>", lambda e: coalescer.mouse_scroll(e))
+
+        canvas.bind("<Control-Button-4>", lambda e: coalescer.mouse_zoom(e))
+        canvas.bind("<Control-Button-5>", lambda e: coalescer.mouse_zoom(e))
+
+        def key_pressed(event: Event) -> Optional[str]:
+            # Canvas bindings run before the window ones, typed filter characters do not trigger other actions
+            if event.keysym not in self._COALESCED_KEYSYMS:
+                coalescer.flush()
+            return "break" if ui.filter_key(event.char, event.keysym) else None
+
+        canvas.bind("<Key>", key_pressed)
+        canvas.focus_set()
+
+        window.bind('f', lambda _: ui.toggle_stretch_to_viewport())
+        window.bind('s', lambda _: ui.toggle_sort())
+        window.bind('o', lambda _: ui.toggle_orientation_filter())
+        window.bind('j', lambda _: ui.toggle_layout())
+        window.bind('m', lambda _: ui.mark_selected())
+        window.bind('e', lambda _: ui.export_marked())
 
-    canvas.bind('<Motion>', lambda e: ui.mouse_select(e))
+        window.bind('<Home>', lambda e: ui.scroll_to(e))
+        window.bind('<End>', lambda e: ui.scroll_to(e))
+        window.bind('<Prior>', lambda e: ui.scroll_page(e))
+        window.bind('<Next>', lambda e: ui.scroll_page(e))
 
-    canvas.bind("<Button-4>", lambda e: ui.mouse_scroll(e))
-    canvas.bind("<Button-5>", lambda e: ui.mouse_scroll(e))
+        window.bind('<Left>', lambda _: coalescer.move_selection(-1, 0))
+        window.bind('<Right>', lambda _: coalescer.move_selection(1, 0))
+        window.bind('<Up>', lambda _: coalescer.move_selection(0, -1))
+        window.bind('<Down>', lambda _: coalescer.move_selection(0, 1))
 
-    canvas.bind("<Control-Button-4>", lambda e: ui.mouse_zoom(e))
-    canvas.bind("<Control-Button-5>", lambda e: ui.mouse_zoom(e))
+        window.bind('<space>', lambda e: ui.toggle_preview())
 
-    root.bind('f', lambda _: ui.toggle_stretch_to_viewport())
+        window.bind('<Escape>', lambda e: ui.exit_preview_or_quit())
+        window.bind('<F12>', lambda e: self._memory_profiler.write_report())
+        window.bind('q', lambda e: window_manager.close())
+        window.protocol("WM_DELETE_WINDOW", window_manager.close)
 
-    root.bind('<Home>', lambda e: ui.scroll_to(e))
-    root.bind('<End>', lambda e: ui.scroll_to(e))
-    root.bind('<Prior>', lambda e: ui.scroll_page(e))
-    root.bind('<Next>', lambda e: ui.scroll_page(e))
+        return ui
 
-    root.bind('<Left>', lambda _: ui.select_previous())
-    root.bind('<Right>', lambda _: ui.select_next())
-    root.bind('<Up>', lambda _: ui.select_above())
-    root.bind('<Down>', lambda _: ui.select_below())
+    def open_toplevel(self, directory: Path, files: list[ImageFile]):
+        from tkinter import Toplevel
 
-    root.bind('<space>', lambda e: ui.toggle_preview())
+        window = Toplevel(self._root)
 
-    root.bind('<Escape>', lambda e: ui.exit_preview_or_quit(root))
-    root.bind('q', lambda e: root.quit())
+        def close():
+            self._uis.remove(ui)
+            self._image_loader.cancel(ui)
+            window.destroy()
+
+        ui = self.open_window(window, directory, close, files)
+
+    def run(self):
+        self._root.after_idle(self._poll)
+        try:
+            self._root.mainloop()
+        finally:
+            self._startup_trace.print()
+            self._memory_profiler.write_report()
+            self._frame_stats.print()
+
+    def _tk_image_usage(self) -> Dict[str, int]:
+        """All images alive in Tk, including ones no longer referenced by the image loader"""
+        names = self._root.tk.splitlist(self._root.tk.call("image", "names"))
+        pixels = 0
+        for name in names:
+            pixels += int(self._root.tk.call("image", "width", name)) * int(self._root.tk.call("image", "height", name))
+        return {"images": len(names), "image_bytes": pixels * 4}
+
+    def _poll(self):
+        while not self._scanned_directories.empty():
+            scanned_directory = self._scanned_directories.get_nowait()
+            if scanned_directory.files:
+                self._create_ui(scanned_directory)
+            else:
+                print("No images found")
+                scanned_directory.on_close()
+
+        loaded_images = self._image_loader.poll_loaded_images()
+        for ui in self._uis:
+            ui.process_loaded_images(loaded_images)
+            ui.process_indexed_images()
+            ui.process_export_progress()
+        self._memory_profiler.poll()
 
-    def poll_loaded_images(_):
-        ui.process_loaded_images()
-        root.after(50, poll_loaded_images, root)
+        if self._daemon:
+            for directory, files in self._daemon.poll_requests():
+                self.open_toplevel(directory, files)
 
-    root.after_idle(poll_loaded_images, root)
+        self._root.after(self._POLL_INTERVAL_MS, self._poll)
 
-    root.mainloop()
+
+class PreviewDaemon:
+    """
+    Listens on a Unix socket for directories to open. Directories are scanned in the listener thread, windows are
+    opened by the Tk thread, see PreviewApplication._poll.
+    """
+
+    def __init__(self):
+        self._requests: Queue[Tuple[Path, list[ImageFile]]] = Queue()
+        self._server: Optional[socket.socket] = None
+
+    @staticmethod
+    def socket_path() -> Path:
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime_dir:
+            return Path(runtime_dir) / "preview.sock"
+
+        # Other users can create files in /tmp, the socket lives in a private directory which must be ours
+        directory = Path("/tmp") / f"preview-{os.getuid()}"
+        directory.mkdir(mode=0o700, exist_ok=True)
+        stat = directory.lstat()
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o777 != 0o700:
+            raise PermissionError(f"Socket directory {directory} is not private")
+        return directory / "preview.sock"
+
+    @staticmethod
+    def is_running() -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(str(PreviewDaemon.socket_path()))
+                return True
+        except (FileNotFoundError, ConnectionRefusedError, PermissionError):
+            return False
+
+    @staticmethod
+    def request_open(directory: Path) -> Optional[str]:
+        """Returns None if no daemon is running, an empty string on success, otherwise an error message"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(str(PreviewDaemon.socket_path()))
+                client.sendall(json.dumps({"directory": str(directory)}).encode() + b"\n")
+                response = json.loads(client.makefile("rb").readline() or b"{}")
+                return response.get("error", "")
+        except (FileNotFoundError, ConnectionRefusedError, PermissionError):
+            return None
+
+    def start(self):
+        socket_path = self.socket_path()
+        # Stale socket of a daemon which was not stopped properly
+        socket_path.unlink(missing_ok=True)
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(socket_path))
+        self._server.listen()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+            self.socket_path().unlink(missing_ok=True)
+
+    def poll_requests(self) -> list[Tuple[Path, list[ImageFile]]]:
+        items = []
+        while not self._requests.empty():
+            try:
+                items.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+
+            with connection:
+                line = connection.makefile("rb").readline()
+                if not line:
+                    # Connection of PreviewDaemon.is_running
+                    continue
+                try:
+                    request = json.loads(line)
+                    directory = Path(request["directory"])
+                    files = ImageFilesScanner.scan(directory)
+                    if files:
+                        self._requests.put((directory, files))
+                        response = {}
+                    else:
+                        response = {"error": "No images found"}
+                except Exception as e:
+                    response = {"error": str(e)}
+                connection.sendall(json.dumps(response).encode() + b"\n")
+
+
+class SixelImage:
+    """Thumbnail for the terminal, encoded sixel strings are cached per highlight outline"""
+    _SIXEL_CHARACTERS = bytes(63 + i for i in range(64)) + bytes(192)
+    _RUN_PATTERN = re.compile(rb"(.)\1{3,}")
+    _COLORS = 64
+
+    def __init__(self, image: Image.Image):
+        self._image = image
+        self._sixels: Dict[Optional[str], str] = {}
+
+    def width(self) -> int:
+        return self._image.width
+
+    def height(self) -> int:
+        return self._image.height
+
+    def sixel(self, outline: Optional[str] = None) -> str:
+        if outline not in self._sixels:
+            image = self._image
+            if outline:
+                from PIL import ImageDraw
+
+                image = image.copy()
+                ImageDraw.Draw(image).rectangle((0, 0, image.width - 1, image.height - 1), outline=outline, width=2)
+            self._sixels[outline] = self.encode(image)
+        return self._sixels[outline]
+
+    @staticmethod
+    def encode(image: Image.Image) -> str:
+        from PIL import Image
+
+        image = image.convert("RGB").quantize(colors=SixelImage._COLORS, method=Image.Quantize.FASTOCTREE)
+        width, height = image.size
+        pixels = image.tobytes()
+        palette = image.getpalette() or []
+
+        out = [f"\033Pq\"1;1;{width};{height}"]
+        for color in sorted(set(pixels)):
+            r, g, b = palette[color * 3:color * 3 + 3]
+            out.append(f"#{color};2;{r * 100 // 255};{g * 100 // 255};{b * 100 // 255}")
+
+        for band_y in range(0, height, 6):
+            # Bit masks of six pixel rows for each color in the band
+            band: Dict[int, bytearray] = {}
+            for dy in range(min(6, height - band_y)):
+                bit = 1 << dy
+                row_start = (band_y + dy) * width
+                for x, color in enumerate(pixels[row_start:row_start + width]):
+                    masks = band.get(color)
+                    if masks is None:
+                        masks = band[color] = bytearray(width)
+                    masks[x] |= bit
+
+            for color, masks in band.items():
+                sixels = SixelImage._RUN_PATTERN.sub(
+                    lambda m: b"!%d%c" % (len(m.group(0)), m.group(1)[0]),
+                    masks.translate(SixelImage._SIXEL_CHARACTERS),
+                )
+                out.append(f"#{color}{sixels.decode()}$")
+            out.append("-")
+
+        out.append("\033\\")
+        return "".join(out)
+
+
+class SixelImageFactory:
+    @staticmethod
+    def from_image(image: Image.Image) -> SixelImage:
+        return SixelImage(image.convert("RGB"))
+
+    @staticmethod
+    def from_ppm(image_data: bytes) -> SixelImage:
+        from PIL import Image
+
+        return SixelImage(Image.open(io.BytesIO(image_data)).convert("RGB"))
+
+
+@dataclass(frozen=True)
+class TerminalCell:
+    column: int
+    row: int
+
+
+class TerminalRenderer:
+    """
+    Renderer interface for a terminal. Images are drawn at character cells, only cells whose content changed are
+    redrawn. Bottom row is reserved for the title, so drawing a sixel never scrolls the terminal.
+    """
+    _DEFAULT_CELL_DIMENSIONS = Dimensions(8, 16)
+
+    def __init__(self, out):
+        self._out = out
+        self._columns = 80
+        self._rows = 24
+        self._cell_dimensions = self._DEFAULT_CELL_DIMENSIONS
+        self._drawn_cells: Dict[TerminalCell, Tuple] = {}
+        self.update_size()
+
+    def update_size(self) -> bool:
+        """Returns True when terminal size changed"""
+        import fcntl
+        import struct
+
+        try:
+            winsize = fcntl.ioctl(self._out.fileno(), termios.TIOCGWINSZ, b"\0" * 8)
+            rows, columns, x_pixels, y_pixels = struct.unpack("HHHH", winsize)
+        except OSError:
+            return False
+
+        if x_pixels and y_pixels:
+            cell_dimensions = Dimensions(x_pixels // columns, y_pixels // rows)
+        else:
+            cell_dimensions = self._DEFAULT_CELL_DIMENSIONS
+
+        changed = (columns, rows, cell_dimensions) != (self._columns, self._rows, self._cell_dimensions)
+        self._columns, self._rows, self._cell_dimensions = columns, rows, cell_dimensions
+        return changed
+
+    def viewport(self) -> Viewport:
+        return Viewport(
+            width=self._columns * self._cell_dimensions.width,
+            height=(self._rows - 1) * self._cell_dimensions.height,
+        )
+
+    def render_progress(self, text: str):
+        self._clear()
+        self._write_at(TerminalCell(0, 0), text)
+        self._out.flush()
+
+    def render_overview(self, overview_model: OverviewModel):
+        cells: Dict[TerminalCell, OverviewImage] = {}
+        viewport = self.viewport()
+        for image in overview_model.visible_images:
+            # Partially visible images are not drawn, a sixel crossing the bottom edge scrolls the terminal
+            if image.outer_rect.y1 < 0 or image.outer_rect.y2 > viewport.height:
+                continue
+            cells[self._cell(image.inner_rect.position)] = image
+
+        drawn_cells = self._drawn_cells
+        if any(cell not in cells for cell in drawn_cells):
+            self._clear()
+            drawn_cells = {}
+
+        self._drawn_cells = {}
+        for cell, image in cells.items():
+            key = self._tile_key(image)
+            if drawn_cells.get(cell) == key:
+                self._drawn_cells[cell] = key
+            else:
+                self._draw_tile(cell, image)
+        self._out.flush()
+
+    def render_overview_image(self, image: OverviewLoadedImage):
+        self._render_tile(image)
+
+    def render_overview_image_highlight(self, image: OverviewImage):
+        self._render_tile(image)
+
+    def render_detail(self, image: DetailModel):
+        self._clear()
+        self._drawn_cells = {}
+        self._write_at(self._cell(image.photo_rect.position), image.photo_image.sixel())
+        self._out.flush()
+
+    def render_title(self, title: str):
+        status = title[:self._columns].ljust(self._columns)
+        self._write_at(TerminalCell(0, self._rows - 1), f"\033[7m{status}\033[0m")
+        self._out.write(f"\033]2;{title}\007")
+        self._out.flush()
+
+    def _render_tile(self, image: OverviewImage):
+        cell = self._cell(image.inner_rect.position)
+        if cell in self._drawn_cells and self._drawn_cells[cell] != self._tile_key(image):
+            self._draw_tile(cell, image)
+            self._out.flush()
+
+    def _draw_tile(self, cell: TerminalCell, image: OverviewImage):
+        if isinstance(image, OverviewLoadedImage):
+            photo_cell = self._cell(image.photo_rect.position)
+            self._erase_tile(cell, image)
+            outline = "white" if image.selected else "#ffb000" if image.marked else None
+            self._write_at(photo_cell, image.photo_image.sixel(outline))
+        else:
+            self._erase_tile(cell, image)
+            columns = max(1, image.inner_rect.dimensions.width // self._cell_dimensions.width)
+            marker = "\033[7m \033[0m" if image.selected else "*" if image.marked else " "
+            self._write_at(cell, marker + "." * (columns - 1))
+        self._drawn_cells[cell] = self._tile_key(image)
+
+    def _erase_tile(self, cell: TerminalCell, image: OverviewImage):
+        columns = max(1, image.inner_rect.dimensions.width // self._cell_dimensions.width)
+        rows = max(1, image.inner_rect.dimensions.height // self._cell_dimensions.height)
+        for row in range(cell.row, min(cell.row + rows, self._rows - 1)):
+            self._write_at(TerminalCell(cell.column, row), " " * columns)
+
+    def _cell(self, position: Position) -> TerminalCell:
+        return TerminalCell(
+            column=position.x // self._cell_dimensions.width,
+            row=position.y // self._cell_dimensions.height,
+        )
+
+    def _write_at(self, cell: TerminalCell, text: str):
+        self._out.write(f"\033[{cell.row + 1};{cell.column + 1}H{text}")
+
+    def _clear(self):
+        self._out.write("\033[2J")
+        self._drawn_cells = {}
+
+    @staticmethod
+    def _tile_key(image: OverviewImage) -> Tuple:
+        photo_image = image.photo_image if isinstance(image, OverviewLoadedImage) else None
+        return image.image_file, image.dimensions, id(photo_image), image.selected, image.marked
+
+
+class TerminalWindowManager:
+    def __init__(self, renderer: TerminalRenderer, directory: Path):
+        self._renderer = renderer
+        self._directory = directory
+        self.closed = False
+
+    def set_title(self, title: str):
+        self._renderer.render_title(f"Preview {title}")
+
+    def reset_title(self):
+        self._renderer.render_title(f"Preview {self._directory}")
+
+    def close(self):
+        self.closed = True
+
+
+@dataclass(frozen=True)
+class TerminalEvent:
+    """Stands in for Tk events passed to the UI"""
+    keycode: int = 0
+    num: int = 0
+
+
+class TerminalApplication:
+    _POLL_INTERVAL_S = 0.05
+    _FILTER_KEYSYMS = {"\033": "Escape", "\r": "Return", "\n": "Return", "\x7f": "BackSpace", "\b": "BackSpace"}
+
+    def __init__(
+            self,
+            directory: Path,
+            memory_profiler: MemoryProfiler,
+            frame_stats: FrameStats,
+            export_settings: ExportSettings,
+    ):
+        self._directory = directory
+        self._memory_profiler = memory_profiler
+        self._frame_stats = frame_stats
+        memory_profiler.start()
+        self._renderer = TerminalRenderer(sys.stdout)
+        self._window_manager = TerminalWindowManager(self._renderer, directory)
+        self._image_loader = ImageLoader(ThumbnailCache(), SixelImageFactory())
+        self._batch_exporter = BatchExporter(export_settings)
+        memory_profiler.add_source("image_loader", self._image_loader.memory_usage)
+
+    def run(self):
+        fd = sys.stdin.fileno()
+        old_attributes = termios.tcgetattr(fd)
+        # Alternate screen, hidden cursor
+        sys.stdout.write("\033[?1049h\033[?25l")
+        try:
+            tty.setcbreak(fd)
+            self._run()
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_attributes)
+            sys.stdout.write("\033[?25h\033[?1049l")
+            sys.stdout.flush()
+            self._memory_profiler.write_report()
+            self._frame_stats.print()
+
+    def _run(self):
+        self._renderer.render_progress(f"Scanning {self._directory}")
+        files = ImageFilesScanner.scan(self._directory)
+        if not files:
+            return
+
+        metadata_index = MetadataIndex(self._directory)
+        ui = UI(self._window_manager, self._image_loader, metadata_index, self._batch_exporter, self._renderer, files)
+        coalescer = InputCoalescer(ui, self._frame_stats)
+        ui.initialize()
+
+        while not self._window_manager.closed:
+            readable, _, _ = select.select([sys.stdin], [], [], self._POLL_INTERVAL_S)
+            if readable:
+                self._handle_keys(ui, coalescer, os.read(sys.stdin.fileno(), 64).decode(errors="ignore"))
+
+            if self._renderer.update_size():
+                ui.initialize()
+            ui.process_loaded_images(self._image_loader.poll_loaded_images())
+            ui.process_indexed_images()
+            ui.process_export_progress()
+            self._memory_profiler.poll()
+
+    def _handle_keys(self, ui: UI, coalescer: InputCoalescer, keys: str):
+        """Keys read at once are coalesced, held arrow keys redraw once per read"""
+        coalesced_actions = {
+            "\033[D": lambda: coalescer.move_selection(-1, 0),
+            "\033[C": lambda: coalescer.move_selection(1, 0),
+            "\033[A": lambda: coalescer.move_selection(0, -1),
+            "\033[B": lambda: coalescer.move_selection(0, 1),
+            "+": lambda: coalescer.mouse_zoom(TerminalEvent(num=4)),
+            "-": lambda: coalescer.mouse_zoom(TerminalEvent(num=5)),
+        }
+        actions = {
+            **coalesced_actions,
+            "\033[5~": lambda: ui.scroll_page(TerminalEvent(keycode=UI._KEY_PAGE_UP)),
+            "\033[6~": lambda: ui.scroll_page(TerminalEvent(keycode=UI._KEY_PAGE_DOWN)),
+            "\033[H": lambda: ui.scroll_to(TerminalEvent(keycode=UI._KEY_HOME)),
+            "\033[F": lambda: ui.scroll_to(TerminalEvent(keycode=UI._KEY_END)),
+            "\033[24~": self._memory_profiler.write_report,
+            " ": ui.toggle_preview,
+            "f": ui.toggle_stretch_to_viewport,
+            "s": ui.toggle_sort,
+            "o": ui.toggle_orientation_filter,
+            "j": ui.toggle_layout,
+            "m": ui.mark_selected,
+            "e": ui.export_marked,
+            "q": self._window_manager.close,
+            "/": lambda: ui.filter_key("/", "slash"),
+            "\033": lambda: ui.filter_key("", "Escape") or ui.exit_preview_or_quit(),
+        }
+        # Longest sequences first, so a lone ESC is not matched as a prefix of arrow keys
+        sequences = sorted(actions, key=len, reverse=True)
+        while keys:
+            if ui.is_filter_input_active and not keys.startswith("\033["):
+                coalescer.flush()
+                ui.filter_key(keys[0], self._FILTER_KEYSYMS.get(keys[0], ""))
+                keys = keys[1:]
+                continue
+            for sequence in sequences:
+                if keys.startswith(sequence):
+                    if sequence not in coalesced_actions:
+                        coalescer.flush()
+                    actions[sequence]()
+                    keys = keys[len(sequence):]
+                    break
+            else:
+                keys = keys[1:]
+        coalescer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preview of the current directory")
+    parser.add_argument("--warm", nargs="+", type=Path, metavar="DIR",
+                        help="pre-generate thumbnails for images in directories and exit")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running in the background, later invocations open windows in this process")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="show only near-duplicate images of the directory tree, grouped")
+    parser.add_argument("--duplicate-distance", type=int, default=6, metavar="BITS",
+                        help="max Hamming distance of perceptual hashes of duplicates (default: %(default)s)")
+    parser.add_argument("--terminal", action="store_true",
+                        help="draw images into the terminal with sixel graphics instead of opening a window")
+    parser.add_argument("--export-dir", type=Path, default=Path("export"), metavar="DIR",
+                        help="directory of exported images, relative to the images (default: %(default)s)")
+    parser.add_argument("--export-max-size", type=int, default=2048, metavar="PX",
+                        help="max width and height of exported images (default: %(default)s)")
+    parser.add_argument("--export-format", choices=("jpeg", "webp"), default="jpeg",
+                        help="format of exported images (default: %(default)s)")
+    parser.add_argument("--export-quality", type=int, default=85,
+                        help="quality of exported images (default: %(default)s)")
+    parser.add_argument("--export-keep-metadata", action="store_true",
+                        help="keep EXIF metadata of exported images")
+    parser.add_argument("--startup-trace", action="store_true",
+                        help="print timeline of imports, window map, first placeholder and first thumbnail")
+    parser.add_argument("--bands", action="store_true",
+                        help="composite overview tiles into a few band images, faster with many small tiles")
+    parser.add_argument("--frame-stats", action="store_true",
+                        help="print histogram of frame times of coalesced input at exit")
+    parser.add_argument("--memory-report", type=Path, metavar="FILE",
+                        help="track memory of caches, photo images and Python allocations, "
+                             "write JSON report to FILE on F12 and at exit")
+    args = parser.parse_args()
+    startup_trace = StartupTrace(args.startup_trace)
+    memory_profiler = MemoryProfiler(args.memory_report)
+    frame_stats = FrameStats(args.frame_stats)
+    startup_trace.mark("imports")
+    export_settings = ExportSettings(
+        directory=args.export_dir,
+        max_size=args.export_max_size,
+        format=args.export_format,
+        quality=args.export_quality,
+        keep_metadata=args.export_keep_metadata,
+    )
+
+    if args.warm:
+        ThumbnailCacheWarmer().warm(args.warm)
+        return
+
+    if args.terminal:
+        TerminalApplication(Path.cwd(), memory_profiler, frame_stats, export_settings).run()
+        return
+
+    if args.daemon:
+        if PreviewDaemon.is_running():
+            print("Daemon is already running")
+            return
+
+        daemon = PreviewDaemon()
+        try:
+            daemon.start()
+        except PermissionError as e:
+            print(e)
+            return
+
+        from tkinter import Tk
+
+        root = Tk()
+        root.withdraw()
+        try:
+            PreviewApplication(
+                root, StartupTrace(False), memory_profiler, frame_stats, export_settings, daemon, args.bands,
+            ).run()
+        finally:
+            daemon.stop()
+        return
+
+    # Options the running daemon would not apply to the window, such invocations open their own window
+    standalone_options = ("duplicates", "bands", "startup_trace", "frame_stats", "memory_report", "export_dir",
+                          "export_max_size", "export_format", "export_quality", "export_keep_metadata")
+    if all(getattr(args, option) == parser.get_default(option) for option in standalone_options):
+        error = PreviewDaemon.request_open(Path.cwd())
+        if error is not None:
+            if error:
+                print(error)
+            return
+
+    if args.duplicates:
+        groups = DuplicateFinder(args.duplicate_distance).find(Path.cwd())
+        if not groups:
+            print("No duplicates found")
+            return
+        files = [image_file for group in groups for image_file in group]
+        clusters = {image_file: i for i, group in enumerate(groups) for image_file in group}
+    else:
+        files = None
+        clusters = None
+
+    from tkinter import Tk
+
+    root = Tk()
+    startup_trace.mark("tk initialized")
+    application = PreviewApplication(root, startup_trace, memory_profiler, frame_stats, export_settings,
+                                     band_rendering=args.bands)
+    application.open_window(root, Path.cwd(), root.quit, files, clusters)
+    application.run()
 
 
 if __name__ == '__main__':
@@ -358,6 +358,9 @@ install_apt_package jmtpfs
 install_apt_package python3-tk
 install_apt_package python3-pil
 install_apt_package python3-pil.imagetk
+install_apt_package python3-numpy
+install_apt_package python3-pygments
+install_apt_package xvfb
 
 # Utils
 install_apt_package libfuse2t64
@@ -0,0 +1,101 @@
+import fnmatch
+import importlib.util
+import random
+import sys
+import unittest
+from pathlib import Path
+
+_PREVIEW_PATH = Path(__file__).resolve().parent.parent / "home" / ".local" / "bin" / "preview.py"
+_spec = importlib.util.spec_from_file_location("preview", _PREVIEW_PATH)
+preview = importlib.util.module_from_spec(_spec)
+sys.modules["preview"] = preview
+_spec.loader.exec_module(preview)
+
+
+class FakeImageLoader:
+    def request_image(self, request, owner=None):
+        return None
+
+    def get_low_quality_image(self, request):
+        return None
+
+
+def image_files(names: list[str]) -> list[preview.ImageFile]:
+    return [preview.ImageFile(Path("/images") / name) for name in names]
+
+
+class FilenameFilterTest(unittest.TestCase):
+    _NAMES = [f"{a}_{b}{i}.{suffix}" for i, (a, b, suffix) in enumerate(
+        (a, b, suffix) for a in ("beach", "img", "Party") for b in ("x", "ab", "[1]") for suffix in ("jpg", "png")
+    )]
+
+    def matched_names(self, filename_filter: preview.FilenameFilter) -> list[str]:
+        return [self._NAMES[i] for i in filename_filter.indexes]
+
+    def test_glob_matches_start_of_name(self):
+        for query in ("img", "img_*", "*.png", "*_ab?", "[bp]*", "[!b]a", "*[[]1]", "party_x"):
+            filename_filter = preview.FilenameFilter(image_files(self._NAMES))
+            for character in query:
+                filename_filter.push(character)
+            expected = [name for name in self._NAMES if fnmatch.fnmatch(name.lower(), query + "*")]
+            self.assertEqual(expected, self.matched_names(filename_filter), query)
+
+    def test_typed_query_matches_like_query_matched_at_once(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            query = "".join(rng.choice("abgijmnpxy_.[]!*?") for _ in range(rng.randint(1, 6)))
+            typed = preview.FilenameFilter(image_files(self._NAMES))
+            for character in query:
+                typed.push(character)
+            at_once = preview.FilenameFilter(image_files(self._NAMES))
+            at_once._results.append((query, at_once._match(query, range(len(self._NAMES)))))
+            self.assertEqual(self.matched_names(at_once), self.matched_names(typed), query)
+
+    def test_fuzzy_query_and_backspace(self):
+        filename_filter = preview.FilenameFilter(image_files(self._NAMES))
+        for character in "bxj":
+            filename_filter.push(character)
+        self.assertEqual(["beach_x0.jpg"], self.matched_names(filename_filter))
+        filename_filter.pop()
+        self.assertEqual(["beach_x0.jpg", "beach_x1.png"], self.matched_names(filename_filter))
+
+
+class OverviewModelTest(unittest.TestCase):
+    def test_filtered_visible_images_match_full_layout(self):
+        rng = random.Random(1)
+        names = [f"{rng.choice(('beach', 'cat', 'dog'))}_{i}.jpg" for i in range(5000)]
+        files = image_files(names)
+        aspect_ratios = {f: rng.choice((0.75, 1.0, 1.5)) for f in files}
+        load_context = preview.ImageLoadContext(FakeImageLoader(), preview.Position(0, 0))
+
+        model = preview.OverviewModel(
+            viewport=preview.Viewport(800, 600),
+            scroll_offset=0,
+            image_size=100,
+            images=[],
+            aspect_ratios=aspect_ratios,
+            layout=preview.JustifiedLayout(),
+        )
+        model.set_image_files(files, load_context)
+        model.set_scroll_offset(model.clamp_scroll_offset(-3000), load_context)
+
+        filename_filter = preview.FilenameFilter(files)
+        for character in "ca":
+            filename_filter.push(character)
+            model.filter_images(filename_filter.indexes, load_context)
+
+        expected = preview.JustifiedLayout()
+        matches = [files[i] for i in filename_filter.indexes]
+        expected.update(len(matches), lambda i: aspect_ratios[matches[i]], 800, 100)
+        visible_images = model.visible_images
+        self.assertTrue(visible_images)
+        self.assertTrue(all(image.image_file.name.startswith("cat") for image in visible_images))
+        for image in visible_images:
+            index = matches.index(image.image_file)
+            rect = expected.rect(index)
+            self.assertEqual(rect.position.with_scroll_offset(model.scroll_offset), image.position)
+            self.assertEqual(rect.dimensions, image.dimensions)
+
+
+if __name__ == "__main__":
+    unittest.main()
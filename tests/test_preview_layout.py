@@ -0,0 +1,73 @@
+import importlib.util
+import random
+import sys
+import unittest
+from pathlib import Path
+
+_PREVIEW_PATH = Path(__file__).resolve().parent.parent / "home" / ".local" / "bin" / "preview.py"
+_spec = importlib.util.spec_from_file_location("preview", _PREVIEW_PATH)
+preview = importlib.util.module_from_spec(_spec)
+sys.modules["preview"] = preview
+_spec.loader.exec_module(preview)
+
+
+def layout_state(layout: preview.JustifiedLayout, count: int) -> list:
+    return [layout.rect(i) for i in range(count)] + [
+        (layout.index_above(i), layout.index_below(i)) for i in range(count)
+    ]
+
+
+class JustifiedLayoutTest(unittest.TestCase):
+    def test_incremental_relayout_matches_full_relayout(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            count = rng.randint(1, 60)
+            aspect_ratios = [rng.choice((0.5, 0.75, 1.0, 1.5, 2.0)) for _ in range(count)]
+            viewport_width = rng.randint(150, 800)
+
+            layout = preview.JustifiedLayout()
+            layout.update(count, aspect_ratios.__getitem__, viewport_width, 100)
+            # Lazy layout, only some rows are laid out before the change
+            layout.laid_out_height(rng.randint(0, 1000))
+            laid_out = layout.index_range(0, 1000)
+
+            changes = {rng.randrange(count): rng.choice((0.3, 1.0, 3.0)) for _ in range(rng.randint(1, 4))}
+            for index, aspect_ratio in changes.items():
+                aspect_ratios[index] = aspect_ratio
+            changed = layout.update_aspect_ratios(changes)
+
+            expected = preview.JustifiedLayout()
+            expected.update(count, list(aspect_ratios).__getitem__, viewport_width, 100)
+
+            self.assertEqual(layout_state(expected, count), layout_state(layout, count))
+            self.assertEqual(expected.content_height, layout.content_height)
+            for index in changes:
+                if index < laid_out.stop:
+                    self.assertIn(index, changed)
+
+    def test_rows_after_merged_rows_are_renumbered(self):
+        layout = preview.JustifiedLayout()
+        aspect_ratios = [1.0] * 8
+        layout.update(len(aspect_ratios), aspect_ratios.__getitem__, 200, 100)
+        self.assertEqual(2, layout.index_below(0))
+        self.assertEqual(400, layout.content_height)
+
+        # First two rows fit into one, rows after it keep their boundaries
+        aspect_ratios[:4] = [0.5] * 4
+        layout.update_aspect_ratios({0: 0.5, 1: 0.5, 2: 0.5, 3: 0.5})
+        self.assertEqual(1, layout.index_above(4))
+        self.assertEqual(6, layout.index_below(4))
+        self.assertIsNone(layout.index_below(6))
+
+    def test_rows_are_laid_out_lazily(self):
+        layout = preview.JustifiedLayout()
+        aspect_ratios = [1.0] * 100_000
+        layout.update(len(aspect_ratios), aspect_ratios.__getitem__, 200, 100)
+
+        self.assertEqual(range(0, 6), layout.index_range(0, 300))
+        self.assertEqual(300, layout.laid_out_height(300))
+        self.assertEqual(5_000_000, layout.content_height)
+
+
+if __name__ == "__main__":
+    unittest.main()